@@ -1,11 +1,248 @@
-from pyathenajdbc import connect
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def make_partitions(db_name, table_name, temp_dir):
+from dataengineeringutils.backend import get_client, DEFAULT_SERVICE_REGIONS
+from dataengineeringutils.instrumentation import record_retry, record_wait
+from dataengineeringutils.utils import _end_with_slash
+from dataengineeringutils.datatypes import type_registry
+from dataengineeringutils.s3 import s3_path_to_bucket_key
+
+log = logging.getLogger(__name__)
+
+FINISHED_STATES = ('SUCCEEDED', 'FAILED', 'CANCELLED')
+RETRYABLE_ERROR_CODES = ('TooManyRequestsException', 'ThrottlingException')
+
+def start_query(sql, output_location, database = None, workgroup = None, max_retries = 8) :
     """
-    Temp dir: e.g 's3://alpha-dag-data-warehouse-template/temp_delete/'
+    Submit a query to athena and return its QueryExecutionId without waiting for it to finish.
+    Submissions rejected because too many queries are running (or requests are throttled) are retried with jittered backoff.
+    Args:
+        sql: The query
+        output_location: s3 folder athena writes the results to e.g. s3://bucket/athena_results/
+        database: Database the query runs in (so tables needn't be prefixed with it)
+        workgroup: Athena workgroup, defaults to the account's primary workgroup
+        max_retries: How many times to retry a rejected submission
+    """
+    kwargs = {'QueryString': sql, 'ResultConfiguration': {'OutputLocation': _end_with_slash(output_location)}}
+    if database is not None :
+        kwargs['QueryExecutionContext'] = {'Database': database}
+    if workgroup is not None :
+        kwargs['WorkGroup'] = workgroup
+
+    from botocore.exceptions import ClientError
+    athena_client = get_client('athena')
+    for attempt in range(max_retries + 1) :
+        try :
+            return athena_client.start_query_execution(**kwargs)['QueryExecutionId']
+        except ClientError as e :
+            if e.response['Error']['Code'] not in RETRYABLE_ERROR_CODES or attempt == max_retries :
+                raise
+            wait = random.uniform(0, min(0.1 * 2 ** attempt, 10))
+            log.debug("Athena rejected the query ({}), retrying in {:.2f}s".format(e.response['Error']['Code'], wait))
+            record_retry('athena', 'start_query_execution', e.response['Error']['Code'])
+            record_wait('athena', 'start_query_execution', wait)
+            time.sleep(wait)
+
+def wait_for_query(query_execution_id, initial_wait = 0.1, max_wait = 5, backoff = 1.5, timeout = None, raise_on_failure = True) :
+    """
+    Poll a query until it finishes. The wait between polls starts at initial_wait and grows by backoff up to max_wait,
+    so short queries return quickly and long ones aren't polled more than they need to be.
+    Args:
+        query_execution_id: The id returned by start_query
+        timeout: Seconds after which the query is stopped and a ValueError raised. None waits forever
+        raise_on_failure: Raise a ValueError if the query FAILED or was CANCELLED
+    Returns:
+        The QueryExecution dict from get_query_execution
+    """
+    athena_client = get_client('athena')
+    started = time.monotonic()
+    wait = initial_wait
+    while True :
+        execution = athena_client.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+        state = execution['Status']['State']
+        if state in FINISHED_STATES :
+            break
+        if timeout is not None and time.monotonic() - started > timeout :
+            athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+            raise ValueError("Query {} did not finish within {} seconds and has been stopped".format(query_execution_id, timeout))
+        time.sleep(wait)
+        wait = min(wait * backoff, max_wait)
+
+    if raise_on_failure and state != 'SUCCEEDED' :
+        raise ValueError("Query {} {}: {}\n{}".format(query_execution_id, state.lower(), execution['Status'].get('StateChangeReason', ''), execution['Query']))
+    return execution
+
+def _query_summary(execution) :
+    return {
+        'query_execution_id': execution['QueryExecutionId'],
+        'state': execution['Status']['State'],
+        'output_location': execution['ResultConfiguration']['OutputLocation'],
+        'data_scanned_bytes': execution.get('Statistics', {}).get('DataScannedInBytes', 0),
+        'engine_seconds': execution.get('Statistics', {}).get('EngineExecutionTimeInMillis', 0) / 1000.0,
+        'error': execution['Status'].get('StateChangeReason')
+    }
+
+def run_query(sql, output_location, database = None, workgroup = None, timeout = None, raise_on_failure = True, **wait_kwargs) :
+    """
+    Run a query on athena and wait for it to finish.
+    Args:
+        See start_query and wait_for_query
+    Returns:
+        dict with the query_execution_id, state, output_location (the s3 path of the results csv), data_scanned_bytes, engine_seconds and error
+    """
+    query_execution_id = start_query(sql, output_location, database, workgroup)
+    execution = wait_for_query(query_execution_id, timeout=timeout, raise_on_failure=raise_on_failure, **wait_kwargs)
+    return _query_summary(execution)
+
+def run_queries(queries, output_location, database = None, workgroup = None, max_concurrent = 5, timeout = None, raise_on_failure = True, **wait_kwargs) :
+    """
+    Run many queries on athena with at most max_concurrent of them running at once.
+    Args:
+        queries: list of sql strings
+        max_concurrent: Keep this below the account's athena query concurrency limit
+        raise_on_failure: If True, raise a ValueError once every query has finished if any of them failed or timed out.
+            Otherwise failed queries are returned with their state and error (a query that timed out is CANCELLED)
+        Others: See run_query
+    Returns:
+        list of run_query results, in the same order as queries
+    """
+    started = time.monotonic()
+    done = [0]
+    lock = threading.Lock()
+
+    def run(sql) :
+        query_execution_id = start_query(sql, output_location, database, workgroup)
+        try :
+            summary = _query_summary(wait_for_query(query_execution_id, timeout=timeout, raise_on_failure=False, **wait_kwargs))
+        except ValueError as e :
+            # Timed out (and stopped), record it against this query rather than abandoning the others
+            execution = get_client('athena').get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+            summary = dict(_query_summary(execution), error=str(e))
+        with lock :
+            done[0] += 1
+            log.info("{}/{} athena queries finished".format(done[0], len(queries)))
+        return summary
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrent, len(queries)))) as executor :
+        results = list(executor.map(run, queries))
+
+    log.info("Ran {} athena queries in {:.1f}s, scanning {} bytes".format(len(results), time.monotonic() - started, sum(r['data_scanned_bytes'] for r in results)))
+    failed = [r for r in results if r['state'] != 'SUCCEEDED']
+    if raise_on_failure and failed :
+        raise ValueError("{} of {} queries did not succeed:\n{}".format(len(failed), len(results), "\n".join("{} {}: {}".format(r['query_execution_id'], r['state'].lower(), r['error']) for r in failed)))
+    return results
+
+# Athena result types that aren't in the athena column of data_type_conversion.csv. Anything else (arrays, maps, rows, json) is read as character
+_EXTRA_ATHENA_RESULT_TYPES = {'float': 'float', 'tinyint': 'int', 'smallint': 'int', 'char': 'character', 'decimal': 'double'}
+
+def _athena_type_to_metadata_type(athena_type) :
+    athena_type = athena_type.lower().split('(')[0]
+    for metadata_type in type_registry.metadata_types() :
+        try :
+            if type_registry.translate(metadata_type, 'athena') == athena_type :
+                return metadata_type
+        except KeyError :
+            pass
+    return _EXTRA_ATHENA_RESULT_TYPES.get(athena_type, 'character')
+
+# Any column of a query result can be null, so without metadata these are read as pandas' nullable types
+_NULLABLE_PANDAS_TYPES = {'int': 'Int32', 'long': 'Int64', 'boolean': 'boolean'}
+
+def query_result_metadata(query_execution_id) :
+    """
+    Table metadata (columns only) for the result of a query, built from the column types athena reports for the result set
+    """
+    result = get_client('athena').get_query_results(QueryExecutionId=query_execution_id, MaxResults=1)
+    column_info = result['ResultSet']['ResultSetMetadata']['ColumnInfo']
+    return {
+        'table_name': query_execution_id,
+        'columns': [{'name': c['Name'], 'type': _athena_type_to_metadata_type(c['Type']), 'description': ''} for c in column_info]
+    }
+
+def _conform_columns(df, column_names) :
+    if list(df.columns) == column_names :
+        return df
+    if set(df.columns) != set(column_names) :
+        raise ValueError("The query result has columns {} but the metadata has columns {}".format(list(df.columns), column_names))
+    return df[column_names]
+
+def _iter_conformed_chunks(reader, body, column_names) :
+    try :
+        for chunk in reader :
+            yield _conform_columns(chunk, column_names)
+    finally :
+        body.close()
+
+def pd_read_query_result(query, table_metadata = None, chunksize = None, **kwargs) :
     """
+    Read the results of a finished athena query into pandas, streaming the result csv from s3 rather than downloading it first.
+
+    Column types come from table_metadata if given (and the columns are put in metadata order), otherwise from
+    the column types athena reports for the result set, so the result matches the metadata without further conversion.
+    Without table_metadata, int, bigint and boolean columns are read as pandas' nullable Int32, Int64 and boolean types, as they may hold nulls.
+    With it, as with pd_read_csv_using_metadata, int columns containing nulls can't be read as ints, pass dtype in kwargs to override them.
+    Args:
+        query: A QueryExecutionId, or the dict returned by run_query
+        table_metadata: Table metadata the result should conform to
+        chunksize: If given, return an iterator of DataFrames of chunksize rows instead of one DataFrame,
+            so results bigger than memory can be processed chunk by chunk
+        kwargs: Passed to pandas.read_csv
+    """
+    import pandas as pd
+    from dataengineeringutils.pd_metadata_conformance import _pd_dtype_dict_from_metadata, _pd_date_parse_list_from_metadatadata
+
+    if isinstance(query, dict) :
+        query_execution_id, output_location = query['query_execution_id'], query['output_location']
+    else :
+        query_execution_id = query
+        execution = get_client('athena').get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+        if execution['Status']['State'] != 'SUCCEEDED' :
+            raise ValueError("Query {} has not succeeded, its state is {}".format(query_execution_id, execution['Status']['State']))
+        output_location = execution['ResultConfiguration']['OutputLocation']
+
+    nullable = table_metadata is None
+    if nullable :
+        table_metadata = query_result_metadata(query_execution_id)
+
+    dtype = _pd_dtype_dict_from_metadata(table_metadata)
+    if nullable :
+        for c in table_metadata['columns'] :
+            if c['type'] in _NULLABLE_PANDAS_TYPES :
+                dtype[c['name']] = _NULLABLE_PANDAS_TYPES[c['type']]
+    parse_dates = _pd_date_parse_list_from_metadatadata(table_metadata)
+    for c in parse_dates :
+        dtype.pop(c, None)
+    dtype.update(kwargs.pop('dtype', {}))
+    column_names = [c['name'] for c in table_metadata['columns']]
+
+    bucket, key = s3_path_to_bucket_key(output_location)
+    body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body']
+    reader = pd.read_csv(body, dtype=dtype, parse_dates=parse_dates, chunksize=chunksize, **kwargs)
 
-    conn = connect(s3_staging_dir = temp_dir, region_name = 'eu-west-1')
+    if chunksize is not None :
+        return _iter_conformed_chunks(reader, body, column_names)
+    try :
+        return _conform_columns(reader, column_names)
+    finally :
+        body.close()
+
+def pd_read_sql(sql, output_location, database = None, table_metadata = None, chunksize = None, workgroup = None, timeout = None, **kwargs) :
+    """
+    Run a query on athena and read its result into pandas, see run_query and pd_read_query_result
+    """
+    result = run_query(sql, output_location, database, workgroup, timeout)
+    return pd_read_query_result(result, table_metadata, chunksize, **kwargs)
+
+def _make_partitions_jdbc(db_name, table_name, temp_dir, region_name = None) :
+    # pyathenajdbc starts a JVM, so is only imported if asked for (pip install PyAthenaJDBC)
+    from pyathenajdbc import connect
+    if region_name is None :
+        region_name = DEFAULT_SERVICE_REGIONS['athena']
+
+    conn = connect(s3_staging_dir = temp_dir, region_name = region_name)
 
     sql = """
     MSCK REPAIR TABLE {}.{};
@@ -13,4 +250,18 @@ def make_partitions(db_name, table_name, temp_dir):
 
     cursor = conn.cursor()
     cursor.execute(sql)
-    conn.commit()
\ No newline at end of file
+    conn.commit()
+
+def make_partitions(db_name, table_name, temp_dir, use_jdbc = False, region_name = None, timeout = None):
+    """
+    Temp dir: e.g 's3://alpha-dag-data-warehouse-template/temp_delete/'
+
+    Runs MSCK REPAIR TABLE through the athena API, in the backend's athena region (eu-west-1 unless
+    Boto3Backend(region_name=...) says otherwise). use_jdbc=True runs it through pyathenajdbc instead, in region_name (defaults to eu-west-1).
+    """
+    if use_jdbc :
+        return _make_partitions_jdbc(db_name, table_name, temp_dir, region_name)
+    if region_name is not None :
+        raise ValueError("region_name only applies with use_jdbc=True, set the region of the athena API with Boto3Backend(region_name=...)")
+
+    return run_query("MSCK REPAIR TABLE {}.{}".format(db_name, table_name), temp_dir, timeout=timeout)
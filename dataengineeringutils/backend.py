@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+import threading
+
+from dataengineeringutils.instrumentation import wrap_client
+
+# Region used for services that were always pinned to a region by this package (e.g. glue, athena)
+DEFAULT_SERVICE_REGIONS = {'glue': 'eu-west-1', 'athena': 'eu-west-1'}
+
+class Boto3Backend :
+    """
+    The default backend, clients are real boto3 clients created on first use and then reused.
+
+    Args:
+        region_name: region for every client. If None, glue and athena use eu-west-1 and other services use the boto3 default
+        session: an optional boto3.Session to create clients from
+    """
+
+    def __init__(self, region_name = None, session = None) :
+        self.region_name = region_name
+        self.session = session
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def client(self, service_name) :
+        with self._lock :
+            if service_name not in self._clients :
+                import boto3
+                session = boto3 if self.session is None else self.session
+                region_name = self.region_name if self.region_name is not None else DEFAULT_SERVICE_REGIONS.get(service_name)
+                if region_name is None :
+                    self._clients[service_name] = session.client(service_name)
+                else :
+                    self._clients[service_name] = session.client(service_name, region_name)
+            return self._clients[service_name]
+
+_backend = None
+
+def get_backend() :
+    """
+    Return the backend that all s3 and glue calls in this package go through (a Boto3Backend unless set_backend was called)
+    """
+    global _backend
+    if _backend is None :
+        _backend = Boto3Backend()
+    return _backend
+
+def set_backend(backend) :
+    """
+    Swap the backend used by this package. Any object with a client(service_name) method will do,
+    e.g. Boto3Backend(region_name='eu-west-2') or dataengineeringutils.fake_backend.FakeBackend().
+    Passing None resets to the default Boto3Backend.
+    Returns the previous backend.
+    """
+    global _backend
+    previous = _backend
+    _backend = backend
+    return previous
+
+@contextmanager
+def use_backend(backend) :
+    """
+    Context manager that uses backend for the duration of the with block, e.g.
+
+    with use_backend(FakeBackend(latency=0.05)) as fake:
+        metadata_folder_to_database("meta_data/db/")
+    """
+    previous = set_backend(backend)
+    try :
+        yield backend
+    finally :
+        set_backend(previous)
+
+def get_client(service_name) :
+    """
+    Get the client for service_name (e.g. 's3', 'glue') from the current backend.
+    If instrumentation is on (see dataengineeringutils.instrumentation) the client records every call it makes
+    """
+    return wrap_client(get_backend().client(service_name), service_name)
@@ -0,0 +1,150 @@
+import os
+import re
+import threading
+
+from dataengineeringutils.utils import read_json, loads_json, iter_json_items, _copy_json, _end_with_slash
+from dataengineeringutils.backend import get_client
+
+class MetadataCatalogue :
+    """
+    Index of a folder of table metadata jsons (a database.json plus one json per table), and/or of the same
+    layout under an s3 prefix.
+
+    Tables are keyed by their file name without .json. Files are only parsed when a table is first asked for,
+    and the parsed metadata is cached against the file's mtime and size (local) or ETag (s3), so a file is only
+    parsed again once it changes. Every getter returns a copy, so callers can modify what they get back.
+
+    One catalogue can be shared between metadata_folder_to_database, delete_all_target_data_from_database and
+    upload_meta_data_folder_to_s3 instead of each of them listing and reading the folder again.
+
+    Args:
+        folder_path: Local metadata folder
+        s3_path: s3 path of a metadata folder e.g. s3://bucket/meta_data/db/. Local files take precedence over s3 files with the same name
+    """
+
+    def __init__(self, folder_path = None, s3_path = None) :
+        if folder_path is None and s3_path is None :
+            raise ValueError("You must provide a folder_path and/or an s3_path")
+        self.folder_path = folder_path
+        self.s3_path = None if s3_path is None else _end_with_slash(s3_path)
+        self._lock = threading.RLock()
+        self._cache = {}
+        self.refresh()
+
+    def refresh(self) :
+        """
+        List the folder (and s3 prefix) again, e.g. after files have been added or removed.
+        Parsed files that haven't changed are kept.
+        """
+        sources = {}
+        if self.s3_path is not None :
+            bucket, prefix = self.s3_path.replace("s3://", "").split('/', 1)
+            paginator = get_client('s3').get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/') :
+                for c in page.get('Contents', []) :
+                    file_name = c['Key'][len(prefix):]
+                    if re.match(r".+\.json$", file_name) :
+                        sources[file_name[:-5]] = ('s3', bucket, c['Key'], c['ETag'])
+
+        if self.folder_path is not None :
+            for file_name in os.listdir(self.folder_path) :
+                if re.match(r".+\.json$", file_name) :
+                    sources[file_name[:-5]] = ('local', os.path.join(self.folder_path, file_name))
+
+        with self._lock :
+            self._sources = sources
+            self._cache = dict((name, cached) for name, cached in self._cache.items() if name in sources)
+
+    def _version(self, source) :
+        if source[0] == 'local' :
+            stat = os.stat(source[1])
+            return (stat.st_mtime_ns, stat.st_size)
+        return source[3]
+
+    def _parse(self, source) :
+        if source[0] == 'local' :
+            return read_json(source[1])
+        obj = get_client('s3').get_object(Bucket=source[1], Key=source[2])
+        return loads_json(obj['Body'].read())
+
+    def _get(self, name) :
+        with self._lock :
+            if name not in self._sources :
+                raise KeyError("{} not found in metadata catalogue".format(name))
+            source = self._sources[name]
+            version = self._version(source)
+            cached = self._cache.get(name)
+            if cached is None or cached[0] != version :
+                cached = (version, self._parse(source))
+                self._cache[name] = cached
+            return cached[1]
+
+    def has_database(self) :
+        return "database" in self._sources
+
+    def get_database(self) :
+        """
+        Return the database metadata (database.json)
+        """
+        if not self.has_database() :
+            raise ValueError("database.json not found in metadata folder")
+        return _copy_json(self._get("database"))
+
+    def table_names(self) :
+        return sorted(n for n in self._sources if n != "database")
+
+    def get_table(self, name) :
+        return _copy_json(self._get(name))
+
+    def tables(self) :
+        """
+        Iterate through the metadata of every table
+        """
+        for name in self.table_names() :
+            yield self.get_table(name)
+
+    def iter_columns(self, name) :
+        """
+        Iterate through the columns of a table. A local file that hasn't been parsed yet is streamed with
+        iter_json_items rather than parsed and cached whole, so scanning the columns of many wide tables
+        doesn't hold them all in memory
+        """
+        with self._lock :
+            if name not in self._sources :
+                raise KeyError("{} not found in metadata catalogue".format(name))
+            source = self._sources[name]
+            cached = self._cache.get(name)
+            streamed = source[0] == 'local' and (cached is None or cached[0] != self._version(source))
+        if streamed :
+            columns = iter_json_items(source[1], 'columns.item')
+        else :
+            columns = self._get(name).get('columns', [])
+        for column in columns :
+            yield _copy_json(column)
+
+    def tables_with_column(self, column_name) :
+        """
+        Return the names of the tables that have a column called column_name
+        """
+        return [name for name in self.table_names() if any(c['name'] == column_name for c in self.iter_columns(name))]
+
+    def local_paths(self) :
+        """
+        The local paths of every json in the catalogue (including database.json)
+        """
+        return sorted(s[1] for s in self._sources.values() if s[0] == 'local')
+
+    def find_tables(self, predicate) :
+        """
+        Return the names of the tables whose metadata satisfies predicate (a function taking the table metadata)
+        """
+        return [name for name in self.table_names() if predicate(self._get(name))]
+
+    def tables_with_partition_key(self, partition_key) :
+        def has_partition_key(table_metadata) :
+            pks = [pk["Name"] for pk in table_metadata.get("glue_specific", {}).get("PartitionKeys", [])]
+            return partition_key in pks or partition_key in table_metadata.get("partitions", [])
+        return self.find_tables(has_partition_key)
+
+    def tables_with_data_format(self, data_format) :
+        return self.find_tables(lambda table_metadata: table_metadata.get("data_format") == data_format)
@@ -1,11 +1,70 @@
 import re
+import logging
+from functools import lru_cache
+
+log = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w]")
+_QUOTE = "'"
 
 def normalise_string(colname):
     colname = colname.lower()
-    colname = colname.replace("'", "")
-    colname = re.sub("[^\w]", "_", colname)
+    colname = colname.replace(_QUOTE, "")
+    colname = _NON_WORD.sub("_", colname)
     return colname
 
-def clean_and_normalise_df_column_names(df):
-    df.columns = [normalise_string(c) for c in df.columns]
-    return df
\ No newline at end of file
+@lru_cache(maxsize=4096)
+def _normalise_header(header, on_collision) :
+    sub = _NON_WORD.sub
+    normalised = [sub("_", c.lower().replace(_QUOTE, "")) for c in header]
+
+    taken = set(normalised)
+    if len(taken) == len(normalised) :
+        return tuple(normalised)
+
+    if on_collision == "raise" :
+        seen = {}
+        for original, new in zip(header, normalised) :
+            if new in seen :
+                raise ValueError("Columns {} and {} both normalise to {}".format(seen[new], original, new))
+            seen[new] = original
+
+    # The first column to normalise to a name keeps it, later ones get the lowest free suffix _2, _3, ...
+    first_seen = set()
+    result = []
+    for original, new in zip(header, normalised) :
+        if new in first_seen :
+            i = 2
+            while "{}_{}".format(new, i) in taken :
+                i += 1
+            deduped = "{}_{}".format(new, i)
+            log.warning("Column {} normalises to {} which already exists, renaming it to {}".format(original, new, deduped))
+            taken.add(deduped)
+            new = deduped
+        else :
+            first_seen.add(new)
+        result.append(new)
+    return tuple(result)
+
+def normalise_column_names(column_names, on_collision = "suffix") :
+    """
+    Normalise a whole header at once (lower case, quotes removed, non word characters replaced with _).
+    The mapping is cached against the header, so frames/files with the same header are only normalised once.
+    Args:
+        column_names: Iterable of column names (e.g. df.columns)
+        on_collision: What to do when two columns normalise to the same name. "suffix" keeps the first and renames
+            the others name_2, name_3, ... (skipping names already in the header), "raise" raises a ValueError
+    """
+    if on_collision not in ("suffix", "raise") :
+        raise ValueError("on_collision must be one of suffix or raise")
+    return list(_normalise_header(tuple(str(c) for c in column_names), on_collision))
+
+def clean_and_normalise_df_column_names(df, on_collision = "suffix"):
+    df.columns = normalise_column_names(df.columns, on_collision)
+    return df
+
+def clean_and_normalise_spark_df_column_names(df, on_collision = "suffix") :
+    """
+    Spark equivalent of clean_and_normalise_df_column_names. Returns a new DataFrame
+    """
+    return df.toDF(*normalise_column_names(df.columns, on_collision))
@@ -0,0 +1,175 @@
+"""
+Streaming compression for files read from and written to s3.
+
+Codecs are chosen from the file extension (compression='infer') or by name. Data is decompressed as it's read
+and compressed as it's written, so a whole file is never held in memory uncompressed.
+"""
+
+import io
+import os
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+CODECS = ("gzip", "bz2", "xz", "zstd")
+
+EXTENSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+    ".zstd": "zstd"
+}
+
+# Compressions pandas handles itself (e.g. a zip holding one csv), which the s3 helpers leave to pandas
+PANDAS_ONLY_EXTENSIONS = {
+    ".zip": "zip",
+    ".tar": "tar"
+}
+
+# Levels used when none is given. gzip defaults to 6 rather than its slowest level 9, which is rarely worth it.
+# bz2's levels differ little in speed, so it keeps 9
+DEFAULT_LEVELS = {"gzip": 6, "bz2": 9, "xz": 6, "zstd": 3}
+
+def codec_from_path(path) :
+    """
+    The codec implied by path's extension e.g. 'gzip' for table.csv.gz, or None
+    """
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def pandas_only_compression(path, compression = "infer") :
+    """
+    The compression to leave to pandas for path: a pandas compression that isn't one of CODECS (e.g. 'zip', or a dict
+    of options such as {'method': 'zip', 'archive_name': 'table.csv'}), or one inferred from a .zip or .tar extension. Otherwise None
+    """
+    if compression == "infer" :
+        return PANDAS_ONLY_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if compression is None or compression in CODECS :
+        return None
+    return compression
+
+def resolve_codec(path, compression = "infer") :
+    """
+    The codec to use for path. compression is 'infer' (from the extension), None for no compression, or one of CODECS
+    """
+    if compression == "infer" :
+        return codec_from_path(path)
+    if compression is not None and compression not in CODECS :
+        raise ValueError("Unsupported compression {}, use one of {}, 'infer' or None".format(compression, ", ".join(CODECS)))
+    return compression
+
+def _zstandard() :
+    try :
+        import zstandard
+    except ImportError :
+        raise ImportError("zstd compression needs the zstandard package, pip install dataengineeringutils[zstd]")
+    return zstandard
+
+def open_decompressed(raw, codec) :
+    """
+    Wrap a readable binary file object (e.g. the Body of an s3 get_object response) so reads return decompressed bytes
+    """
+    if codec is None :
+        return raw
+    if codec == "gzip" :
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if codec == "bz2" :
+        import bz2
+        return bz2.BZ2File(raw, mode="rb")
+    if codec == "xz" :
+        import lzma
+        return lzma.LZMAFile(raw, mode="rb")
+    if codec == "zstd" :
+        return _zstandard().ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+    raise ValueError("Unsupported compression {}".format(codec))
+
+def open_compressed(raw, codec, level = None) :
+    """
+    Wrap a writable binary file object so writes are compressed into it. Closing the wrapper finishes the
+    compressed stream but leaves raw open
+    """
+    if codec is None :
+        return raw
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == "gzip" :
+        import gzip
+        return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level, mtime=0)
+    if codec == "bz2" :
+        import bz2
+        return bz2.BZ2File(raw, mode="wb", compresslevel=level)
+    if codec == "xz" :
+        import lzma
+        return lzma.LZMAFile(raw, mode="wb", preset=level)
+    if codec == "zstd" :
+        return _zstandard().ZstdCompressor(level=level).stream_writer(raw, closefd=False)
+    raise ValueError("Unsupported compression {}".format(codec))
+
+def compress_bytes(data, codec, level = None) :
+    if codec is None :
+        return data
+    raw = io.BytesIO()
+    with open_compressed(raw, codec, level) as f :
+        f.write(data)
+    return raw.getvalue()
+
+def decompress_bytes(data, codec) :
+    if codec is None :
+        return data
+    with open_decompressed(io.BytesIO(data), codec) as f :
+        return f.read()
+
+def benchmark_codecs(data, codecs = None, levels = None, repeat = 3) :
+    """
+    Measure compression ratio against throughput for some sample data, to choose a codec.
+    A network bound job (e.g. moving data between s3 and a small instance) wants the best ratio it can compress at
+    the speed of the network, a CPU bound job wants the fastest codec.
+    Args:
+        data: bytes to compress, e.g. the first 50MB of a typical file
+        codecs: codecs to try, defaults to every codec that's installed
+        levels: dict of codec to a list of levels to try, defaults to DEFAULT_LEVELS
+        repeat: take the best of this many runs
+    Returns:
+        list of dicts (one per codec and level, best ratio first) with the codec, level, ratio (uncompressed / compressed size)
+        and compress_mb_per_s and decompress_mb_per_s (MB of uncompressed data a second)
+    """
+    if codecs is None :
+        codecs = [c for c in CODECS if c != "zstd"]
+        try :
+            _zstandard()
+            codecs.append("zstd")
+        except ImportError :
+            pass
+    levels = {} if levels is None else levels
+    megabytes = len(data) / 1e6
+    results = []
+    for codec in codecs :
+        for level in levels.get(codec, [DEFAULT_LEVELS[codec]]) :
+            compress_seconds = decompress_seconds = float("inf")
+            for _ in range(repeat) :
+                started = time.perf_counter()
+                compressed = compress_bytes(data, codec, level)
+                compress_seconds = min(compress_seconds, time.perf_counter() - started)
+                started = time.perf_counter()
+                decompress_bytes(compressed, codec)
+                decompress_seconds = min(decompress_seconds, time.perf_counter() - started)
+            results.append({
+                "codec": codec,
+                "level": level,
+                "ratio": len(data) / max(1, len(compressed)),
+                "compress_mb_per_s": megabytes / max(compress_seconds, 1e-9),
+                "decompress_mb_per_s": megabytes / max(decompress_seconds, 1e-9)
+            })
+    return sorted(results, key=lambda r: -r["ratio"])
+
+if __name__ == "__main__" :
+    # python -m dataengineeringutils.compression sample_file [megabytes to read]
+    import sys
+    with open(sys.argv[1], "rb") as f :
+        sample = f.read(int(float(sys.argv[2]) * 1e6) if len(sys.argv) > 2 else -1)
+    all_levels = {"gzip": [1, 6, 9], "bz2": [1, 9], "xz": [0, 6], "zstd": [1, 3, 9, 19]}
+    print("{:<6} {:>5} {:>7} {:>14} {:>16}".format("codec", "level", "ratio", "compress MB/s", "decompress MB/s"))
+    for r in benchmark_codecs(sample, levels=all_levels) :
+        print("{codec:<6} {level:>5} {ratio:>7.2f} {compress_mb_per_s:>14.1f} {decompress_mb_per_s:>16.1f}".format(**r))
@@ -1,15 +1,101 @@
-import pandas as pd
+import csv
 import os
-import pkg_resources
+import threading
+
+TYPE_CONVERSION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "data_type_conversion.csv")
+
+class TypeRegistry :
+    """
+    Lookup from metadata column types (e.g. 'character', 'int') to the types of target dialects (e.g. 'glue', 'spark', 'pandas').
+
+    The built in dialects come from data/data_type_conversion.csv, which is read once (with the csv module, not pandas)
+    the first time a type is translated. More dialects can be registered, e.g.
+
+    type_registry.register_dialect("postgres", {"character": "text", "int": "integer", "long": "bigint", ...})
+    """
+
+    def __init__(self) :
+        self._lookup = None
+        self._registered = {}
+        self._lock = threading.Lock()
+
+    def _get_lookup(self) :
+        lookup = self._lookup
+        if lookup is None :
+            with self._lock :
+                if self._lookup is None :
+                    lookup = {}
+                    with open(TYPE_CONVERSION_PATH, newline='', encoding="utf-8") as f :
+                        for row in csv.DictReader(f) :
+                            metadata_type = row.pop("metadata")
+                            row.pop("comment", None)
+                            lookup[metadata_type] = row
+                    for dialect, mapping in self._registered.items() :
+                        self._add_dialect(lookup, dialect, mapping)
+                    self._lookup = lookup
+                lookup = self._lookup
+        return lookup
+
+    @staticmethod
+    def _add_dialect(lookup, dialect, mapping) :
+        for types in lookup.values() :
+            types.pop(dialect, None)
+        for metadata_type, target in mapping.items() :
+            lookup.setdefault(metadata_type, {})[dialect] = target
+
+    def register_dialect(self, dialect, mapping, overwrite = False) :
+        """
+        Register a target dialect.
+        Args:
+            dialect: The name used as target_type when translating
+            mapping: dict of metadata type to the dialect's type
+            overwrite: Allow replacing an existing dialect
+        """
+        if dialect in self.dialects() and not overwrite :
+            raise ValueError("The type dialect {} already exists, use overwrite=True to replace it".format(dialect))
+        with self._lock :
+            self._registered[dialect] = dict(mapping)
+            if self._lookup is not None :
+                self._add_dialect(self._lookup, dialect, mapping)
+
+    def dialects(self) :
+        return sorted(set(d for types in self._get_lookup().values() for d in types))
+
+    def metadata_types(self) :
+        return sorted(self._get_lookup())
+
+    def translate(self, column_type, target_type = "glue") :
+        try:
+            return self._get_lookup()[column_type][target_type]
+        except KeyError:
+            raise KeyError("You attempted to lookup column type {} for {}, but this cannot be found in data_type_conversion.csv or the registered dialects".format(column_type, target_type))
+
+    def translate_columns(self, columns, target_type = "glue") :
+        """
+        Translate the type of every column in a list of metadata columns (dicts with a 'type' key)
+        """
+        lookup = self._get_lookup()
+        translated = []
+        for c in columns :
+            try:
+                translated.append(lookup[c["type"]][target_type])
+            except KeyError:
+                raise KeyError("You attempted to lookup column type {} for {} (column {}), but this cannot be found in data_type_conversion.csv or the registered dialects".format(c["type"], target_type, c.get("name")))
+        return translated
+
+type_registry = TypeRegistry()
 
 def translate_metadata_type_to_type(column_type, target_type="glue"):
+    return type_registry.translate(column_type, target_type)
 
-    io = pkg_resources.resource_stream(__name__, "data/data_type_conversion.csv")
-    df = pd.read_csv(io)
-    df = df.set_index("metadata")
-    lookup = df.to_dict(orient="index")
+def translate_metadata_types_to_types(columns, target_type="glue"):
+    """
+    Translate a list of metadata columns to a list of target_type types in one call
+    """
+    return type_registry.translate_columns(columns, target_type)
 
-    try:
-        return lookup[column_type][target_type]
-    except:
-        raise KeyError("You attempted to lookup column type {}, but this cannot be found in data_type_conversion.csv".format(column_type))
\ No newline at end of file
+def register_type_dialect(dialect, mapping, overwrite=False):
+    """
+    Register a new target dialect with the default type registry, see TypeRegistry.register_dialect
+    """
+    type_registry.register_dialect(dialect, mapping, overwrite)
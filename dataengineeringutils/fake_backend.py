@@ -0,0 +1,853 @@
+"""
+An in-memory stand in for the parts of the S3, Glue and Athena APIs that this package uses.
+
+Use it to test or benchmark the package without an AWS account:
+
+    from dataengineeringutils.backend import use_backend
+    from dataengineeringutils.fake_backend import FakeBackend
+
+    with use_backend(FakeBackend(latency=0.02, throttle_rate=0.01, seed=1)) as fake:
+        metadata_folder_to_database("meta_data/db/")
+        print(fake.call_counts)
+
+Every call sleeps for the configured latency (so thread pools behave as they would against the network)
+and can be made to fail with a throttling or internal error, either at random or deterministically with fail_next.
+Errors are botocore ClientErrors with the same error codes AWS returns.
+"""
+
+import io
+import re
+import csv
+import time
+import random
+import hashlib
+import datetime
+import threading
+import itertools
+from copy import deepcopy
+from collections import Counter
+
+from botocore.exceptions import ClientError
+
+THROTTLE_ERROR_CODES = {'s3': ('SlowDown', 503), 'glue': ('ThrottlingException', 400), 'athena': ('TooManyRequestsException', 400)}
+FAILURE_ERROR_CODES = {'s3': ('InternalError', 500), 'glue': ('InternalServiceException', 500), 'athena': ('InternalServerException', 500)}
+
+# S3 limits: copy_object (and each upload_part_copy) copies at most 5GB, multipart parts other than the last are at least 5MB
+MAX_COPY_OBJECT_SIZE = 5 * 1024 ** 3
+MIN_MULTIPART_PART_SIZE = 5 * 1024 ** 2
+
+def _client_error(code, message, operation_name, status_code = 400, exception_class = ClientError) :
+    error_response = {
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': status_code}
+    }
+    return exception_class(error_response, operation_name)
+
+def _now() :
+    return datetime.datetime.now(datetime.timezone.utc)
+
+class _FakeExceptions :
+    """
+    Mimics client.exceptions, every attribute is a ClientError subclass so both
+    `except client.exceptions.EntityNotFoundException` and `except ClientError` work
+    """
+    def __init__(self, names) :
+        for name in names :
+            setattr(self, name, type(name, (ClientError,), {}))
+        self.ClientError = ClientError
+
+class CallPolicy :
+    """
+    How a fake call behaves.
+
+    Args:
+        latency: seconds every call sleeps for
+        jitter: extra random seconds (uniform between 0 and jitter) added to latency
+        throttle_rate: probability that a call raises a throttling error
+        failure_rate: probability that a call raises an internal (5xx) error
+    """
+
+    def __init__(self, latency = 0, jitter = 0, throttle_rate = 0, failure_rate = 0) :
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+
+class FakeBackend :
+    """
+    Backend holding an in-memory S3 object store, Glue catalogue, Glue job API and Athena query API.
+
+    Args:
+        latency, jitter, throttle_rate, failure_rate: the default CallPolicy for every call
+        max_calls_per_second: dict of service name to a request rate above which calls are throttled, e.g. {'glue': 10}
+        job_run_seconds: how long a started glue job run stays RUNNING before finishing
+        query_run_seconds: how long a started athena query stays RUNNING before finishing
+        max_concurrent_queries: number of athena queries that can be running at once, above which start_query_execution
+            raises TooManyRequestsException (as athena does when an account's query concurrency is used up)
+        seed: seed for the random number generator used for jitter, throttling and failures
+    """
+
+    def __init__(self, latency = 0, jitter = 0, throttle_rate = 0, failure_rate = 0, max_calls_per_second = None, job_run_seconds = 0,
+                 query_run_seconds = 0, max_concurrent_queries = None, seed = None) :
+        self.default_policy = CallPolicy(latency, jitter, throttle_rate, failure_rate)
+        self.policies = {}
+        self.max_calls_per_second = {} if max_calls_per_second is None else dict(max_calls_per_second)
+        self.job_run_seconds = job_run_seconds
+        self.query_run_seconds = query_run_seconds
+        self.max_concurrent_queries = max_concurrent_queries
+
+        self.call_counts = Counter()
+        self.error_counts = Counter()
+
+        self.buckets = {}
+        self.multipart_uploads = {}
+        self.databases = {}
+        self.jobs = {}
+        self.job_runs = {}
+        self.job_outcomes = {}
+        self.query_executions = {}
+        self.query_results = []
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._fail_next = {}
+        self._recent_calls = {}
+        self._ids = itertools.count(1)
+        self._clients = {}
+
+    def client(self, service_name) :
+        with self._lock :
+            if service_name not in self._clients :
+                if service_name == 's3' :
+                    self._clients[service_name] = FakeS3Client(self)
+                elif service_name == 'glue' :
+                    self._clients[service_name] = FakeGlueClient(self)
+                elif service_name == 'athena' :
+                    self._clients[service_name] = FakeAthenaClient(self)
+                else :
+                    raise ValueError("FakeBackend does not implement the {} service".format(service_name))
+            return self._clients[service_name]
+
+    def set_policy(self, operation, latency = 0, jitter = 0, throttle_rate = 0, failure_rate = 0) :
+        """
+        Override the default CallPolicy for one operation. operation is 'service.operation' (e.g. 'glue.create_table')
+        or just a service name (e.g. 's3') to override every call to that service.
+        """
+        self.policies[operation] = CallPolicy(latency, jitter, throttle_rate, failure_rate)
+
+    def fail_next(self, operation, times = 1, error_code = None) :
+        """
+        Make the next `times` calls to operation ('service.operation') raise.
+        error_code defaults to the service's throttling error code.
+        """
+        with self._lock :
+            self._fail_next[operation] = [times, error_code]
+
+    def set_job_outcome(self, job_name, state = 'SUCCEEDED', error_message = None) :
+        """
+        Set the final state (e.g. 'FAILED') that runs of job_name finish in
+        """
+        self.job_outcomes[job_name] = (state, error_message)
+
+    def set_query_result(self, pattern, csv_text = '', column_types = None, state = 'SUCCEEDED', error_message = None, data_scanned_bytes = 0,
+                         run_seconds = None) :
+        """
+        Set what athena queries matching the regex pattern return. Later calls take precedence over earlier ones.
+        Queries that match no pattern succeed with an empty result.
+        Args:
+            csv_text: The result csv (with a header) written to the query's output location
+            column_types: list of athena types of the result columns (e.g. ['varchar', 'integer']), defaults to all varchar
+            state: The state the query finishes in (SUCCEEDED, FAILED or CANCELLED)
+            error_message: The StateChangeReason of a failed query
+            data_scanned_bytes: Reported in the query's Statistics
+            run_seconds: How long these queries stay RUNNING, defaults to query_run_seconds
+        """
+        with self._lock :
+            self.query_results.insert(0, (re.compile(pattern, re.S), {
+                'csv_text': csv_text, 'column_types': column_types, 'state': state,
+                'error_message': error_message, 'data_scanned_bytes': data_scanned_bytes, 'run_seconds': run_seconds
+            }))
+
+    def reset_counts(self) :
+        with self._lock :
+            self.call_counts.clear()
+            self.error_counts.clear()
+
+    def _policy(self, service_name, operation_name) :
+        key = "{}.{}".format(service_name, operation_name)
+        return self.policies.get(key, self.policies.get(service_name, self.default_policy))
+
+    def _before_call(self, service_name, operation_name) :
+        key = "{}.{}".format(service_name, operation_name)
+        policy = self._policy(service_name, operation_name)
+
+        with self._lock :
+            self.call_counts[key] += 1
+            sleep_for = policy.latency + (self._random.uniform(0, policy.jitter) if policy.jitter else 0)
+            roll = self._random.random()
+            error = None
+
+            if key in self._fail_next :
+                remaining, error_code = self._fail_next[key]
+                if remaining > 0 :
+                    self._fail_next[key][0] -= 1
+                    error = error_code if error_code is not None else THROTTLE_ERROR_CODES[service_name][0]
+
+            limit = self.max_calls_per_second.get(service_name)
+            if error is None and limit is not None :
+                now = time.monotonic()
+                recent = [t for t in self._recent_calls.get(service_name, []) if now - t < 1]
+                if len(recent) >= limit :
+                    error = THROTTLE_ERROR_CODES[service_name][0]
+                else :
+                    recent.append(now)
+                self._recent_calls[service_name] = recent
+
+            if error is None and roll < policy.throttle_rate :
+                error = THROTTLE_ERROR_CODES[service_name][0]
+            elif error is None and roll < policy.throttle_rate + policy.failure_rate :
+                error = FAILURE_ERROR_CODES[service_name][0]
+
+            if error is not None :
+                self.error_counts[key] += 1
+
+        if sleep_for > 0 :
+            time.sleep(sleep_for)
+
+        if error is not None :
+            codes = dict([THROTTLE_ERROR_CODES[service_name], FAILURE_ERROR_CODES[service_name]])
+            raise _client_error(error, "Injected by FakeBackend", operation_name, codes.get(error, 400))
+
+    def _new_id(self, prefix) :
+        return "{}_{:012d}".format(prefix, next(self._ids))
+
+class _FakeClient :
+
+    service_name = None
+    exception_names = ()
+
+    def __init__(self, backend) :
+        self._backend = backend
+        self._lock = backend._lock
+        self.exceptions = _FakeExceptions(self.exception_names)
+
+    def _call(self, operation_name) :
+        self._backend._before_call(self.service_name, operation_name)
+
+    def _error(self, name, message, operation_name, status_code = 400) :
+        return _client_error(name, message, operation_name, status_code, getattr(self.exceptions, name))
+
+    def get_paginator(self, operation_name) :
+        return _FakePaginator(self, operation_name)
+
+class _FakePaginator :
+    """
+    Paginator for the list operations, follows the same token fields as boto3
+    """
+
+    tokens = {
+        'list_objects_v2': ('ContinuationToken', 'NextContinuationToken'),
+        'list_objects': ('Marker', 'NextMarker'),
+        'get_tables': ('NextToken', 'NextToken'),
+        'get_databases': ('NextToken', 'NextToken'),
+        'get_partitions': ('NextToken', 'NextToken'),
+        'get_query_results': ('NextToken', 'NextToken'),
+    }
+
+    def __init__(self, client, operation_name) :
+        if operation_name not in self.tokens :
+            raise ValueError("FakeBackend cannot paginate {}".format(operation_name))
+        self._client = client
+        self._operation_name = operation_name
+
+    def paginate(self, **kwargs) :
+        input_token, output_token = self.tokens[self._operation_name]
+        kwargs = dict(kwargs)
+        kwargs.pop('PaginationConfig', None)
+        while True :
+            page = getattr(self._client, self._operation_name)(**kwargs)
+            yield page
+            next_token = page.get(output_token)
+            if not page.get('IsTruncated', next_token is not None) or next_token is None :
+                break
+            kwargs[input_token] = next_token
+
+class FakeStreamingBody(io.BytesIO) :
+    """
+    Behaves like botocore's StreamingBody
+    """
+
+    def iter_chunks(self, chunk_size = 1024) :
+        while True :
+            chunk = self.read(chunk_size)
+            if not chunk :
+                break
+            yield chunk
+
+    def iter_lines(self, chunk_size = 1024, keepends = False) :
+        for line in self.getvalue()[self.tell():].splitlines(keepends) :
+            yield line
+        self.seek(0, io.SEEK_END)
+
+class _FakeObject :
+
+    def __init__(self, body, metadata = None, etag = None, content_type = None, encryption = None) :
+        self.body = body
+        self.etag = '"{}"'.format(hashlib.md5(body).hexdigest()) if etag is None else etag
+        self.last_modified = _now()
+        self.metadata = {} if metadata is None else dict(metadata)
+        self.content_type = 'binary/octet-stream' if content_type is None else content_type
+        # ServerSideEncryption and SSEKMSKeyId, as head_object returns them
+        self.encryption = {} if encryption is None else dict(encryption)
+        if _is_kms(self.encryption) :
+            self.etag = _kms_etag(self.etag)
+
+def _is_kms(encryption) :
+    return encryption.get('ServerSideEncryption') == 'aws:kms'
+
+def _kms_etag(etag) :
+    # The ETags of SSE-KMS objects (and their parts) aren't md5s of the content, the part count of a multipart ETag is kept
+    suffix = etag.strip('"').partition('-')[2]
+    return '"{:032x}{}"'.format(random.getrandbits(128), '-' + suffix if suffix else '')
+
+def _encryption(kwargs) :
+    return dict((k, kwargs[k]) for k in ('ServerSideEncryption', 'SSEKMSKeyId') if kwargs.get(k) is not None)
+
+def _to_bytes(body) :
+    if body is None :
+        return b''
+    if isinstance(body, str) :
+        return body.encode('utf-8')
+    if isinstance(body, (bytes, bytearray)) :
+        return bytes(body)
+    data = body.read()
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+class FakeS3Client(_FakeClient) :
+
+    service_name = 's3'
+    exception_names = ('NoSuchKey', 'NoSuchBucket', 'NoSuchUpload', 'InvalidRequest', 'InvalidPart', 'InvalidPartOrder', 'EntityTooSmall', 'ClientError')
+
+    def _bucket(self, bucket, operation_name, create = False) :
+        if bucket not in self._backend.buckets :
+            if not create :
+                raise self._error('NoSuchBucket', 'The specified bucket does not exist', operation_name, 404)
+            self._backend.buckets[bucket] = {}
+        return self._backend.buckets[bucket]
+
+    def _get(self, bucket, key, operation_name) :
+        objects = self._bucket(bucket, operation_name)
+        if key not in objects :
+            raise self._error('NoSuchKey', 'The specified key does not exist.', operation_name, 404)
+        return objects[key]
+
+    def create_bucket(self, Bucket, **kwargs) :
+        self._call('create_bucket')
+        with self._lock :
+            self._bucket(Bucket, 'create_bucket', create = True)
+        return {'Location': '/' + Bucket}
+
+    def put_object(self, Bucket, Key, Body = None, Metadata = None, ContentType = None, **kwargs) :
+        self._call('put_object')
+        obj = _FakeObject(_to_bytes(Body), Metadata, content_type = ContentType, encryption = _encryption(kwargs))
+        with self._lock :
+            self._bucket(Bucket, 'put_object', create = True)[Key] = obj
+        return {'ETag': obj.etag}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs = None, Callback = None, Config = None) :
+        self._call('upload_file')
+        with open(Filename, 'rb') as f :
+            obj = _FakeObject(f.read())
+        with self._lock :
+            self._bucket(Bucket, 'upload_file', create = True)[Key] = obj
+        if Callback is not None :
+            Callback(len(obj.body))
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs = None, Callback = None, Config = None) :
+        self._call('upload_fileobj')
+        obj = _FakeObject(_to_bytes(Fileobj))
+        with self._lock :
+            self._bucket(Bucket, 'upload_fileobj', create = True)[Key] = obj
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs = None, Callback = None, Config = None) :
+        self._call('download_file')
+        with self._lock :
+            obj = self._get(Bucket, Key, 'download_file')
+        with open(Filename, 'wb') as f :
+            f.write(obj.body)
+
+    def get_object(self, Bucket, Key, Range = None, **kwargs) :
+        self._call('get_object')
+        with self._lock :
+            obj = self._get(Bucket, Key, 'get_object')
+        body = obj.body
+        response = {}
+        if Range is not None :
+            start, end = Range.replace('bytes=', '').split('-')
+            if start == '' :
+                start, end = max(len(body) - int(end), 0), len(body) - 1
+            start = int(start)
+            end = len(body) - 1 if end == '' else min(int(end), len(body) - 1)
+            response['ContentRange'] = 'bytes {}-{}/{}'.format(start, end, len(body))
+            body = body[start:end + 1]
+        response.update({
+            'Body': FakeStreamingBody(body),
+            'ContentLength': len(body),
+            'ETag': obj.etag,
+            'LastModified': obj.last_modified,
+            'Metadata': dict(obj.metadata)
+        })
+        return response
+
+    def head_object(self, Bucket, Key, **kwargs) :
+        self._call('head_object')
+        with self._lock :
+            objects = self._backend.buckets.get(Bucket, {})
+            if Key not in objects :
+                raise _client_error('404', 'Not Found', 'HeadObject', 404)
+            obj = objects[Key]
+        return dict({'ContentLength': len(obj.body), 'ETag': obj.etag, 'LastModified': obj.last_modified, 'Metadata': dict(obj.metadata),
+                     'ContentType': obj.content_type}, **obj.encryption)
+
+    def _copy_source(self, CopySource, operation_name) :
+        if isinstance(CopySource, str) :
+            source_bucket, source_key = CopySource.lstrip('/').split('/', 1)
+        else :
+            source_bucket, source_key = CopySource['Bucket'], CopySource['Key']
+        return self._get(source_bucket, source_key, operation_name)
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs) :
+        self._call('copy_object')
+        with self._lock :
+            source = self._copy_source(CopySource, 'copy_object')
+            if len(source.body) > MAX_COPY_OBJECT_SIZE :
+                raise self._error('InvalidRequest', 'The specified copy source is larger than the maximum allowable size for a copy source: 5368709120', 'copy_object')
+            obj = _FakeObject(source.body, source.metadata, content_type = source.content_type, encryption = source.encryption)
+            self._bucket(Bucket, 'copy_object', create = True)[Key] = obj
+        return {'CopyObjectResult': {'ETag': obj.etag, 'LastModified': obj.last_modified}}
+
+    def create_multipart_upload(self, Bucket, Key, Metadata = None, ContentType = None, **kwargs) :
+        self._call('create_multipart_upload')
+        with self._lock :
+            self._bucket(Bucket, 'create_multipart_upload', create = True)
+            upload_id = 'upload-{}'.format(next(self._backend._ids))
+            self._backend.multipart_uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'Metadata': Metadata, 'ContentType': ContentType,
+                                                          'encryption': _encryption(kwargs), 'parts': {}}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def _upload(self, UploadId, Bucket, Key, operation_name) :
+        upload = self._backend.multipart_uploads.get(UploadId)
+        if upload is None or (upload['Bucket'], upload['Key']) != (Bucket, Key) :
+            raise self._error('NoSuchUpload', 'The specified upload does not exist.', operation_name, 404)
+        return upload
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs) :
+        self._call('upload_part')
+        body = _to_bytes(Body)
+        with self._lock :
+            upload = self._upload(UploadId, Bucket, Key, 'upload_part')
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if _is_kms(upload['encryption']) :
+                etag = _kms_etag(etag)
+            upload['parts'][PartNumber] = (etag, body)
+        return {'ETag': etag}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange = None, **kwargs) :
+        self._call('upload_part_copy')
+        with self._lock :
+            upload = self._upload(UploadId, Bucket, Key, 'upload_part_copy')
+            body = self._copy_source(CopySource, 'upload_part_copy').body
+            if CopySourceRange is not None :
+                start, end = CopySourceRange.replace('bytes=', '').split('-')
+                body = body[int(start):int(end) + 1]
+            if len(body) > MAX_COPY_OBJECT_SIZE :
+                raise self._error('InvalidRequest', 'Part size is larger than the maximum allowable size: 5368709120', 'upload_part_copy')
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if _is_kms(upload['encryption']) :
+                etag = _kms_etag(etag)
+            upload['parts'][PartNumber] = (etag, body)
+        return {'CopyPartResult': {'ETag': etag, 'LastModified': _now()}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs) :
+        self._call('complete_multipart_upload')
+        with self._lock :
+            upload = self._upload(UploadId, Bucket, Key, 'complete_multipart_upload')
+            parts = MultipartUpload['Parts']
+            if [p['PartNumber'] for p in parts] != sorted(p['PartNumber'] for p in parts) :
+                raise self._error('InvalidPartOrder', 'The list of parts was not in ascending order.', 'complete_multipart_upload')
+            bodies = []
+            for i, p in enumerate(parts) :
+                stored = upload['parts'].get(p['PartNumber'])
+                if stored is None or stored[0] != p['ETag'] :
+                    raise self._error('InvalidPart', 'One or more of the specified parts could not be found.', 'complete_multipart_upload')
+                if i < len(parts) - 1 and len(stored[1]) < MIN_MULTIPART_PART_SIZE :
+                    raise self._error('EntityTooSmall', 'Your proposed upload is smaller than the minimum allowed size', 'complete_multipart_upload')
+                bodies.append(stored[1])
+            digests = b''.join(hashlib.md5(b).digest() for b in bodies)
+            etag = '"{}-{}"'.format(hashlib.md5(digests).hexdigest(), len(parts))
+            obj = _FakeObject(b''.join(bodies), upload['Metadata'], etag, upload['ContentType'], upload['encryption'])
+            self._bucket(Bucket, 'complete_multipart_upload')[Key] = obj
+            del self._backend.multipart_uploads[UploadId]
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': obj.etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs) :
+        self._call('abort_multipart_upload')
+        with self._lock :
+            self._upload(UploadId, Bucket, Key, 'abort_multipart_upload')
+            del self._backend.multipart_uploads[UploadId]
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs) :
+        self._call('delete_object')
+        with self._lock :
+            self._backend.buckets.get(Bucket, {}).pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs) :
+        self._call('delete_objects')
+        keys = [o['Key'] for o in Delete['Objects']]
+        if len(keys) > 1000 :
+            raise _client_error('MalformedXML', 'delete_objects accepts at most 1000 keys', 'DeleteObjects')
+        with self._lock :
+            objects = self._backend.buckets.get(Bucket, {})
+            for k in keys :
+                objects.pop(k, None)
+        if Delete.get('Quiet') :
+            return {}
+        return {'Deleted': [{'Key': k} for k in keys]}
+
+    def _list(self, Bucket, Prefix, start_after, MaxKeys, Delimiter, operation_name) :
+        with self._lock :
+            objects = self._bucket(Bucket, operation_name)
+            keys = sorted(k for k in objects if k.startswith(Prefix) and k > start_after)
+            contents = []
+            common_prefixes = []
+            last_key = None
+            is_truncated = False
+            for k in keys :
+                rest = k[len(Prefix):]
+                if Delimiter and Delimiter in rest :
+                    common = Prefix + rest.split(Delimiter)[0] + Delimiter
+                    if common not in common_prefixes :
+                        if len(contents) + len(common_prefixes) >= MaxKeys :
+                            is_truncated = True
+                            break
+                        common_prefixes.append(common)
+                else :
+                    if len(contents) + len(common_prefixes) >= MaxKeys :
+                        is_truncated = True
+                        break
+                    obj = objects[k]
+                    contents.append({'Key': k, 'Size': len(obj.body), 'ETag': obj.etag, 'LastModified': obj.last_modified})
+                last_key = k
+        return contents, common_prefixes, is_truncated, last_key
+
+    def list_objects_v2(self, Bucket, Prefix = '', ContinuationToken = None, StartAfter = '', MaxKeys = 1000, Delimiter = None, **kwargs) :
+        self._call('list_objects_v2')
+        start_after = ContinuationToken if ContinuationToken is not None else StartAfter
+        contents, common_prefixes, is_truncated, last_key = self._list(Bucket, Prefix, start_after, MaxKeys, Delimiter, 'list_objects_v2')
+        response = {'KeyCount': len(contents) + len(common_prefixes), 'IsTruncated': is_truncated, 'Prefix': Prefix, 'MaxKeys': MaxKeys}
+        if contents :
+            response['Contents'] = contents
+        if common_prefixes :
+            response['CommonPrefixes'] = [{'Prefix': p} for p in common_prefixes]
+        if is_truncated :
+            response['NextContinuationToken'] = last_key
+        return response
+
+    def list_objects(self, Bucket, Prefix = '', Marker = '', MaxKeys = 1000, Delimiter = None, **kwargs) :
+        self._call('list_objects')
+        contents, common_prefixes, is_truncated, last_key = self._list(Bucket, Prefix, Marker, MaxKeys, Delimiter, 'list_objects')
+        response = {'IsTruncated': is_truncated, 'Prefix': Prefix, 'MaxKeys': MaxKeys}
+        if contents :
+            response['Contents'] = contents
+        if common_prefixes :
+            response['CommonPrefixes'] = [{'Prefix': p} for p in common_prefixes]
+        if is_truncated :
+            response['NextMarker'] = last_key
+        return response
+
+class FakeGlueClient(_FakeClient) :
+
+    service_name = 'glue'
+    exception_names = ('EntityNotFoundException', 'AlreadyExistsException', 'InvalidInputException', 'ThrottlingException', 'ClientError')
+
+    def _database(self, name, operation_name) :
+        if name not in self._backend.databases :
+            raise self._error('EntityNotFoundException', 'Database {} not found.'.format(name), operation_name)
+        return self._backend.databases[name]
+
+    def _table(self, database_name, name, operation_name) :
+        tables = self._database(database_name, operation_name)['tables']
+        if name not in tables :
+            raise self._error('EntityNotFoundException', 'Table {} not found.'.format(name), operation_name)
+        return tables[name]
+
+    def _job(self, name, operation_name) :
+        if name not in self._backend.jobs :
+            raise self._error('EntityNotFoundException', 'Job {} not found.'.format(name), operation_name)
+        return self._backend.jobs[name]
+
+    def create_database(self, DatabaseInput, **kwargs) :
+        self._call('create_database')
+        with self._lock :
+            name = DatabaseInput['Name']
+            if name in self._backend.databases :
+                raise self._error('AlreadyExistsException', 'Database already exists.', 'create_database')
+            database = deepcopy(DatabaseInput)
+            database['CreateTime'] = _now()
+            self._backend.databases[name] = {'database': database, 'tables': {}}
+        return {}
+
+    def get_database(self, Name, **kwargs) :
+        self._call('get_database')
+        with self._lock :
+            return {'Database': deepcopy(self._database(Name, 'get_database')['database'])}
+
+    def get_databases(self, NextToken = None, MaxResults = 100, **kwargs) :
+        self._call('get_databases')
+        with self._lock :
+            names = sorted(self._backend.databases)
+            start = int(NextToken) if NextToken else 0
+            page = [deepcopy(self._backend.databases[n]['database']) for n in names[start:start + MaxResults]]
+        response = {'DatabaseList': page}
+        if start + MaxResults < len(names) :
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+    def delete_database(self, Name, **kwargs) :
+        self._call('delete_database')
+        with self._lock :
+            self._database(Name, 'delete_database')
+            del self._backend.databases[Name]
+        return {}
+
+    def create_table(self, DatabaseName, TableInput, **kwargs) :
+        self._call('create_table')
+        with self._lock :
+            tables = self._database(DatabaseName, 'create_table')['tables']
+            name = TableInput['Name']
+            if name in tables :
+                raise self._error('AlreadyExistsException', 'Table already exists.', 'create_table')
+            table = deepcopy(TableInput)
+            table['DatabaseName'] = DatabaseName
+            table['CreateTime'] = _now()
+            tables[name] = {'table': table, 'partitions': {}}
+        return {}
+
+    def update_table(self, DatabaseName, TableInput, **kwargs) :
+        self._call('update_table')
+        with self._lock :
+            entry = self._table(DatabaseName, TableInput['Name'], 'update_table')
+            table = deepcopy(TableInput)
+            table['DatabaseName'] = DatabaseName
+            table['CreateTime'] = entry['table']['CreateTime']
+            entry['table'] = table
+        return {}
+
+    def get_table(self, DatabaseName, Name, **kwargs) :
+        self._call('get_table')
+        with self._lock :
+            return {'Table': deepcopy(self._table(DatabaseName, Name, 'get_table')['table'])}
+
+    def get_tables(self, DatabaseName, NextToken = None, MaxResults = 100, **kwargs) :
+        self._call('get_tables')
+        with self._lock :
+            tables = self._database(DatabaseName, 'get_tables')['tables']
+            names = sorted(tables)
+            start = int(NextToken) if NextToken else 0
+            page = [deepcopy(tables[n]['table']) for n in names[start:start + MaxResults]]
+        response = {'TableList': page}
+        if start + MaxResults < len(names) :
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+    def delete_table(self, DatabaseName, Name, **kwargs) :
+        self._call('delete_table')
+        with self._lock :
+            self._table(DatabaseName, Name, 'delete_table')
+            del self._backend.databases[DatabaseName]['tables'][Name]
+        return {}
+
+    def batch_create_partition(self, DatabaseName, TableName, PartitionInputList, **kwargs) :
+        self._call('batch_create_partition')
+        if len(PartitionInputList) > 100 :
+            raise self._error('InvalidInputException', 'At most 100 partitions can be created in one call.', 'batch_create_partition')
+        errors = []
+        with self._lock :
+            entry = self._table(DatabaseName, TableName, 'batch_create_partition')
+            for partition_input in PartitionInputList :
+                values = tuple(partition_input['Values'])
+                if values in entry['partitions'] :
+                    errors.append({
+                        'PartitionValues': list(values),
+                        'ErrorDetail': {'ErrorCode': 'AlreadyExistsException', 'ErrorMessage': 'Partition already exists.'}
+                    })
+                    continue
+                partition = deepcopy(partition_input)
+                partition.update({'DatabaseName': DatabaseName, 'TableName': TableName, 'CreationTime': _now()})
+                entry['partitions'][values] = partition
+        return {'Errors': errors} if errors else {}
+
+    def get_partitions(self, DatabaseName, TableName, NextToken = None, MaxResults = 1000, **kwargs) :
+        self._call('get_partitions')
+        with self._lock :
+            partitions = self._table(DatabaseName, TableName, 'get_partitions')['partitions']
+            keys = sorted(partitions)
+            start = int(NextToken) if NextToken else 0
+            page = [deepcopy(partitions[k]) for k in keys[start:start + MaxResults]]
+        response = {'Partitions': page}
+        if start + MaxResults < len(keys) :
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+    def create_job(self, Name, **kwargs) :
+        self._call('create_job')
+        with self._lock :
+            if Name in self._backend.jobs :
+                raise self._error('AlreadyExistsException', 'Job {} already exists.'.format(Name), 'create_job')
+            job = deepcopy(kwargs)
+            job['Name'] = Name
+            job['CreatedOn'] = _now()
+            self._backend.jobs[Name] = job
+        return {'Name': Name}
+
+    def get_job(self, JobName, **kwargs) :
+        self._call('get_job')
+        with self._lock :
+            return {'Job': deepcopy(self._job(JobName, 'get_job'))}
+
+    def delete_job(self, JobName, **kwargs) :
+        # Like the real API, deleting a job that doesn't exist is not an error
+        self._call('delete_job')
+        with self._lock :
+            self._backend.jobs.pop(JobName, None)
+        return {'JobName': JobName}
+
+    def start_job_run(self, JobName, Arguments = None, **kwargs) :
+        self._call('start_job_run')
+        with self._lock :
+            self._job(JobName, 'start_job_run')
+            run_id = self._backend._new_id('jr')
+            self._backend.job_runs[(JobName, run_id)] = {
+                'Id': run_id,
+                'JobName': JobName,
+                'Arguments': {} if Arguments is None else dict(Arguments),
+                'StartedOn': _now(),
+                '_started': time.monotonic()
+            }
+        return {'JobRunId': run_id}
+
+    def get_job_run(self, JobName, RunId, **kwargs) :
+        self._call('get_job_run')
+        with self._lock :
+            if (JobName, RunId) not in self._backend.job_runs :
+                raise self._error('EntityNotFoundException', 'Job run {} not found.'.format(RunId), 'get_job_run')
+            run = dict(self._backend.job_runs[(JobName, RunId)])
+        started = run.pop('_started')
+        if time.monotonic() - started < self._backend.job_run_seconds :
+            run['JobRunState'] = 'RUNNING'
+        else :
+            state, error_message = self._backend.job_outcomes.get(JobName, ('SUCCEEDED', None))
+            run['JobRunState'] = state
+            if error_message is not None :
+                run['ErrorMessage'] = error_message
+        return {'JobRun': run}
+
+class FakeAthenaClient(_FakeClient) :
+
+    service_name = 'athena'
+    exception_names = ('InvalidRequestException', 'TooManyRequestsException', 'ClientError')
+
+    def _result_for(self, query) :
+        for pattern, result in self._backend.query_results :
+            if pattern.search(query) :
+                return result
+        return {'csv_text': '', 'column_types': None, 'state': 'SUCCEEDED', 'error_message': None, 'data_scanned_bytes': 0, 'run_seconds': None}
+
+    def _execution(self, query_execution_id, operation_name) :
+        if query_execution_id not in self._backend.query_executions :
+            raise self._error('InvalidRequestException', 'QueryExecution {} was not found'.format(query_execution_id), operation_name)
+        execution = self._backend.query_executions[query_execution_id]
+        run_seconds = execution['_result']['run_seconds']
+        run_seconds = self._backend.query_run_seconds if run_seconds is None else run_seconds
+        if execution['Status']['State'] == 'RUNNING' and time.monotonic() - execution['_started'] >= run_seconds :
+            self._finish(execution)
+        return execution
+
+    def _finish(self, execution) :
+        result = execution['_result']
+        execution['Status']['State'] = result['state']
+        execution['Status']['CompletionDateTime'] = _now()
+        execution['Statistics']['EngineExecutionTimeInMillis'] = int((time.monotonic() - execution['_started']) * 1000)
+        if result['state'] == 'SUCCEEDED' :
+            execution['Statistics']['DataScannedInBytes'] = result['data_scanned_bytes']
+            bucket, key = execution['ResultConfiguration']['OutputLocation'].replace('s3://', '').split('/', 1)
+            self._backend.buckets.setdefault(bucket, {})[key] = _FakeObject(_to_bytes(result['csv_text']))
+        elif result['error_message'] is not None :
+            execution['Status']['StateChangeReason'] = result['error_message']
+
+    def _running_count(self) :
+        return sum(1 for query_execution_id in list(self._backend.query_executions)
+                   if self._execution(query_execution_id, 'start_query_execution')['Status']['State'] == 'RUNNING')
+
+    def start_query_execution(self, QueryString, QueryExecutionContext = None, ResultConfiguration = None, WorkGroup = None, **kwargs) :
+        self._call('start_query_execution')
+        output_location = (ResultConfiguration or {}).get('OutputLocation')
+        if output_location is None :
+            raise self._error('InvalidRequestException', 'No output location provided', 'start_query_execution')
+        with self._lock :
+            limit = self._backend.max_concurrent_queries
+            if limit is not None and self._running_count() >= limit :
+                raise self._error('TooManyRequestsException', 'Too many queries running', 'start_query_execution')
+            query_execution_id = self._backend._new_id('qe')
+            execution = {
+                'QueryExecutionId': query_execution_id,
+                'Query': QueryString,
+                'QueryExecutionContext': dict(QueryExecutionContext or {}),
+                'ResultConfiguration': {'OutputLocation': output_location.rstrip('/') + '/' + query_execution_id + '.csv'},
+                'WorkGroup': WorkGroup or 'primary',
+                'Status': {'State': 'RUNNING', 'SubmissionDateTime': _now()},
+                'Statistics': {'DataScannedInBytes': 0, 'EngineExecutionTimeInMillis': 0},
+                '_result': self._result_for(QueryString),
+                '_started': time.monotonic()
+            }
+            self._backend.query_executions[query_execution_id] = execution
+            self._execution(query_execution_id, 'start_query_execution')
+        return {'QueryExecutionId': query_execution_id}
+
+    def get_query_execution(self, QueryExecutionId, **kwargs) :
+        self._call('get_query_execution')
+        with self._lock :
+            execution = self._execution(QueryExecutionId, 'get_query_execution')
+            return {'QueryExecution': deepcopy(dict((k, v) for k, v in execution.items() if not k.startswith('_')))}
+
+    def stop_query_execution(self, QueryExecutionId, **kwargs) :
+        self._call('stop_query_execution')
+        with self._lock :
+            execution = self._execution(QueryExecutionId, 'stop_query_execution')
+            if execution['Status']['State'] in ('QUEUED', 'RUNNING') :
+                execution['Status']['State'] = 'CANCELLED'
+                execution['Status']['CompletionDateTime'] = _now()
+        return {}
+
+    def get_query_results(self, QueryExecutionId, NextToken = None, MaxResults = 1000, **kwargs) :
+        self._call('get_query_results')
+        with self._lock :
+            execution = self._execution(QueryExecutionId, 'get_query_results')
+            if execution['Status']['State'] != 'SUCCEEDED' :
+                raise self._error('InvalidRequestException', 'Query has not yet finished. Current state: {}'.format(execution['Status']['State']), 'get_query_results')
+            result = execution['_result']
+        rows = list(csv.reader(io.StringIO(result['csv_text'])))
+        header = rows[0] if rows else []
+        column_types = result['column_types'] or ['varchar'] * len(header)
+        start = int(NextToken or 0)
+        response = {
+            'ResultSet': {
+                'Rows': [{'Data': [{'VarCharValue': v} for v in row]} for row in rows[start:start + MaxResults]],
+                'ResultSetMetadata': {'ColumnInfo': [{'Name': n, 'Label': n, 'Type': t} for n, t in zip(header, column_types)]}
+            }
+        }
+        if start + MaxResults < len(rows) :
+            response['NextToken'] = str(start + MaxResults)
+        return response
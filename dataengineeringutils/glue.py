@@ -1,63 +1,68 @@
-import pandas as pd
 import os
 import re
-import numpy as np
-import boto3
 import json
-import pkg_resources
 import time
-from urllib.request import urlretrieve
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import dataengineeringutils.meta as meta_utils
-from dataengineeringutils.datatypes import translate_metadata_type_to_type
+from dataengineeringutils.datatypes import translate_metadata_type_to_type, translate_metadata_types_to_types
 from dataengineeringutils.utils import dict_merge, read_json, _end_with_slash
+from dataengineeringutils.partitions import partition_path
 from dataengineeringutils.s3 import s3_path_to_bucket_key, upload_file_to_s3_from_path, delete_folder_from_bucket, get_file_list_from_bucket, s3_path_to_bytes_io
+import dataengineeringutils.s3 as s3_utils
+from dataengineeringutils.backend import get_client
+from dataengineeringutils.compression import resolve_codec
+from dataengineeringutils.rate_limit import glue_rate_limiter
+from dataengineeringutils.templates import table_templates, get_glue_job_template
+from dataengineeringutils.catalogue import MetadataCatalogue
 
 from io import StringIO
-glue_client = boto3.client('glue', 'eu-west-1')
-s3_resource = boto3.resource('s3')
-s3_client = boto3.client('s3')
+
+def __getattr__(name):
+    # glue_client, s3_client and s3_resource used to be module level boto3 clients, they now come from the current backend
+    if name == 'glue_client':
+        return _glue_client()
+    if name == 's3_client':
+        return get_client('s3')
+    if name == 's3_resource':
+        import boto3
+        return boto3.resource('s3')
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
 
 import logging
 log = logging.getLogger(__name__)
 
-def df_to_csv_s3(df, bucket, path, index=False, header=False):
+def _glue_client():
+    # Every glue call made by this module goes through the process wide rate limiter (see rate_limit.py)
+    return glue_rate_limiter.wrap(get_client('glue'))
+
+def df_to_csv_s3(df, bucket, path, index=False, header=False, compression="infer"):
     """
     Takes a pandas dataframe and writes out to s3
+    Files with a .gz, .bz2, .xz or .zst extension (or compression=codec) are compressed as they're written
     """
-    csv_buffer = StringIO()
-
     #Skip headers is necessary for now - see here: https://twitter.com/esh/status/811396849756041217
+    if resolve_codec(path, compression) is not None:
+        s3_utils.upload_to_s3(s3_utils._csv_writer(df, (), {"index": index, "header": header}), "s3://{}/{}".format(bucket, path), compression)
+        return
+
+    csv_buffer = StringIO()
     df.to_csv(csv_buffer, index=index, header=header)
 
-    s3_f = s3_resource.Object(bucket, path)
-    response = s3_f.put(Body=csv_buffer.getvalue())
+    response = get_client('s3').put_object(Bucket=bucket, Key=path, Body=csv_buffer.getvalue())
+    s3_utils.listing_cache.invalidate(bucket, path)
 
 
 def get_table_definition_template(template_type = 'csv', **kwargs):
     """Get a definition template that can be used with Glue for the various template types
 
+    Templates are loaded once and copied, see dataengineeringutils.templates (extra formats can be registered there)
+
     Args:
         template_type: Allowed values are {'csv', 'parquet', 'avro', 'orc'}
         **kwargs: Arbitrary keyword arguments which will be added to the template
     """
-    base_io = pkg_resources.resource_stream(__name__, "specs/base.json")
-    base = json.load(base_io)
-
-    conversion = {
-        "avro": pkg_resources.resource_stream(__name__, "specs/avro_specific.json"),
-        "csv": pkg_resources.resource_stream(__name__, "specs/csv_specific.json"),
-        "csv_quoted_nodate": pkg_resources.resource_stream(__name__, "specs/csv_quoted_nodate_specific.json"),
-        "regex": pkg_resources.resource_stream(__name__, "specs/regex_specific.json"),
-        "orc": pkg_resources.resource_stream(__name__, "specs/orc_specific.json"),
-        "par": pkg_resources.resource_stream(__name__, "specs/par_specific.json"),
-        "parquet": pkg_resources.resource_stream(__name__, "specs/par_specific.json")
-        }
-
-    specific_io = conversion[template_type]
-    specific = json.load(specific_io)
-    dict_merge(base, specific)
-    dict_merge(base, kwargs)
-    return base
+    return table_templates.get(template_type, **kwargs)
 
 
 def overwrite_or_create_database(db_name, db_description=""):
@@ -71,10 +76,11 @@ def overwrite_or_create_database(db_name, db_description=""):
         }
     }
 
+    glue_client = _glue_client()
     try:
         glue_client.delete_database(Name=db_name)
         log.debug("Deleting database: {}".format(db_name))
-    except :
+    except glue_client.exceptions.EntityNotFoundException:
         pass
 
     log.debug("Creating database: {}".format(db_name))
@@ -82,12 +88,13 @@ def overwrite_or_create_database(db_name, db_description=""):
 
 # Add table to database in glue
 def create_table_in_glue_from_def(db_name, table_name, table_spec) :
+    glue_client = _glue_client()
     try :
         glue_client.delete_table(
             DatabaseName=db_name,
             Name=table_name
         )
-    except :
+    except glue_client.exceptions.EntityNotFoundException:
         pass
 
     response = glue_client.create_table(
@@ -97,8 +104,7 @@ def create_table_in_glue_from_def(db_name, table_name, table_spec) :
 
 def create_glue_job_definition(**kwargs):
 
-    template_io = pkg_resources.resource_stream(__name__, "specs/glue_job.json")
-    template = json.load(template_io)
+    template = get_glue_job_template()
 
     if 'Name' in kwargs:
         template["Name"] = kwargs['Name']
@@ -150,8 +156,10 @@ def take_script_and_run_job(input_script_path, output_script_path, role, job_nam
     """
     See https://github.com/awsdocs/aws-glue-developer-guide/blob/1d6cb6174ee1f182c7da7e44f4071c6f10dfbe63/doc_source/aws-glue-programming-python-glue-arguments.md
     """
-    s3_f = s3_resource.Object(script_bucket, output_script_path)
-    response= s3_f.put(Body=open(input_script_path, "rb"))
+    glue_client = _glue_client()
+    with open(input_script_path, "rb") as f:
+        response = get_client('s3').put_object(Bucket=script_bucket, Key=output_script_path, Body=f)
+    s3_utils.listing_cache.invalidate(script_bucket, output_script_path)
 
     job = {'AllocatedCapacity': 2,
      'Command': {
@@ -173,24 +181,39 @@ def get_glue_column_spec_from_metadata(metadata):
     Use metadata to create a column spec which will fit into the Glue table template
     """
     columns = metadata["columns"]
+    glue_types = translate_metadata_types_to_types(columns, "glue")
     glue_columns = []
-    for c in columns:
+    for c, glue_type in zip(columns, glue_types):
         new_c = {}
         new_c["Name"] = c["name"]
         new_c["Comment"] = c["description"]
-        new_c["Type"] = translate_metadata_type_to_type(c["type"], "glue")
+        new_c["Type"] = glue_type
+        if "statistics" in c:
+            new_c["Parameters"] = _statistics_to_parameters(c["statistics"])
         glue_columns.append(new_c)
     return glue_columns
 
+def _statistics_to_parameters(statistics):
+    """
+    Glue parameters are strings, statistics that weren't recorded (None) are left out
+    """
+    return dict((k, str(v)) for k, v in statistics.items() if v is not None)
+
+
+def _table_location(tbl_metadata, db_metadata):
+    """
+    Table locations are relative to the database location, unless they are a full s3:// path
+    """
+    if tbl_metadata["location"].startswith("s3://"):
+        return tbl_metadata["location"]
+    return os.path.join(db_metadata["location"], tbl_metadata["location"])
 
 def metadata_to_glue_table_definition(tbl_metadata, db_metadata):
     """
     Use metadata in json format to create a table definition
     """
 
-    database_location = db_metadata["location"]
-    table_location_relative = tbl_metadata["location"]
-    table_location_absolute = os.path.join(database_location, table_location_relative)
+    table_location_absolute = _table_location(tbl_metadata, db_metadata)
 
     template_type = tbl_metadata["data_format"]
     table_definition = get_table_definition_template(template_type)
@@ -213,6 +236,10 @@ def metadata_to_glue_table_definition(tbl_metadata, db_metadata):
             cols = [col for col in cols if col["Name"] not in pk_names]
             table_definition["StorageDescriptor"]["Columns"] = cols
 
+    # Statistics from dataengineeringutils.profiling
+    if "statistics" in tbl_metadata:
+        table_definition["Parameters"]["recordCount"] = str(tbl_metadata["statistics"]["row_count"])
+
     return table_definition
 
 def populate_glue_catalogue_from_metadata(table_metadata, db_metadata, check_existence = True):
@@ -226,6 +253,7 @@ def populate_glue_catalogue_from_metadata(table_metadata, db_metadata, check_exi
     table_name = table_metadata["table_name"]
 
     tbl_def = metadata_to_glue_table_definition(table_metadata, db_metadata)
+    glue_client = _glue_client()
 
     if check_existence:
         try:
@@ -243,10 +271,53 @@ def populate_glue_catalogue_from_metadata(table_metadata, db_metadata, check_exi
         TableInput=tbl_def)
 
 
-def metadata_folder_to_database(folder_path, delete_db = True, db_suffix = None, explicit_database_name = None, explicit_database_location = None):
+def register_partitions(database_name, table_name, partitions):
+    """
+    Add partitions to a table in the glue catalogue (like MSCK REPAIR TABLE, but only for the partitions given).
+    Each partition's location is its hive style folder under the table location and the rest of its storage descriptor
+    is copied from the table. Partitions that already exist are skipped.
+    Args:
+        database_name: Glue database name
+        table_name: Glue table name
+        partitions: list of dicts of partition key to value e.g. [{'year': '2018', 'region': 'north'}]
+    Returns:
+        The number of partitions created
+    """
+    glue_client = _glue_client()
+    table = glue_client.get_table(DatabaseName=database_name, Name=table_name)['Table']
+    pk_names = [pk['Name'] for pk in table.get('PartitionKeys', [])]
+    if not pk_names:
+        raise ValueError("{}.{} has no partition keys".format(database_name, table_name))
+    table_location = _end_with_slash(table['StorageDescriptor']['Location'])
+
+    partition_inputs = []
+    for partition in partitions:
+        if set(partition) != set(pk_names):
+            raise ValueError("Partition {} doesn't match the partition keys of {}.{} ({})".format(partition, database_name, table_name, ", ".join(pk_names)))
+        storage_descriptor = dict(table['StorageDescriptor'])
+        storage_descriptor['Location'] = table_location + partition_path(pk_names, dict((k, str(partition[k])) for k in pk_names))
+        partition_inputs.append({'Values': [str(partition[k]) for k in pk_names], 'StorageDescriptor': storage_descriptor})
+
+    created = 0
+    for i in range(0, len(partition_inputs), 100):
+        batch = partition_inputs[i:i + 100]
+        response = glue_client.batch_create_partition(DatabaseName=database_name, TableName=table_name, PartitionInputList=batch)
+        errors = response.get('Errors', [])
+        failed = [e for e in errors if e['ErrorDetail']['ErrorCode'] != 'AlreadyExistsException']
+        if failed:
+            raise ValueError("Failed to create partitions of {}.{}: {}".format(database_name, table_name, "; ".join(
+                "{} ({})".format(e['PartitionValues'], e['ErrorDetail'].get('ErrorMessage', e['ErrorDetail']['ErrorCode'])) for e in failed)))
+        created += len(batch) - len(errors)
+
+    log.info("Registered {} new partitions of {}.{}".format(created, database_name, table_name))
+    return created
+
+def metadata_folder_to_database(folder_path, delete_db = True, db_suffix = None, explicit_database_name = None, explicit_database_location = None, catalogue = None):
     """
     Take a metadata folder and build the database and all tables
     Args:
+        folder_path: The metadata folder. Ignored if catalogue is provided
+        catalogue: A MetadataCatalogue to read the metadata from instead of reading folder_path
         delete_db bool: Delete the database before starting
         db_suffix: If provided, metadata will be modified so that the database name, and s3 data locations include the folder suffix
         explicit_database_name: if not None the database name in glue will be set to the string specified in explicit_database_location
@@ -257,11 +328,11 @@ def metadata_folder_to_database(folder_path, delete_db = True, db_suffix = None,
         If explicit_database_name or explicit_database_location are not None then it is advised to leave db_suffix as None or vis-versa.
     """
 
-    files = os.listdir(folder_path)
-    files = set([f for f in files if re.match(".+\.json$", f)])
+    if catalogue is None:
+        catalogue = MetadataCatalogue(folder_path)
 
-    if "database.json" in files:
-        db_metadata = read_json(os.path.join(folder_path, "database.json"))
+    if catalogue.has_database():
+        db_metadata = catalogue.get_database()
 
         if db_suffix:
             str_to_add = "_" + db_suffix
@@ -284,6 +355,7 @@ def metadata_folder_to_database(folder_path, delete_db = True, db_suffix = None,
         
         database_name = db_metadata["name"]
 
+        glue_client = _glue_client()
         try:
             glue_client.delete_database(Name=database_name)
         except glue_client.exceptions.EntityNotFoundException:
@@ -294,18 +366,17 @@ def metadata_folder_to_database(folder_path, delete_db = True, db_suffix = None,
         raise ValueError("database.json not found in metadata folder")
         return None
 
-    table_paths = files.difference({"database.json"})
-    for table_path in table_paths:
-        table_path = os.path.join(folder_path, table_path)
-        table_metadata = read_json(table_path)
+    for table_metadata in catalogue.tables():
         populate_glue_catalogue_from_metadata(table_metadata, db_metadata, check_existence=False)
 
 
-def all_glue_job_folders_to_s3(local_glue_jobs_dir, s3_glue_jobs_dir, include_folders = None, exclude_folders = None) :
+def all_glue_job_folders_to_s3(local_glue_jobs_dir, s3_glue_jobs_dir, include_folders = None, exclude_folders = None, zip_cache = None) :
     """
     Iterate though all folders in the glue_job dir and upload them to a corresponsing 
     glue_job dir in s3. Each folder in local_glue_jobs_dir is uploaded using glue_job_folder_to_s3.
     Provide list of folder glue_job folder names in include_folders and exclude_folders to include and exclude them from the upload. 
+    All jobs share one GithubZipCache (zip_cache, or a new one using the default cache dir) so that a
+    github zip url listed by several jobs is only downloaded and unnested once.
     """
     local_glue_jobs_dir = _end_with_slash(local_glue_jobs_dir)
 
@@ -332,10 +403,13 @@ def all_glue_job_folders_to_s3(local_glue_jobs_dir, s3_glue_jobs_dir, include_fo
 
     s3_glue_jobs_dir = _end_with_slash(s3_glue_jobs_dir)
 
+    if zip_cache is None :
+        zip_cache = GithubZipCache()
+
     for glue_job in glue_job_folders :
-        glue_job_folder_to_s3(local_glue_jobs_dir + glue_job + '/', s3_glue_jobs_dir + glue_job + '/')
+        glue_job_folder_to_s3(local_glue_jobs_dir + glue_job + '/', s3_glue_jobs_dir + glue_job + '/', zip_cache = zip_cache)
 
-def glue_job_folder_to_s3(local_base, s3_base_path):
+def glue_job_folder_to_s3(local_base, s3_base_path, zip_cache = None):
     """
     Take a folder structure on local disk and transfer to s3.
 
@@ -349,6 +423,9 @@ def glue_job_folder_to_s3(local_base, s3_base_path):
         txt, sql, json, or csv files
 
     The folder name base dir will be in the folder s3_path_to_glue_jobs_folder
+
+    Unnested github zips are taken from zip_cache (a GithubZipCache) and uploaded straight from the cache,
+    nothing is written into glue_py_resources.
     """
     local_base = _end_with_slash(local_base)
     s3_base_path = _end_with_slash(s3_base_path)
@@ -383,7 +460,6 @@ def glue_job_folder_to_s3(local_base, s3_base_path):
     # Upload all the .py or .zip files in resources
     # Check existence of folder, otherwise skip
     py_resources_path = os.path.join(local_base, "glue_py_resources")
-    delete_these_paths = []
     if os.path.isdir(py_resources_path):
 
         zip_urls_path = os.path.join(py_resources_path, "github_zip_urls.txt")
@@ -392,16 +468,14 @@ def glue_job_folder_to_s3(local_base, s3_base_path):
             with open(zip_urls_path, "r") as f:
                 urls = f.readlines()
 
-            urls = [url for url in urls if len(url) > 10]
-
-            for i, url in enumerate(urls):
+            urls = [url.strip() for url in urls if len(url) > 10]
 
-                this_zip_path = os.path.join(py_resources_path,"{}.zip".format(i))
-                urlretrieve(url,this_zip_path)
-                new_zip_path = unnest_github_zipfile_and_return_new_zip_path(this_zip_path)
-                os.remove(this_zip_path)
-                delete_these_paths.append(new_zip_path)
+            if zip_cache is None :
+                zip_cache = GithubZipCache()
 
+            for i, url in enumerate(urls):
+                cached_zip_path = zip_cache.get(url)
+                path = upload_file_to_s3_from_path(cached_zip_path, bucket, "{}/glue_py_resources/{}_new.zip".format(bucket_folder, i))
 
         resource_listing = os.listdir(os.path.join(local_base, 'glue_py_resources'))
         regex = ".+(\.py|\.zip)$"
@@ -410,31 +484,40 @@ def glue_job_folder_to_s3(local_base, s3_base_path):
         for f in resource_listing:
             resource_local_path = os.path.join(local_base, "glue_py_resources", f)
             path = upload_file_to_s3_from_path(resource_local_path, bucket, "{}/glue_py_resources/{}".format(bucket_folder,f))
-
-        # Remember to delete the files we downloaded
-        for this_path in delete_these_paths:
-            os.remove(this_path)
     
-def get_glue_job_and_resources_from_s3(s3_base_path) :
+def _list_keys(bucket, prefix, listing_cache = None) :
+    if listing_cache is not None :
+        return listing_cache.list_keys(bucket, prefix)
+    keys = []
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix) :
+        keys.extend(c['Key'] for c in page.get('Contents', []))
+    return keys
+
+def get_glue_job_and_resources_from_s3(s3_base_path, listing_cache = None) :
+    """
+    Find the job.py, glue_resources and glue_py_resources (including those in the sibling shared_job_resources folder)
+    of a glue job folder in s3. Only the job folder and shared_job_resources are listed.
+
+    Pass a listing_cache (e.g. dataengineeringutils.s3.listing_cache) when resolving many jobs in the same folder,
+    so shared_job_resources is only listed once per cache ttl. Without one s3 is always listed.
+    """
     
     s3_base_path = _end_with_slash(s3_base_path)
     
     bucket, bucket_folder = s3_path_to_bucket_key(s3_base_path)
     bucket_folder = bucket_folder[:-1]
     
-    shared_bucket_folder = '/'.join(bucket_folder.split('/')[:-1]) + '/shared_job_resources'
-    
-    files_list = get_file_list_from_bucket(bucket, bucket_folder)
+    shared_bucket_folder = '/'.join(bucket_folder.split('/')[:-1] + ['shared_job_resources'])
+
+    files_list = _list_keys(bucket, bucket_folder + '/', listing_cache)
     
     if "{}/job.py".format(bucket_folder) not in files_list:
         raise ValueError("Cannot find job.py in the folder specified ({}), stopping".format(bucket_folder))
     else:
         job_path = "s3://{}/{}/job.py".format(bucket, bucket_folder)
 
-    try : 
-        shared_files_list = get_file_list_from_bucket(bucket, shared_bucket_folder)
-    except :
-        shared_files_list = []
+    shared_files_list = _list_keys(bucket, shared_bucket_folder + '/', listing_cache)
     
     # Do py_resources
     py_resources = [f for f in files_list if "/glue_py_resources/" in f]
@@ -457,9 +540,10 @@ def get_glue_job_and_resources_from_s3(s3_base_path) :
     
     return (job_path, resources, py_resources)
 
-def glue_folder_in_s3_to_job_spec(s3_base_path, **kwargs) :
+def glue_folder_in_s3_to_job_spec(s3_base_path, listing_cache = None, **kwargs) :
     """
-    Given a set of files uploaded to s3 in a specific format, use them to create a glue job
+    Given a set of files uploaded to s3 in a specific format, use them to create a glue job.
+    listing_cache is passed to get_glue_job_and_resources_from_s3
     """
 
     #Base path should be a folder.  Ensure ends in "/"
@@ -467,7 +551,7 @@ def glue_folder_in_s3_to_job_spec(s3_base_path, **kwargs) :
     s3_base_path = _end_with_slash(s3_base_path)
     bucket, bucket_folder = s3_path_to_bucket_key(s3_base_path)
 
-    (job_path, resources, py_resources) = get_glue_job_and_resources_from_s3(s3_base_path)
+    (job_path, resources, py_resources) = get_glue_job_and_resources_from_s3(s3_base_path, listing_cache = listing_cache)
 
     kwargs["ScriptLocation"] = job_path
     if resources != '':
@@ -488,32 +572,68 @@ def get_list_of_files_from_s3_text_file(s3_path_to_text_file) :
 
     return resources
 
-def delete_all_target_data_from_database(database_metadata_path):
-    files = os.listdir(database_metadata_path)
-    files = set([f for f in files if re.match(".+\.json$", f)])
-
-    if "database.json" in files:
-        db_metadata = read_json(os.path.join(database_metadata_path, "database.json"))
-        database_name = db_metadata["name"]
-    else:
-        raise ValueError("database.json not found in metadata folder")
-        return None
+def delete_all_target_data_from_database(database_metadata_path, dry_run = False, max_workers = 16, max_requests_in_flight = 32, catalogue = None):
+    """
+    Delete the data under the location of every table in a metadata folder. Tables are purged concurrently.
+    Args:
+        database_metadata_path: Folder containing database.json and the table jsons. Ignored if catalogue is provided
+        catalogue: A MetadataCatalogue to read the metadata from instead of reading database_metadata_path
+        dry_run: If True, nothing is deleted and the returned summary says what would have been removed
+        max_workers: Number of tables purged at the same time
+        max_requests_in_flight: Global budget of S3 requests in flight across all tables
+    Returns:
+        A dict with the number of objects and bytes deleted per table and in total
+    """
+    if catalogue is None:
+        catalogue = MetadataCatalogue(database_metadata_path)
 
-    table_paths = files.difference({"database.json"})
-    for table_path in table_paths:
-        table_path = os.path.join(database_metadata_path, table_path)
-        table_metadata = read_json(table_path)
-        location = table_metadata["location"]
-        bucket, bucket_folder = s3_path_to_bucket_key(location)
-        delete_folder_from_bucket(bucket, bucket_folder)
+    db_metadata = catalogue.get_database()
+    database_name = db_metadata["name"]
 
-def run_glue_job_as_airflow_task(s3_glue_job_folder, name, role, job_args, delete_job_when_done = True, init_wait_time = 2, interval_wait_time = 1, allocated_capacity = None, max_retries = None, max_concurrent_runs = None, **kwargs) :
+    locations = {}
+    for table_metadata in catalogue.tables():
+        location = _end_with_slash(_table_location(table_metadata, db_metadata))
+        locations[table_metadata["table_name"]] = s3_path_to_bucket_key(location)
+
+    request_budget = threading.BoundedSemaphore(max_requests_in_flight)
+    summary = {"dry_run": dry_run, "tables": {}, "objects": 0, "bytes": 0}
+    start = time.time()
+
+    def purge(table_name):
+        bucket, bucket_folder = locations[table_name]
+        return delete_folder_from_bucket(bucket, bucket_folder, dry_run = dry_run, request_budget = request_budget)
+
+    action = "Would delete" if dry_run else "Deleted"
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {executor.submit(purge, t): t for t in locations}
+        for i, future in enumerate(as_completed(futures)):
+            table_name = futures[future]
+            num_objects, num_bytes = future.result()
+            summary["tables"][table_name] = {"location": "s3://{}/{}".format(*locations[table_name]), "objects": num_objects, "bytes": num_bytes}
+            summary["objects"] += num_objects
+            summary["bytes"] += num_bytes
+            elapsed = max(time.time() - start, 1e-9)
+            log.info("{} {} objects ({} bytes) from {}.{} [{}/{} tables, {:.0f} objects/s, {:.2f} MB/s]".format(
+                action, num_objects, num_bytes, database_name, table_name, i + 1, len(futures),
+                summary["objects"] / elapsed, summary["bytes"] / elapsed / 1e6))
+
+    summary["seconds"] = time.time() - start
+    return summary
+
+def run_glue_job_as_airflow_task(s3_glue_job_folder, name, role, job_args, delete_job_when_done = True, init_wait_time = 2, interval_wait_time = 1, allocated_capacity = None, max_retries = None, max_concurrent_runs = None, listing_cache = s3_utils.listing_cache, **kwargs) :
+    """
+    Create and run a glue job from a job folder in s3, wait for it to finish and (by default) delete it.
+    listing_cache is passed to get_glue_job_and_resources_from_s3, by default the shared s3 listing cache,
+    so launching many jobs that share shared_job_resources only lists it once per cache ttl. Pass None to always list s3
+    """
 
-    start_job_response, job_spec = run_glue_job_from_s3_folder_template(s3_glue_job_folder, name, role, job_args = job_args, allocated_capacity = allocated_capacity, max_retries = max_retries, max_concurrent_runs = max_concurrent_runs)
+    start_job_response, job_spec = run_glue_job_from_s3_folder_template(s3_glue_job_folder, name, role, job_args = job_args, allocated_capacity = allocated_capacity, max_retries = max_retries, max_concurrent_runs = max_concurrent_runs, listing_cache = listing_cache)
 
     # Let AWS spin up spark session (normally 2 mins if warmed up)
     time.sleep(init_wait_time*60)
 
+    glue_client = _glue_client()
+
     job_running = True
     while job_running :
         job_status = glue_client.get_job_run(JobName = name, RunId = start_job_response['JobRunId'])
@@ -529,8 +649,11 @@ def run_glue_job_as_airflow_task(s3_glue_job_folder, name, role, job_args, delet
 
     return start_job_response['JobRunId']
 
-def run_glue_job_from_s3_folder_template(s3_glue_job_folder, name, role, job_args = None, allocated_capacity = None, max_retries = None, max_concurrent_runs = None) :
-    
+def run_glue_job_from_s3_folder_template(s3_glue_job_folder, name, role, job_args = None, allocated_capacity = None, max_retries = None, max_concurrent_runs = None, listing_cache = s3_utils.listing_cache) :
+    """
+    Create and start a glue job from a job folder in s3. listing_cache is as run_glue_job_as_airflow_task
+    """
+
     s3_glue_job_folder = _end_with_slash(s3_glue_job_folder)
     
     job_def_kwargs = {}
@@ -545,9 +668,10 @@ def run_glue_job_from_s3_folder_template(s3_glue_job_folder, name, role, job_arg
 
     bucket, bucket_folder = s3_path_to_bucket_key(s3_glue_job_folder)
     
-    job_spec = glue_folder_in_s3_to_job_spec(s3_glue_job_folder, **job_def_kwargs)
+    job_spec = glue_folder_in_s3_to_job_spec(s3_glue_job_folder, listing_cache = listing_cache, **job_def_kwargs)
 
     del_response = delete_job(name)
+    glue_client = _glue_client()
     response = glue_client.create_job(**job_spec)
 
     if job_args:
@@ -585,6 +709,7 @@ def run_glue_job_from_local_folder_template(local_base, s3_base_path, name, role
 
     job_spec = glue_folder_in_s3_to_job_spec(s3_base_path, **job_def_kwargs)
 
+    glue_client = _glue_client()
     response = glue_client.create_job(**job_spec)
     if job_args:
         response = glue_client.start_job_run(JobName=name, Arguments = job_args)
@@ -593,15 +718,49 @@ def run_glue_job_from_local_folder_template(local_base, s3_base_path, name, role
     return response, job_spec
 
 def delete_job(job_name):
+    glue_client = _glue_client()
     try:
         return glue_client.delete_job(JobName=job_name)
-    except:
+    except glue_client.exceptions.EntityNotFoundException:
         return "No job with that name found"
 
 import tempfile
 import zipfile
 import shutil
-def unnest_github_zipfile_and_return_new_zip_path(zip_path):
+import hashlib
+
+DEFAULT_ZIP_CACHE_DIR = os.path.join(tempfile.gettempdir(), "dataengineeringutils_zip_cache")
+
+def _unnest_zip_entries(zip_in, zip_out):
+    """
+    Stream every entry of zip_in into zip_out with the top level folder stripped from its path.
+    Entries that are not inside the first top level folder are dropped (the same as extracting
+    and then zipping up the first folder found).
+    """
+    infos = zip_in.infolist()
+    if len(infos) == 0 :
+        raise ValueError("The zip file is empty so there is nothing to unnest")
+
+    nested_folder = infos[0].filename.split('/')[0] + '/'
+
+    for info in infos:
+        if not info.filename.startswith(nested_folder) :
+            continue
+        new_name = info.filename[len(nested_folder):]
+        if new_name == '' :
+            continue
+
+        new_info = zipfile.ZipInfo(new_name, date_time=info.date_time)
+        new_info.external_attr = info.external_attr
+        new_info.compress_type = zipfile.ZIP_DEFLATED
+
+        if info.is_dir() :
+            zip_out.writestr(new_info, b'')
+        else :
+            with zip_in.open(info) as src, zip_out.open(new_info, 'w') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+def unnest_github_zipfile_and_return_new_zip_path(zip_path, output_path = None):
     """
     When we download a zipball from github like this one:
     https://github.com/moj-analytical-services/gluejobutils/archive/master.zip
@@ -612,20 +771,66 @@ def unnest_github_zipfile_and_return_new_zip_path(zip_path):
     The glue docs say that it will only work without this nesting:
     docs.aws.amazon.com/glue/latest/dg/aws-glue-programming-python-libraries.html
 
-    This function creates a new, unnested zip file, and returns the path to it
+    This function creates a new, unnested zip file, and returns the path to it.
+    Entries are streamed from the original zip into the new one, nothing is extracted to disk.
+    By default the new file is written next to the original as <name>_new.zip
 
     """
+    if output_path is None :
+        original_file_name = os.path.basename(zip_path)
+        original_dir = os.path.dirname(zip_path)
+        output_path = os.path.join(original_dir, original_file_name.replace(".zip", "_new") + ".zip")
 
-    original_file_name = os.path.basename(zip_path)
-    original_dir = os.path.dirname(zip_path)
-    new_file_name = original_file_name.replace(".zip", "_new")
+    with zipfile.ZipFile(zip_path, 'r') as zip_in, zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_out:
+        _unnest_zip_entries(zip_in, zip_out)
+
+    return output_path
+
+class GithubZipCache :
+    """
+    Content addressed local cache of unnested github zipballs.
+
+    Each url is downloaded once per cache object. The unnested zip is stored in cache_dir under a sha256 of the
+    url plus the sha256 of the downloaded archive, so it is reused across deploys (and across jobs) for as long
+    as the archive behind the url doesn't change.
+    """
+
+    def __init__(self, cache_dir = None) :
+        self.cache_dir = DEFAULT_ZIP_CACHE_DIR if cache_dir is None else cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._resolved = {}
+
+    def get(self, url) :
+        """
+        Return the local path to the unnested zip for url, downloading and unnesting it if necessary
+        """
+        url = url.strip()
+        if url in self._resolved and os.path.exists(self._resolved[url]) :
+            return self._resolved[url]
+
+        from urllib.request import urlopen
+        fd, download_path = tempfile.mkstemp(suffix=".zip", dir=self.cache_dir)
+        try :
+            archive_hash = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f, urlopen(url) as response:
+                for chunk in iter(lambda: response.read(1024 * 1024), b''):
+                    archive_hash.update(chunk)
+                    f.write(chunk)
+
+            cache_path = self.path_for(url, archive_hash.hexdigest())
+            if not os.path.exists(cache_path) :
+                log.debug("Unnesting {} into zip cache".format(url))
+                tmp_path = cache_path + ".tmp{}".format(os.getpid())
+                unnest_github_zipfile_and_return_new_zip_path(download_path, tmp_path)
+                os.replace(tmp_path, cache_path)
+            else :
+                log.debug("Using cached unnested zip for {}".format(url))
+        finally :
+            os.remove(download_path)
 
-    with tempfile.TemporaryDirectory() as td:
-        myzip = zipfile.ZipFile(zip_path, 'r')
-        myzip.extractall(td)
-        nested_folder_to_unnest = os.listdir(td)[0]
-        nested_path = os.path.join(td, nested_folder_to_unnest)
-        output_path = os.path.join(original_dir, new_file_name)
-        final_output_path = shutil.make_archive(output_path, 'zip', nested_path)
+        self._resolved[url] = cache_path
+        return cache_path
 
-    return final_output_path
+    def path_for(self, url, archive_hash) :
+        key = hashlib.sha256("{}\n{}".format(url.strip(), archive_hash).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "{}.zip".format(key))
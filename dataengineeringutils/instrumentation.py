@@ -0,0 +1,402 @@
+"""
+Instrumentation of the AWS calls this package makes.
+
+While instrumentation is on, every client handed out by backend.get_client records the time, bytes sent and received
+and errors of each call, and retries and throttles are counted. e.g.
+
+    from dataengineeringutils.instrumentation import instrument
+
+    with instrument() as recorder:
+        metadata_folder_to_database("meta_data/db/")
+
+    recorder.log_summary()
+    print(recorder.to_prometheus())
+    print(recorder.to_json())
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from dataengineeringutils.utils import dumps_json
+
+log = logging.getLogger(__name__)
+
+THROTTLE_ERROR_CODES = ('Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottled', 'RequestThrottledException',
+                        'SlowDown', 'TooManyRequestsException', 'RequestLimitExceeded', 'ProvisionedThroughputExceededException')
+
+# Client methods that don't make a request
+_NOT_REQUESTS = ('get_paginator', 'get_waiter', 'can_paginate', 'generate_presigned_url', 'generate_presigned_post', 'close')
+
+def _error_code(exception) :
+    response = getattr(exception, 'response', None)
+    if isinstance(response, dict) :
+        return response.get('Error', {}).get('Code') or type(exception).__name__
+    return type(exception).__name__
+
+def _body_size(body) :
+    if body is None :
+        return 0
+    if isinstance(body, str) :
+        return len(body.encode('utf-8'))
+    if isinstance(body, (bytes, bytearray, memoryview)) :
+        return len(body)
+    try :
+        position = body.tell()
+        body.seek(0, os.SEEK_END)
+        size = body.tell() - position
+        body.seek(position)
+        return size
+    except Exception :
+        return 0
+
+# Position of the Filename/Fileobj argument of the s3 transfer methods, which are often called positionally
+_TRANSFER_ARGUMENTS = {'upload_file': ('Filename', 0), 'upload_fileobj': ('Fileobj', 0), 'download_file': ('Filename', 2)}
+
+def _transfer_argument(operation_name, args, kwargs) :
+    name, position = _TRANSFER_ARGUMENTS[operation_name]
+    return kwargs[name] if name in kwargs else (args[position] if len(args) > position else None)
+
+def _bytes_sent(operation_name, args, kwargs) :
+    if 'Body' in kwargs :
+        return _body_size(kwargs['Body'])
+    if operation_name == 'upload_file' :
+        filename = _transfer_argument(operation_name, args, kwargs)
+        return os.path.getsize(filename) if filename is not None and os.path.exists(filename) else 0
+    if operation_name == 'upload_fileobj' :
+        return _body_size(_transfer_argument(operation_name, args, kwargs))
+    return 0
+
+def _bytes_received(operation_name, args, kwargs, response) :
+    if operation_name == 'download_file' :
+        filename = _transfer_argument(operation_name, args, kwargs)
+        return os.path.getsize(filename) if filename is not None and os.path.exists(filename) else 0
+    if operation_name in ('get_object', 'download_fileobj') and isinstance(response, dict) :
+        return response.get('ContentLength', 0)
+    return 0
+
+class OperationStats :
+    """
+    Running totals for one service operation (e.g. s3.list_objects_v2)
+    """
+
+    __slots__ = ('requests', 'errors', 'throttles', 'retries', 'seconds', 'max_seconds', 'bytes_sent', 'bytes_received', 'wait_seconds')
+
+    def __init__(self) :
+        self.requests = 0
+        self.errors = 0
+        self.throttles = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.wait_seconds = 0.0
+
+    def to_dict(self) :
+        d = dict((k, getattr(self, k)) for k in self.__slots__)
+        d['mean_seconds'] = self.seconds / self.requests if self.requests else 0.0
+        return d
+
+class Recorder :
+    """
+    Collects per operation statistics of client calls.
+
+    Hooks are called with a dict for every event: {'kind': 'call', 'retry' or 'wait', 'service', 'operation', 'seconds',
+    'bytes_sent', 'bytes_received', 'error_code'}. Use them to forward events elsewhere, e.g. to statsd.
+    """
+
+    def __init__(self) :
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._hooks = []
+        self._proxies = {}
+        self.started = time.time()
+
+    def add_hook(self, hook) :
+        self._hooks.append(hook)
+
+    def reset(self) :
+        with self._lock :
+            self._stats = {}
+            self.started = time.time()
+
+    def _get(self, service_name, operation_name) :
+        key = (service_name, operation_name)
+        if key not in self._stats :
+            self._stats[key] = OperationStats()
+        return self._stats[key]
+
+    def _emit(self, event) :
+        for hook in self._hooks :
+            try :
+                hook(event)
+            except Exception :
+                log.exception("Instrumentation hook {} failed".format(hook))
+
+    def record_call(self, service_name, operation_name, seconds, bytes_sent = 0, bytes_received = 0, error_code = None) :
+        with self._lock :
+            stats = self._get(service_name, operation_name)
+            stats.requests += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            if error_code is not None :
+                stats.errors += 1
+                if error_code in THROTTLE_ERROR_CODES :
+                    stats.throttles += 1
+        if self._hooks :
+            self._emit({'kind': 'call', 'service': service_name, 'operation': operation_name, 'seconds': seconds,
+                        'bytes_sent': bytes_sent, 'bytes_received': bytes_received, 'error_code': error_code})
+
+    def record_retry(self, service_name, operation_name, error_code = None) :
+        """
+        Count a retry of an operation (error_code is the error that caused it). Throttling errors also count as throttles
+        """
+        with self._lock :
+            stats = self._get(service_name, operation_name)
+            stats.retries += 1
+            if error_code in THROTTLE_ERROR_CODES :
+                stats.throttles += 1
+        if self._hooks :
+            self._emit({'kind': 'retry', 'service': service_name, 'operation': operation_name, 'seconds': 0,
+                        'bytes_sent': 0, 'bytes_received': 0, 'error_code': error_code})
+
+    def record_wait(self, service_name, operation_name, seconds) :
+        """
+        Add time spent waiting before a call could be made (e.g. for a rate limiter or a retry backoff)
+        """
+        with self._lock :
+            self._get(service_name, operation_name).wait_seconds += seconds
+        if self._hooks :
+            self._emit({'kind': 'wait', 'service': service_name, 'operation': operation_name, 'seconds': seconds,
+                        'bytes_sent': 0, 'bytes_received': 0, 'error_code': None})
+
+    def stats(self) :
+        """
+        dict of 'service.operation' to a dict of that operation's statistics
+        """
+        with self._lock :
+            return dict(("{}.{}".format(s, o), stats.to_dict()) for (s, o), stats in sorted(self._stats.items()))
+
+    def summary(self) :
+        operations = self.stats()
+        totals = OperationStats().to_dict()
+        for stats in operations.values() :
+            for k in OperationStats.__slots__ :
+                totals[k] = max(totals[k], stats[k]) if k == 'max_seconds' else totals[k] + stats[k]
+        totals['mean_seconds'] = totals['seconds'] / totals['requests'] if totals['requests'] else 0.0
+        return {'elapsed_seconds': time.time() - self.started, 'totals': totals, 'operations': operations}
+
+    def to_json(self, indent = 4) :
+        """
+        The summary as a json string
+        """
+        return dumps_json(self.summary(), indent=indent)
+
+    def to_prometheus(self, prefix = "dataengineeringutils") :
+        """
+        The statistics in the prometheus text exposition format, labelled by service and operation
+        """
+        metrics = [
+            ('aws_requests_total', 'counter', 'Requests made', 'requests'),
+            ('aws_request_errors_total', 'counter', 'Requests that raised an error', 'errors'),
+            ('aws_throttles_total', 'counter', 'Requests throttled', 'throttles'),
+            ('aws_retries_total', 'counter', 'Requests retried', 'retries'),
+            ('aws_request_seconds_total', 'counter', 'Time spent in requests', 'seconds'),
+            ('aws_request_seconds_max', 'gauge', 'Slowest request', 'max_seconds'),
+            ('aws_wait_seconds_total', 'counter', 'Time spent waiting to make requests', 'wait_seconds'),
+            ('aws_bytes_sent_total', 'counter', 'Bytes uploaded', 'bytes_sent'),
+            ('aws_bytes_received_total', 'counter', 'Bytes downloaded', 'bytes_received'),
+        ]
+        with self._lock :
+            rows = [(s, o, stats.to_dict()) for (s, o), stats in sorted(self._stats.items())]
+        lines = []
+        for name, metric_type, help_text, field in metrics :
+            name = "{}_{}".format(prefix, name)
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for service_name, operation_name, stats in rows :
+                lines.append('{}{{service="{}",operation="{}"}} {}'.format(name, service_name, operation_name, stats[field]))
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self, logger = None, level = logging.INFO) :
+        """
+        Log one line per operation, slowest (by total time) first
+        """
+        logger = log if logger is None else logger
+        operations = sorted(self.stats().items(), key=lambda item: -item[1]['seconds'])
+        for name, s in operations :
+            logger.log(level, "{}: {} requests in {:.3f}s (mean {:.3f}s, max {:.3f}s), {} errors, {} throttles, {} retries, {:.3f}s waiting, {} bytes sent, {} bytes received".format(
+                name, s['requests'], s['seconds'], s['mean_seconds'], s['max_seconds'], s['errors'], s['throttles'], s['retries'], s['wait_seconds'], s['bytes_sent'], s['bytes_received']))
+
+    def wrap(self, client, service_name) :
+        """
+        Return an instrumented proxy for client (the same proxy every time for the same client)
+        """
+        with self._lock :
+            key = id(client)
+            proxy = self._proxies.get(key)
+            if proxy is None or proxy._client is not client :
+                proxy = InstrumentedClient(client, service_name, self)
+                self._proxies[key] = proxy
+            return proxy
+
+class InstrumentedClient :
+    """
+    Proxy for a client that records every call it makes with a Recorder. Anything that isn't a request is passed straight through
+    """
+
+    def __init__(self, client, service_name, recorder) :
+        self._client = client
+        self._service_name = service_name
+        self._recorder = recorder
+        self._methods = {}
+        events = getattr(getattr(client, 'meta', None), 'events', None)
+        if events is not None :
+            # botocore retries inside a call, count them from its retry event. The handler is registered once per client
+            events.register('needs-retry.{}'.format(client.meta.service_model.endpoint_prefix), _on_needs_retry, unique_id='dataengineeringutils-instrumentation')
+
+    def __getattr__(self, name) :
+        attribute = getattr(self._client, name)
+        if name.startswith('_') or name == 'exceptions' or not callable(attribute) :
+            return attribute
+        if name in self._methods :
+            return self._methods[name]
+        if name == 'get_paginator' :
+            method = lambda operation_name: InstrumentedPaginator(attribute(operation_name), self._service_name, operation_name, self._recorder)
+        elif name in _NOT_REQUESTS :
+            return attribute
+        else :
+            method = self._instrument(attribute, name)
+        self._methods[name] = method
+        return method
+
+    def _instrument(self, method, operation_name) :
+        service_name = self._service_name
+        recorder = self._recorder
+
+        def instrumented(*args, **kwargs) :
+            bytes_sent = _bytes_sent(operation_name, args, kwargs)
+            start = time.perf_counter()
+            try :
+                response = method(*args, **kwargs)
+            except Exception as e :
+                recorder.record_call(service_name, operation_name, time.perf_counter() - start, bytes_sent, 0, _error_code(e))
+                raise
+            recorder.record_call(service_name, operation_name, time.perf_counter() - start, bytes_sent, _bytes_received(operation_name, args, kwargs, response))
+            return response
+
+        instrumented.__name__ = operation_name
+        return instrumented
+
+class InstrumentedPaginator :
+    """
+    Proxy for a paginator that records each page as a call of its operation
+    """
+
+    def __init__(self, paginator, service_name, operation_name, recorder) :
+        self._paginator = paginator
+        self._service_name = service_name
+        self._operation_name = operation_name
+        self._recorder = recorder
+
+    def __getattr__(self, name) :
+        return getattr(self._paginator, name)
+
+    def paginate(self, **kwargs) :
+        pages = iter(self._paginator.paginate(**kwargs))
+        while True :
+            start = time.perf_counter()
+            try :
+                page = next(pages)
+            except StopIteration :
+                return
+            except Exception as e :
+                self._recorder.record_call(self._service_name, self._operation_name, time.perf_counter() - start, error_code=_error_code(e))
+                raise
+            self._recorder.record_call(self._service_name, self._operation_name, time.perf_counter() - start)
+            yield page
+
+def _on_needs_retry(event_name = '', response = None, caught_exception = None, operation = None, **kwargs) :
+    recorder = _recorder
+    if recorder is None :
+        return None
+    error_code = None
+    if caught_exception is not None :
+        error_code = type(caught_exception).__name__
+    elif response is not None and isinstance(response[1], dict) :
+        error_code = response[1].get('Error', {}).get('Code')
+    if error_code is not None :
+        service_name = event_name.split('.')[1] if event_name.count('.') >= 1 else 'unknown'
+        recorder.record_retry(service_name, _snake_case(getattr(operation, 'name', 'unknown')), error_code)
+    return None
+
+def _snake_case(name) :
+    out = []
+    for i, ch in enumerate(name) :
+        if ch.isupper() and i > 0 and not name[i - 1].isupper() :
+            out.append('_')
+        out.append(ch.lower())
+    return ''.join(out)
+
+_recorder = None
+
+def get_recorder() :
+    """
+    The recorder calls are currently recorded with, None if instrumentation is off
+    """
+    return _recorder
+
+def enable_instrumentation(recorder = None) :
+    """
+    Record every client call made through backend.get_client from now on. Returns the recorder
+    """
+    global _recorder
+    _recorder = Recorder() if recorder is None else recorder
+    return _recorder
+
+def disable_instrumentation() :
+    global _recorder
+    _recorder = None
+
+@contextmanager
+def instrument(recorder = None) :
+    """
+    Context manager that records every client call made in the with block (by any thread), see Recorder
+    """
+    global _recorder
+    previous = _recorder
+    recorder = enable_instrumentation(recorder)
+    try :
+        yield recorder
+    finally :
+        _recorder = previous
+
+def wrap_client(client, service_name) :
+    """
+    Instrument client if instrumentation is on, otherwise return it unchanged
+    """
+    recorder = _recorder
+    if recorder is None :
+        return client
+    return recorder.wrap(client, service_name)
+
+def record_retry(service_name, operation_name, error_code = None) :
+    """
+    Count a retry made by this package (rather than by botocore), if instrumentation is on
+    """
+    recorder = _recorder
+    if recorder is not None :
+        recorder.record_retry(service_name, operation_name, error_code)
+
+def record_wait(service_name, operation_name, seconds) :
+    """
+    Count time spent waiting before a call, if instrumentation is on
+    """
+    recorder = _recorder
+    if recorder is not None :
+        recorder.record_wait(service_name, operation_name, seconds)
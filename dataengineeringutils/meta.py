@@ -1,102 +1,172 @@
-from dataengineeringutils.utils import read_json, write_json
+from dataengineeringutils.utils import read_json, write_json, iter_json_items
 from copy import copy
 class Meta :
+    """
+    Table metadata read from a json file.
 
-    supported_column_types = ('int', 'character', 'float', 'date', 'datetime', 'boolean', 'long')
+    Columns are kept as the list of dicts found in the json (self.meta['columns']) alongside an index of
+    column name to position, so looking up, updating and renaming a column doesn't scan the column list.
+    Use the bulk methods (update_columns, remove_columns, rename_columns) to edit many columns at once,
+    these touch the column list once however many columns they edit.
+    """
+
+    supported_column_types = ('int', 'character', 'float', 'double', 'date', 'datetime', 'boolean', 'long')
     supported_data_formats = ('avro', 'csv', 'csv_quoted_nodate', 'regex', 'orc', 'par', 'parquet')
 
     def __init__(self, filepath) :
         self.meta = read_json(filepath)
-        self.__update_column_names()
+        self.__rebuild_index()
+
+    @staticmethod
+    def iter_columns(filepath) :
+        """
+        Iterate through the columns of a metadata json without loading it into a Meta.
+        The file is parsed incrementally if ijson is installed (pip install dataengineeringutils[ijson])
+        """
+        return iter_json_items(filepath, 'columns.item')
+
+    @property
+    def column_names(self) :
+        return [c['name'] for c in self.meta['columns']]
 
     def get_table_name(self) :
         return self.meta["table_name"]
 
     def change_table_name(self, new_name) :
         self.meta["table_name"] = new_name
-        
+
     def get_table_desc(self) :
         return self.meta["table_desc"]
-        
+
     def change_table_desc(self, new_table_desc) :
         self.meta["table_desc"] = new_table_desc
-        
+
     def get_data_format(self) :
         return self.meta["data_format"]
-        
+
     def change_data_format(self, new_data_format) :
         if new_data_format in self.supported_data_formats :
             self.meta["data_format"] = new_data_format
         else :
-            ValueError("new_data_format ({}) is invalid. Please use one of the following {}".format(new_data_format, ', '.join(self.supported_data_formats)))
-    
+            raise ValueError("new_data_format ({}) is invalid. Please use one of the following {}".format(new_data_format, ', '.join(self.supported_data_formats)))
+
     def get_location(self) :
-        return self.meta["table_name"]
-        
+        return self.meta["location"]
+
     def change_location(self, new_location) :
         self.meta["location"] = new_location if new_location[-1] == '/' else new_location + '/'
 
     def get_id(self) :
-        return self.meta["table_name"]
-        
+        return self.meta["id"]
+
     def change_id(self, new_id) :
         self.meta['id'] = new_id
 
     def update_column(self, column_name, column_type = None, column_desc = None) :
-        
-        self.__check_column_type(column_type)
-        self.__check_column_desc(column_desc)
+        """
+        Update the type and/or description of column_name, adding the column if it doesn't exist
+        """
+        self.update_columns([{'name' : column_name, 'type' : column_type, 'description' : column_desc}])
 
-        (b, i) = self.__is_column(column_name)
-        # Update existing column
-        if b :
-            if column_type is not None :
-                self.meta['columns'][i]['column_type'] = column_type
-            if column_desc is not None :
-                self.meta['columns'][i]['column_desc'] = column_desc
-        
-        # Add new column
-        else :
-            if column_type is None :
-                column_type = 'character'
-            if column_desc is None :
-                column_desc = 'column description not yet set'
-
-            self.meta['columns'].append({
-                'name' : column_name,
-                'type' : column_type,
-                'description' : column_desc
-            })
-            self.__update_column_names()
+    def update_columns(self, columns) :
+        """
+        Update or add many columns at once.
+        Args:
+            columns: list of dicts with a 'name' and optionally 'type' and 'description'.
+                Existing columns are updated (keys that are missing or None are left alone), new columns are appended.
+        """
+        for c in columns :
+            self.__check_column_type(c.get('type'))
+            self.__check_column_desc(c.get('description'))
+
+        meta_columns = self.meta['columns']
+        for c in columns :
+            column_name = c['name']
+            column_type = c.get('type')
+            column_desc = c.get('description')
+
+            (b, i) = self.__is_column(column_name)
+            # Update existing column
+            if b :
+                if column_type is not None :
+                    meta_columns[i]['type'] = column_type
+                if column_desc is not None :
+                    meta_columns[i]['description'] = column_desc
+
+            # Add new column
+            else :
+                if column_type is None :
+                    column_type = 'character'
+                if column_desc is None :
+                    column_desc = 'column description not yet set'
+
+                self._index[column_name] = len(meta_columns)
+                meta_columns.append({
+                    'name' : column_name,
+                    'type' : column_type,
+                    'description' : column_desc
+                })
 
     def remove_column(self, column_name) :
-        (b, i) = self.__is_column(column_name)
-        if not b :
-            ValueError('column_name does not exist in meta data')
-        self.meta['columns'] = [x for x in self.meta['columns'] if x['name'] != column_name]
-        self.__update_column_names()
-    
+        self.remove_columns([column_name])
+
+    def remove_columns(self, column_names) :
+        """
+        Remove many columns at once, and from the partition keys. Raises a ValueError (and removes nothing) if any of them don't exist
+        """
+        column_names = set(column_names)
+        missing = [c for c in column_names if c not in self._index]
+        if missing :
+            raise ValueError('columns {} do not exist in meta data'.format(', '.join(sorted(missing))))
+        self.meta['columns'] = [x for x in self.meta['columns'] if x['name'] not in column_names]
+        self.__rebuild_index()
+
+        # Removed columns can't be partition keys
+        if 'PartitionKeys' in self.meta.get('glue_specific', {}) :
+            self.meta['glue_specific']['PartitionKeys'] = [pk for pk in self.meta['glue_specific']['PartitionKeys'] if pk['Name'] not in column_names]
+
     def rename_column(self, old_column_name, new_column_name) :
-        (old_b, old_i) = self.__is_column(old_column_name)
-        if not old_b :
-            ValueError("{} does not exist in meta".format(old_column_name))
-        
-        (new_b, new_i) = self.__is_column(old_column_name)
-        if new_b :
-            ValueError("{} already exists in meta".format(new_column_name))
-        
-        self.meta['columns'][old_i]['name'] = new_column_name
-        self.__update_column_names()
+        self.rename_columns({old_column_name : new_column_name})
+
+    def rename_columns(self, renames) :
+        """
+        Rename many columns at once.
+        Args:
+            renames: dict of old column name to new column name. Names can be swapped, e.g. {'a': 'b', 'b': 'a'}
+        """
+        for old_column_name in renames :
+            if old_column_name not in self._index :
+                raise ValueError("{} does not exist in meta".format(old_column_name))
+
+        final_names = set(self._index) - set(renames)
+        for new_column_name in renames.values() :
+            if new_column_name in final_names :
+                raise ValueError("{} already exists in meta".format(new_column_name))
+            final_names.add(new_column_name)
+
+        positions = [(self._index.pop(old), new) for old, new in renames.items()]
+        for i, new_column_name in positions :
+            self.meta['columns'][i]['name'] = new_column_name
+            self._index[new_column_name] = i
+
+        # Keep partition keys pointing at the renamed columns
+        for pk in self.meta.get('glue_specific', {}).get('PartitionKeys', []) :
+            pk['Name'] = renames.get(pk['Name'], pk['Name'])
 
     def set_columns_as_file_partitions(self, list_of_cols = None) :
+        """
+        Set the columns in list_of_cols as the table's partition keys. If list_of_cols is None, remove all partitions
+        """
         if list_of_cols is None :
-            del self.meta["glue_specific"]
-    
+            self.meta.pop("glue_specific", None)
+
         else :
+            missing = [c for c in list_of_cols if c not in self._index]
+            if missing :
+                raise ValueError("columns {} do not exist in meta".format(', '.join(missing)))
             self.meta["glue_specific"] = {"PartitionKeys" : []}
             for c in list_of_cols :
-                self.__is_column(c)
-                self.meta["glue_specific"]["PartitionKeys"].append({"Name" : c, "Type" : self.get_column(c)['type']})
+                self.meta["glue_specific"]["PartitionKeys"].append({"Name" : c, "Type" : self.meta['columns'][self._index[c]]['type']})
 
     def write_to_json(self, filepath) :
         write_json(self.meta, filepath)
@@ -106,26 +176,25 @@ class Meta :
         if b :
            return copy(self.meta['columns'][i])
         else :
-            ValueError("{} is not in meta".format(column_name))
+            raise ValueError("{} is not in meta".format(column_name))
 
     def __is_column(self, column_name) :
-        if column_name in self.column_names :
-            b = True
-            i = self.column_names.index(column_name)
-        else :
-            b = False
-            i = -1
-        return (b, i)
+        i = self._index.get(column_name, -1)
+        return (i != -1, i)
 
     def __check_column_type(self, column_type) :
         if column_type is not None :
             if column_type not in self.supported_column_types :
-                ValueError("column_type: {} is not supported please use {}".format(column_type, ",".join(self.supported_column_types)))
-    
+                raise ValueError("column_type: {} is not supported please use {}".format(column_type, ",".join(self.supported_column_types)))
+
     def __check_column_desc(self, column_desc) :
         if column_desc is not None :
             if type(column_desc) is not str :
-                ValueError("column_desc must be type str")
-    
-    def __update_column_names(self) :
-        self.column_names = [x['name'] for x in self.meta['columns']]
\ No newline at end of file
+                raise ValueError("column_desc must be type str")
+
+    def __rebuild_index(self) :
+        self._index = {}
+        for i, c in enumerate(self.meta['columns']) :
+            if c['name'] in self._index :
+                raise ValueError("column {} appears more than once in meta".format(c['name']))
+            self._index[c['name']] = i
@@ -0,0 +1,91 @@
+"""
+Table locations and hive style partition folders (location/key=value/...), shared by the readers, writers and glue.
+"""
+
+import os
+
+from dataengineeringutils.utils import _end_with_slash
+
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# The characters hive percent-encodes in partition folder names (FileUtils.escapePathName)
+HIVE_ESCAPED_CHARACTERS = frozenset([chr(c) for c in range(0x01, 0x20)] + ['"', '#', '%', "'", '*', '/', ':', '=', '?', '\\', '\x7f', '{', '[', ']', '^'])
+
+# Format of date and datetime partition values
+PARTITION_DATE_FORMAT = "%Y-%m-%d"
+PARTITION_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def partition_key_names(table_metadata) :
+    """
+    The names of a table's partition keys, from glue_specific.PartitionKeys (or the older partitions list)
+    """
+    pks = table_metadata.get("glue_specific", {}).get("PartitionKeys")
+    if pks :
+        return [pk["Name"] for pk in pks]
+    return list(table_metadata.get("partitions", []))
+
+def resolve_table_location(table_metadata, location = None, database_metadata = None, require_s3 = True) :
+    """
+    The full location of a table, ending with a /.
+    Args:
+        location: Overrides the table's location
+        database_metadata: Database metadata, needed if the table's location is relative (e.g. 'my_table/') to the database's location
+        require_s3: Raise a ValueError if the location isn't an s3 path
+    """
+    if location is None :
+        location = table_metadata["location"]
+        if "://" not in location :
+            if database_metadata is None :
+                raise ValueError("The table location {} is relative, pass database_metadata or a full location".format(location))
+            location = os.path.join(database_metadata["location"], location)
+    if require_s3 and not location.startswith("s3://") :
+        raise ValueError("location must be an s3 path, e.g. s3://bucket/db/table/")
+    return _end_with_slash(location)
+
+def format_partition_value(value, column_type = None) :
+    """
+    A partition value as a string, as hive writes it: dates as 2018-01-31, datetimes as 2018-01-31 09:30:00,
+    booleans as true/false and nulls as __HIVE_DEFAULT_PARTITION__. column_type is the column's metadata type
+    """
+    if value is None or value != value :
+        return HIVE_DEFAULT_PARTITION
+    if column_type == "date" and hasattr(value, "strftime") :
+        return value.strftime(PARTITION_DATE_FORMAT)
+    if column_type == "datetime" and hasattr(value, "strftime") :
+        return value.strftime(PARTITION_DATETIME_FORMAT)
+    if column_type == "boolean" and str(value) in ("True", "False") :
+        return str(value).lower()
+    return str(value)
+
+def escape_partition_value(value) :
+    """
+    Percent-encode the characters hive escapes in a partition folder name, e.g. '2018-01-31 09:30:00' becomes '2018-01-31 09%3A30%3A00'
+    """
+    return "".join("%{:02X}".format(ord(c)) if c in HIVE_ESCAPED_CHARACTERS else c for c in value)
+
+def unescape_partition_value(value) :
+    """
+    Undo escape_partition_value. Anything that isn't a valid escape is left as it is, as hive does
+    """
+    if "%" not in value :
+        return value
+    parts = []
+    i = 0
+    while i < len(value) :
+        if value[i] == "%" and _is_hex(value[i + 1:i + 3]) :
+            parts.append(chr(int(value[i + 1:i + 3], 16)))
+            i += 3
+        else :
+            parts.append(value[i])
+            i += 1
+    return "".join(parts)
+
+def _is_hex(s) :
+    return len(s) == 2 and all(c in "0123456789abcdefABCDEF" for c in s)
+
+def partition_path(partition_keys, partition) :
+    """
+    The hive style folders of a partition e.g. 'year=2018/region=north/'.
+    partition is a dict of partition key to (unescaped) value string
+    """
+    return "".join("{}={}/".format(k, escape_partition_value(partition[k])) for k in partition_keys)
@@ -1,8 +1,10 @@
-import pkg_resources
+import os
 import json
 import pandas as pd
 import numpy as np
 
+from dataengineeringutils.datatypes import translate_metadata_type_to_type, translate_metadata_types_to_types
+
 def _remove_paritions_from_table_metadata(table_metadata):
 
     if "partitions" in table_metadata:
@@ -18,10 +20,6 @@ def _get_np_datatype_from_metadata(col_name, table_metadata):
     """
 
     columns_metadata = table_metadata["columns"]
-    with pkg_resources.resource_stream(__name__, "data/data_type_conversion.csv") as io:
-        type_conversion = pd.read_csv(io)
-    type_conversion = type_conversion.set_index("metadata")
-    type_conversion_dict = type_conversion.to_dict(orient="index")
 
     col = None
     for c in columns_metadata:
@@ -30,7 +28,7 @@ def _get_np_datatype_from_metadata(col_name, table_metadata):
 
     if col:
         agnostic_type = col["type"]
-        numpy_type = type_conversion_dict[agnostic_type]["pandas"]
+        numpy_type = translate_metadata_type_to_type(agnostic_type, "pandas")
         return np.typeDict[numpy_type]
     else:
         return None
@@ -41,13 +39,6 @@ def _pd_dtype_dict_from_metadata(table_metadata, ignore_partitions=False):
     passed to the dtype argument of pd.read_csv
     """
 
-    with pkg_resources.resource_stream(__name__, "data/data_type_conversion.csv") as io:
-        type_conversion = pd.read_csv(io)
-
-    type_conversion = type_conversion.set_index("metadata")
-
-    type_conversion_dict = type_conversion.to_dict(orient="index")
-
     table_metadata_columns = table_metadata["columns"]
 
     if ignore_partitions:
@@ -56,10 +47,10 @@ def _pd_dtype_dict_from_metadata(table_metadata, ignore_partitions=False):
     dtype = {}
     parse_dates = []
 
-    for c in table_metadata_columns:
+    pandas_types = translate_metadata_types_to_types(table_metadata_columns, "pandas")
+
+    for c, coltype in zip(table_metadata_columns, pandas_types):
         colname = c["name"]
-        coltype = c["type"]
-        coltype = type_conversion_dict[coltype]['pandas']
         dtype[colname] = np.typeDict[coltype]
 
     return dtype
@@ -89,6 +80,10 @@ def pd_read_csv_using_metadata(filepath_or_buffer, table_metadata, ignore_partit
     Passes through kwargs to pandas.read_csv
 
     If ignore_partitions=True, assume that partitions are not columns in the dataset
+
+    With engine="pyarrow" the file is memory mapped and parsed by pyarrow's multi-threaded csv reader instead,
+    which gives the same dataframe as the default engine many times faster on big local files (see _pd_read_csv_pyarrow
+    for the read_csv options it supports). Dates have to be ISO 8601 e.g. 2018-01-01 or 2018-01-01 10:00:00
     """
     if ignore_partitions:
         table_metadata = _remove_paritions_from_table_metadata(table_metadata)
@@ -96,8 +91,95 @@ def pd_read_csv_using_metadata(filepath_or_buffer, table_metadata, ignore_partit
     dtype = _pd_dtype_dict_from_metadata(table_metadata, ignore_partitions)
     parse_dates = _pd_date_parse_list_from_metadatadata(table_metadata)
 
+    if kwargs.get("engine") == "pyarrow":
+        if args:
+            raise ValueError("Pass read_csv options as keyword arguments when engine='pyarrow'")
+        kwargs.pop("engine")
+        return _pd_read_csv_pyarrow(filepath_or_buffer, dtype, parse_dates, **kwargs)
+
     return pd.read_csv(filepath_or_buffer, dtype = dtype, parse_dates = parse_dates, *args, **kwargs)
 
+# pyarrow reads the csv in blocks of this many bytes, one block per thread
+PYARROW_BLOCK_SIZE = 16 * 1024 * 1024
+
+# The strings pandas.read_csv reads as NaN by default (keep_default_na=True)
+DEFAULT_NA_VALUES = ('', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                     '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null')
+
+def _pyarrow_column_types(dtype, parse_dates):
+    """
+    The arrow type of each column that parses to the same values and converts to the same pandas dtype as read_csv with dtype and parse_dates
+    """
+    import pyarrow as pa
+
+    column_types = {}
+    for name, numpy_type in dtype.items():
+        if name in parse_dates:
+            column_types[name] = pa.timestamp("ns")
+        elif np.dtype(numpy_type) == np.dtype(object):
+            column_types[name] = pa.string()
+        else:
+            column_types[name] = pa.from_numpy_dtype(np.dtype(numpy_type))
+    return column_types
+
+def _pd_read_csv_pyarrow(filepath_or_buffer, dtype, parse_dates, sep=",", delimiter=None, header="infer", names=None, quotechar='"',
+                         escapechar=None, doublequote=True, encoding="utf-8", na_values=None, keep_default_na=True,
+                         newlines_in_values=False, block_size=PYARROW_BLOCK_SIZE, **kwargs):
+    """
+    Read a csv with pyarrow into the same dataframe read_csv(filepath_or_buffer, dtype=dtype, parse_dates=parse_dates, ...) gives.
+    Local files are memory mapped (or streamed if compressed) and parsed in parallel blocks, converting to the metadata types as they're parsed.
+    Set newlines_in_values=True if quoted values contain new lines
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    from dataengineeringutils.compression import codec_from_path
+
+    if kwargs:
+        raise ValueError("read_csv options {} aren't supported with engine='pyarrow'".format(", ".join(sorted(kwargs))))
+    if header not in ("infer", 0, None):
+        raise ValueError("header must be 0 or None with engine='pyarrow'")
+    if header == "infer":
+        header = 0 if names is None else None
+
+    read_options = pa_csv.ReadOptions(use_threads=True, block_size=block_size, encoding=encoding)
+    if names is not None:
+        read_options.column_names = list(names)
+        read_options.skip_rows = 1 if header == 0 else 0
+    elif header is None:
+        read_options.autogenerate_column_names = True
+
+    parse_options = pa_csv.ParseOptions(delimiter=delimiter or sep, quote_char=quotechar, double_quote=doublequote,
+                                        escape_char=escapechar if escapechar else False, newlines_in_values=newlines_in_values)
+
+    null_values = set(DEFAULT_NA_VALUES) if keep_default_na else set()
+    null_values.update([na_values] if isinstance(na_values, str) else (na_values or []))
+    convert_options = pa_csv.ConvertOptions(column_types=_pyarrow_column_types(dtype, parse_dates), null_values=sorted(null_values),
+                                            strings_can_be_null=True, true_values=["True", "TRUE", "true"], false_values=["False", "FALSE", "false"])
+
+    if isinstance(filepath_or_buffer, (str, os.PathLike)):
+        path = os.fspath(filepath_or_buffer)
+        source = pa.input_stream(path, compression="detect") if codec_from_path(path) else pa.memory_map(path, "r")
+        with source:
+            table = pa_csv.read_csv(source, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+    else:
+        table = pa_csv.read_csv(filepath_or_buffer, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+
+    for name in table.column_names:
+        if name in dtype and name not in parse_dates and np.dtype(dtype[name]).kind in "biu" and table.column(name).null_count:
+            # As the default engine, rather than returning floats
+            raise ValueError("Integer or boolean column {} has NA values".format(name))
+
+    df = table.to_pandas()
+    if header is None and names is None:
+        df.columns = range(len(df.columns))
+    for name in df.columns:
+        # The default engine uses NaN for missing strings rather than None
+        if df[name].dtype == object:
+            missing = df[name].isna()
+            if missing.any():
+                df.loc[missing, name] = np.nan
+    return df
+
 def _pd_df_cols_match_metadata_cols(df, table_metadata):
     """
     Is the set of columns in the metadata equal to the set of columns in the dataframe?
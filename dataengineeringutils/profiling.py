@@ -0,0 +1,204 @@
+import math
+import shutil
+import logging
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dataengineeringutils.backend import get_client
+from dataengineeringutils.s3 import s3_path_to_bucket_key
+from dataengineeringutils.pd_metadata_conformance import pd_read_csv_using_metadata
+
+log = logging.getLogger(__name__)
+
+# Longer string minimums are truncated (which keeps them a lower bound) and longer maximums are dropped
+MAX_STRING_STATISTIC_LENGTH = 256
+
+class HyperLogLog :
+    """
+    Approximate distinct count in fixed memory (2**precision one byte registers, 4KB by default).
+    The standard error is about 1.04 / sqrt(2**precision), i.e. 1.6% at the default precision of 12.
+    """
+
+    def __init__(self, precision = 12) :
+        if not 4 <= precision <= 18 :
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values) :
+        """
+        Add a series (or array) of non null values
+        """
+        if len(values) == 0 :
+            return
+        hashes = pd.util.hash_pandas_object(pd.Series(values), index=False).values
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.intp)
+        rest = hashes << p
+        # The register keeps the highest position of the first 1 bit seen in the remaining bits
+        rank = np.full(len(rest), 64 - self.precision + 1, dtype=np.uint8)
+        nonzero = rest != 0
+        bit_length = np.minimum(np.floor(np.log2(rest[nonzero].astype(np.float64))), 63) + 1
+        rank[nonzero] = (65 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other) :
+        if other.precision != self.precision :
+            raise ValueError("Can't merge sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) :
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros :
+            # Linear counting is more accurate for small cardinalities
+            return m * math.log(m / zeros)
+        return float(raw)
+
+class _ColumnProfile :
+
+    def __init__(self, column_type, precision) :
+        self.column_type = column_type
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        self.comparable = True
+        self.sketch = HyperLogLog(precision)
+
+    def update(self, series) :
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        if len(values) == 0 :
+            return
+        self.sketch.add(values)
+        if not self.comparable :
+            return
+        try :
+            chunk_min, chunk_max = values.min(), values.max()
+            self.min = chunk_min if self.min is None or chunk_min < self.min else self.min
+            self.max = chunk_max if self.max is None or chunk_max > self.max else self.max
+        except TypeError :
+            # e.g. an object column mixing strings and numbers
+            self.comparable = False
+            self.min = self.max = None
+
+    def _value_to_json(self, value) :
+        if value is None :
+            return None
+        if isinstance(value, np.generic) :
+            value = value.item()
+        if self.column_type == "date" and hasattr(value, "strftime") :
+            return value.strftime("%Y-%m-%d")
+        if hasattr(value, "isoformat") :
+            return value.isoformat(sep=" ") if isinstance(value, pd.Timestamp) else value.isoformat()
+        return value
+
+    def statistics(self, row_count) :
+        minimum, maximum = self._value_to_json(self.min), self._value_to_json(self.max)
+        if isinstance(minimum, str) and len(minimum) > MAX_STRING_STATISTIC_LENGTH :
+            minimum = minimum[:MAX_STRING_STATISTIC_LENGTH]
+        if isinstance(maximum, str) and len(maximum) > MAX_STRING_STATISTIC_LENGTH :
+            maximum = None
+        non_null = row_count - self.null_count
+        return {
+            "null_count": self.null_count,
+            "min": minimum,
+            "max": maximum,
+            "distinct_count": min(non_null, int(round(self.sketch.estimate())))
+        }
+
+class TableProfiler :
+    """
+    Column statistics (null count, min, max and approximate distinct count) gathered a chunk at a time,
+    so a table can be profiled while it is read without holding it in memory or reading it twice.
+
+    e.g.
+        profiler = TableProfiler(table_metadata)
+        for chunk in profiler.profile_chunks(pd_read_csv_using_metadata(path, table_metadata, chunksize=100000)) :
+            ...
+        table_metadata = add_statistics_to_metadata(table_metadata, profiler.statistics())
+    Args:
+        table_metadata: Table metadata, its columns are profiled (columns in the data that aren't in the metadata are ignored)
+        precision: HyperLogLog precision, memory per column is 2**precision bytes
+    """
+
+    def __init__(self, table_metadata, precision = 12) :
+        self.row_count = 0
+        self._columns = [(c["name"], _ColumnProfile(c["type"], precision)) for c in table_metadata["columns"]]
+
+    def update(self, df) :
+        """
+        Add a chunk of the table to the profile. Returns the chunk unchanged
+        """
+        self.row_count += len(df)
+        for name, profile in self._columns :
+            if name in df.columns :
+                profile.update(df[name])
+            else :
+                # A column missing from the chunk is all null
+                profile.null_count += len(df)
+        return df
+
+    def profile_chunks(self, chunks) :
+        """
+        Profile each chunk of an iterable of dataframes as it's yielded
+        """
+        for chunk in chunks :
+            yield self.update(chunk)
+
+    def statistics(self) :
+        """
+        {'row_count': rows, 'columns': {column name: {'null_count', 'min', 'max', 'distinct_count'}}}
+        """
+        columns = dict((name, profile.statistics(self.row_count)) for name, profile in self._columns)
+        return {"row_count": self.row_count, "columns": columns}
+
+def profile_csv_using_metadata(filepath_or_buffer, table_metadata, chunksize = 100000, precision = 12, **kwargs) :
+    """
+    Profile a csv, reading it chunksize rows at a time with pd_read_csv_using_metadata (kwargs are passed through)
+    """
+    profiler = TableProfiler(table_metadata, precision)
+    for _ in profiler.profile_chunks(pd_read_csv_using_metadata(filepath_or_buffer, table_metadata, chunksize=chunksize, **kwargs)) :
+        pass
+    return profiler.statistics()
+
+def profile_parquet(source, table_metadata, batch_size = 65536, precision = 12) :
+    """
+    Profile a parquet file (a local path, file object or s3 path), batch_size rows at a time.
+    Files in s3 are downloaded to a temporary file first, as parquet is read from the end.
+    """
+    import pyarrow.parquet as pq
+    profiler = TableProfiler(table_metadata, precision)
+    columns = [c["name"] for c in table_metadata["columns"]]
+
+    def profile(f) :
+        parquet_file = pq.ParquetFile(f)
+        columns_in_file = [c for c in columns if c in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns_in_file) :
+            profiler.update(batch.to_pandas())
+
+    if isinstance(source, str) and source.startswith("s3://") :
+        bucket, key = s3_path_to_bucket_key(source)
+        with tempfile.TemporaryFile() as f :
+            shutil.copyfileobj(get_client('s3').get_object(Bucket=bucket, Key=key)['Body'], f)
+            f.seek(0)
+            profile(f)
+    else :
+        profile(source)
+    return profiler.statistics()
+
+def add_statistics_to_metadata(table_metadata, statistics) :
+    """
+    Return a copy of table_metadata with statistics (from TableProfiler.statistics) recorded against the table and each column.
+    metadata_to_glue_table_definition writes these into the glue table and column Parameters.
+    """
+    new_metadata = dict(table_metadata)
+    new_metadata["statistics"] = {"row_count": statistics["row_count"]}
+    column_statistics = statistics["columns"]
+    new_metadata["columns"] = [dict(c, statistics=column_statistics[c["name"]]) if c["name"] in column_statistics else c
+                               for c in table_metadata["columns"]]
+    return new_metadata
@@ -0,0 +1,237 @@
+"""
+Client side rate limiting and retries for bursts of AWS calls.
+
+Each API family (e.g. glue catalogue reads) has a token bucket shared by every thread in the process, so running
+many glue calls in parallel slows down to the family's budget instead of being throttled by AWS. Calls that are
+throttled (or fail with a 5xx error) anyway are retried with jittered exponential backoff.
+"""
+
+import time
+import random
+import logging
+import threading
+
+from dataengineeringutils.instrumentation import THROTTLE_ERROR_CODES, record_retry, record_wait
+
+log = logging.getLogger(__name__)
+
+RETRYABLE_ERROR_CODES = THROTTLE_ERROR_CODES + ('InternalServiceException', 'InternalError', 'InternalFailure', 'ServiceUnavailable', 'ServiceUnavailableException')
+
+# Requests per second (and burst size) for each family of glue operations
+GLUE_BUDGETS = {
+    'catalog_read': (40, 40),
+    'catalog_write': (20, 20),
+    'job_control': (10, 10),
+    'other': (10, 10)
+}
+
+GLUE_API_FAMILIES = {
+    'get_database': 'catalog_read',
+    'get_databases': 'catalog_read',
+    'get_table': 'catalog_read',
+    'get_tables': 'catalog_read',
+    'get_partition': 'catalog_read',
+    'get_partitions': 'catalog_read',
+    'create_database': 'catalog_write',
+    'update_database': 'catalog_write',
+    'delete_database': 'catalog_write',
+    'create_table': 'catalog_write',
+    'update_table': 'catalog_write',
+    'delete_table': 'catalog_write',
+    'batch_create_partition': 'catalog_write',
+    'batch_delete_partition': 'catalog_write',
+    'create_job': 'job_control',
+    'update_job': 'job_control',
+    'delete_job': 'job_control',
+    'get_job': 'job_control',
+    'start_job_run': 'job_control',
+    'get_job_run': 'job_control',
+    'get_job_runs': 'job_control'
+}
+
+class TokenBucket :
+    """
+    Thread safe token bucket allowing rate requests per second on average with bursts of up to burst requests
+    """
+
+    def __init__(self, rate, burst = None) :
+        if rate <= 0 :
+            raise ValueError("rate must be greater than 0")
+        self.rate = float(rate)
+        self.burst = float(rate if burst is None else burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) :
+        """
+        Take a token, sleeping until one is available. Returns the seconds spent waiting
+        """
+        with self._lock :
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # A negative balance is this caller's place in the queue
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0 :
+            time.sleep(wait)
+        return wait
+
+class FamilyStats :
+
+    __slots__ = ('requests', 'wait_seconds', 'retries', 'throttles', 'backoff_seconds')
+
+    def __init__(self) :
+        self.requests = 0
+        self.wait_seconds = 0.0
+        self.retries = 0
+        self.throttles = 0
+        self.backoff_seconds = 0.0
+
+    def to_dict(self) :
+        return dict((k, getattr(self, k)) for k in self.__slots__)
+
+class RateLimiter :
+    """
+    Token bucket per API family plus retries with full jitter exponential backoff.
+
+    Args:
+        service_name: The service the limited clients belong to (used in instrumentation)
+        budgets: dict of family to (requests per second, burst)
+        families: dict of operation name to family. Operations not listed use the 'other' family
+        max_attempts: Attempts per call (including the first) before a retryable error is raised
+        base_delay: Backoff before the first retry, doubled on each retry
+        max_delay: Longest backoff
+    """
+
+    def __init__(self, service_name, budgets, families = None, max_attempts = 8, base_delay = 0.1, max_delay = 20) :
+        self.service_name = service_name
+        self.families = {} if families is None else dict(families)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.set_budgets(budgets)
+
+    def set_budgets(self, budgets) :
+        """
+        Replace the budgets of the given families, dict of family to (requests per second, burst)
+        """
+        with self._lock :
+            buckets = dict(getattr(self, '_buckets', {}))
+            for family, (rate, burst) in budgets.items() :
+                buckets[family] = TokenBucket(rate, burst)
+            buckets.setdefault('other', TokenBucket(*budgets.get('other', (10, 10))))
+            self._buckets = buckets
+
+    def _family(self, operation_name) :
+        return self.families.get(operation_name, 'other')
+
+    def _family_stats(self, family) :
+        with self._lock :
+            if family not in self._stats :
+                self._stats[family] = FamilyStats()
+            return self._stats[family]
+
+    def stats(self) :
+        """
+        dict of family to its requests, seconds waited for the rate limit, retries, throttles and seconds spent backing off
+        """
+        with self._lock :
+            return dict((family, stats.to_dict()) for family, stats in sorted(self._stats.items()))
+
+    def reset_stats(self) :
+        with self._lock :
+            self._stats = {}
+
+    def wait_for_token(self, operation_name) :
+        family = self._family(operation_name)
+        waited = self._buckets[family].acquire()
+        stats = self._family_stats(family)
+        with self._lock :
+            stats.requests += 1
+            stats.wait_seconds += waited
+        if waited > 0 :
+            record_wait(self.service_name, operation_name, waited)
+
+    def call(self, operation_name, method, *args, **kwargs) :
+        """
+        Call method once a token is available, retrying retryable errors
+        """
+        stats = self._family_stats(self._family(operation_name))
+        for attempt in range(self.max_attempts) :
+            self.wait_for_token(operation_name)
+            try :
+                return method(*args, **kwargs)
+            except Exception as e :
+                response = getattr(e, 'response', None)
+                error_code = response.get('Error', {}).get('Code') if isinstance(response, dict) else None
+                if error_code not in RETRYABLE_ERROR_CODES or attempt == self.max_attempts - 1 :
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                with self._lock :
+                    stats.retries += 1
+                    stats.backoff_seconds += delay
+                    if error_code in THROTTLE_ERROR_CODES :
+                        stats.throttles += 1
+                log.debug("{}.{} failed with {}, retrying in {:.2f}s".format(self.service_name, operation_name, error_code, delay))
+                record_retry(self.service_name, operation_name, error_code)
+                record_wait(self.service_name, operation_name, delay)
+                time.sleep(delay)
+
+    def wrap(self, client) :
+        """
+        Return a proxy for client whose calls go through this rate limiter
+        """
+        return RateLimitedClient(client, self)
+
+class RateLimitedClient :
+    """
+    Proxy for a client that routes every request through a RateLimiter. Paginated calls wait for a token before each page
+    """
+
+    def __init__(self, client, limiter) :
+        self._client = client
+        self._limiter = limiter
+
+    def __getattr__(self, name) :
+        attribute = getattr(self._client, name)
+        if name.startswith('_') or name in ('exceptions', 'meta', 'can_paginate', 'get_waiter') or not callable(attribute) :
+            return attribute
+        if name == 'get_paginator' :
+            return lambda operation_name: _RateLimitedPaginator(attribute(operation_name), operation_name, self._limiter)
+
+        def limited(*args, **kwargs) :
+            return self._limiter.call(name, attribute, *args, **kwargs)
+        limited.__name__ = name
+        return limited
+
+class _RateLimitedPaginator :
+
+    def __init__(self, paginator, operation_name, limiter) :
+        self._paginator = paginator
+        self._operation_name = operation_name
+        self._limiter = limiter
+
+    def __getattr__(self, name) :
+        return getattr(self._paginator, name)
+
+    def paginate(self, **kwargs) :
+        pages = iter(self._paginator.paginate(**kwargs))
+        while True :
+            self._limiter.wait_for_token(self._operation_name)
+            try :
+                page = next(pages)
+            except StopIteration :
+                return
+            yield page
+
+glue_rate_limiter = RateLimiter('glue', GLUE_BUDGETS, GLUE_API_FAMILIES)
+
+def set_glue_budgets(budgets) :
+    """
+    Change the process wide glue budgets, e.g. set_glue_budgets({'catalog_write': (5, 10)}) for 5 requests a second with bursts of 10
+    """
+    glue_rate_limiter.set_budgets(budgets)
@@ -0,0 +1,210 @@
+import io
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dataengineeringutils.backend import get_client
+from dataengineeringutils.datatypes import translate_metadata_types_to_types
+from dataengineeringutils.s3 import s3_path_to_bucket_key
+from dataengineeringutils.partitions import (HIVE_DEFAULT_PARTITION, partition_key_names, resolve_table_location, format_partition_value,
+                                             escape_partition_value, unescape_partition_value)
+
+log = logging.getLogger(__name__)
+
+CSV_DATA_FORMATS = ("csv", "csv_quoted_nodate")
+PARQUET_DATA_FORMATS = ("par", "parquet")
+
+def _filter_values(partition_filters, partition_keys, column_types) :
+    filters = {}
+    for name, values in (partition_filters or {}).items() :
+        if name not in partition_keys :
+            raise ValueError("{} is not a partition key. Partition keys are: {}".format(name, ", ".join(partition_keys)))
+        if not isinstance(values, (list, tuple, set)) :
+            values = [values]
+        if len(values) == 0 :
+            raise ValueError("No values given for partition {}".format(name))
+        filters[name] = set(format_partition_value(v, column_types.get(name)) for v in values)
+    return filters
+
+def _listing_prefixes(location, partition_keys, filters) :
+    # Filters on the leading partition keys narrow the listing to just those folders
+    prefixes = [location]
+    for name in partition_keys :
+        if name not in filters :
+            break
+        prefixes = [p + "{}={}/".format(name, escape_partition_value(v)) for p in prefixes for v in sorted(filters[name])]
+    return prefixes
+
+def _parse_partition_path(relative_key, partition_keys) :
+    """
+    The (unescaped) partition values in the folders of a key relative to the table location, or None if it isn't in a partition folder
+    """
+    folders = relative_key.split("/")[:-1]
+    if len(folders) < len(partition_keys) :
+        return None
+    partition = {}
+    for name, folder in zip(partition_keys, folders) :
+        key, _, value = folder.partition("=")
+        if key != name :
+            return None
+        partition[name] = unescape_partition_value(value)
+    return partition
+
+def list_table_files(table_metadata, location = None, database_metadata = None, partition_filters = None) :
+    """
+    List the data files of a table, skipping empty files and hidden files (names starting with _ or . e.g. _SUCCESS).
+    Args:
+        table_metadata: Table metadata
+        location: s3 path of the table, defaults to the table's location (relative to database_metadata's location if it isn't a full s3 path)
+        database_metadata: Database metadata, needed to resolve a relative table location
+        partition_filters: dict of partition key to a value or list of values e.g. {'year': [2017, 2018]}
+    Returns:
+        list of dicts with the path, size and partition (dict of partition key to value as a string) of each file
+    """
+    location = resolve_table_location(table_metadata, location, database_metadata)
+    partition_keys = partition_key_names(table_metadata)
+    filters = _filter_values(partition_filters, partition_keys, dict((c["name"], c["type"]) for c in table_metadata["columns"]))
+    bucket, table_prefix = s3_path_to_bucket_key(location)
+    paginator = get_client('s3').get_paginator('list_objects_v2')
+
+    files = []
+    for prefix in _listing_prefixes(table_prefix, partition_keys, filters) :
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix) :
+            for obj in page.get("Contents", []) :
+                relative_key = obj["Key"][len(table_prefix):]
+                file_name = relative_key.rsplit("/", 1)[-1]
+                if file_name == "" or file_name[0] in "_." or obj["Size"] == 0 :
+                    continue
+                partition = _parse_partition_path(relative_key, partition_keys)
+                if partition is None :
+                    log.warning("Skipping s3://{}/{} as it isn't in a partition folder".format(bucket, obj["Key"]))
+                    continue
+                if any(partition[name] not in values for name, values in filters.items()) :
+                    continue
+                files.append({"path": "s3://{}/{}".format(bucket, obj["Key"]), "size": obj["Size"], "partition": partition})
+    return files
+
+def _typed_partition_column(value, column_type, pandas_type, rows) :
+    import pandas as pd
+    import numpy as np
+    if value == HIVE_DEFAULT_PARTITION :
+        return pd.Series([np.nan] * rows, dtype=object)
+    if column_type in ("date", "datetime") :
+        return pd.Series(np.repeat(pd.Timestamp(value).to_datetime64(), rows))
+    return pd.Series([value] * rows, dtype=object).astype(np.dtype(pandas_type))
+
+def _empty_frame(table_metadata) :
+    """
+    A dataframe with no rows and the metadata's columns and dtypes
+    """
+    import pandas as pd
+    import numpy as np
+    columns = table_metadata["columns"]
+    pandas_types = translate_metadata_types_to_types(columns, "pandas")
+    return pd.DataFrame(dict(
+        (c["name"], pd.Series([], dtype="datetime64[ns]" if c["type"] in ("date", "datetime") else np.dtype(t)))
+        for c, t in zip(columns, pandas_types)))
+
+def _file_reader(table_metadata, csv_kwargs) :
+    """
+    A function that downloads and parses one file of the table (from list_table_files) into a dataframe
+    with the metadata's columns, in metadata order, and consistent dtypes
+    """
+    import pandas as pd
+    import numpy as np
+    from dataengineeringutils.pd_metadata_conformance import pd_read_csv_using_metadata
+
+    data_format = table_metadata.get("data_format", "csv")
+    if data_format not in CSV_DATA_FORMATS + PARQUET_DATA_FORMATS :
+        raise ValueError("Reading {} tables isn't supported, only {}".format(data_format, ", ".join(CSV_DATA_FORMATS + PARQUET_DATA_FORMATS)))
+    partition_keys = partition_key_names(table_metadata)
+    columns = table_metadata["columns"]
+    pandas_types = dict(zip([c["name"] for c in columns], translate_metadata_types_to_types(columns, "pandas")))
+    column_types = dict((c["name"], c["type"]) for c in columns)
+    data_metadata = dict(table_metadata, columns=[c for c in columns if c["name"] not in partition_keys])
+    data_columns = [c["name"] for c in data_metadata["columns"]]
+    string_columns = [name for name in data_columns if column_types[name] == "character"]
+    s3_client = get_client('s3')
+
+    def read(table_file) :
+        bucket, key = s3_path_to_bucket_key(table_file["path"])
+        body = io.BytesIO(s3_client.get_object(Bucket=bucket, Key=key)["Body"].read())
+        if data_format in CSV_DATA_FORMATS :
+            kwargs = dict({"header": None, "names": data_columns}, **csv_kwargs)
+            df = pd_read_csv_using_metadata(body, data_metadata, **kwargs)
+        else :
+            import pyarrow.parquet as pq
+            df = pq.read_table(body, columns=data_columns).to_pandas()
+            for name in data_columns :
+                if column_types[name] in ("date", "datetime") :
+                    df[name] = pd.to_datetime(df[name])
+                elif df[name].dtype != np.dtype(pandas_types[name]) :
+                    df[name] = df[name].astype(pandas_types[name])
+        for name in partition_keys :
+            if name in pandas_types :
+                df[name] = _typed_partition_column(table_file["partition"][name], column_types[name], pandas_types[name], len(df))
+        # Missing strings are NaN whatever the file format (parquet gives None, csv NaN)
+        for name in string_columns :
+            if df[name].dtype == object :
+                df[name] = df[name].where(df[name].notna(), np.nan)
+        return df[[c["name"] for c in columns]]
+
+    return read
+
+def iter_table_using_metadata(table_metadata, location = None, database_metadata = None, partition_filters = None, max_workers = 8,
+                              files = None, **csv_kwargs) :
+    """
+    Yield a dataframe for each file of a table, in listing order. Files are downloaded and parsed max_workers at a time,
+    so at most max_workers files are held in memory however big the table is.
+    Args are as pd_read_table_using_metadata
+    """
+    if files is None :
+        files = list_table_files(table_metadata, location, database_metadata, partition_filters)
+    read = _file_reader(table_metadata, csv_kwargs)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor :
+        in_flight = deque()
+        for table_file in files :
+            in_flight.append(executor.submit(read, table_file))
+            if len(in_flight) >= max_workers :
+                yield in_flight.popleft().result()
+        while in_flight :
+            yield in_flight.popleft().result()
+
+def pd_read_table_using_metadata(table_metadata, location = None, database_metadata = None, partition_filters = None, max_workers = 8,
+                                 max_bytes = None, **csv_kwargs) :
+    """
+    Read every file of a table (optionally only some partitions) into one dataframe, with the metadata's columns and dtypes.
+    Partition columns are filled in from the hive style folders (location/key=value/...) the files are in.
+
+    Files are downloaded and parsed in parallel. If the files add up to more than max_bytes (as stored in s3) the table is
+    streamed instead: an iterator of one dataframe per file is returned (see iter_table_using_metadata).
+    Args:
+        table_metadata: Table metadata, with data_format csv, csv_quoted_nodate or parquet
+        location: s3 path of the table, defaults to the table's location (relative to database_metadata's location if it isn't a full s3 path)
+        database_metadata: Database metadata, needed to resolve a relative table location
+        partition_filters: dict of partition key to a value or list of values e.g. {'year': [2017, 2018], 'region': 'north'}
+        max_workers: Number of files downloaded and parsed at once
+        max_bytes: Stream the table if its files are bigger than this in total. None never streams
+        csv_kwargs: Passed through to pd_read_csv_using_metadata for csv tables, e.g. header=0 if the files have a header
+    Returns:
+        A dataframe, or an iterator of dataframes if the table is bigger than max_bytes
+    """
+    import pandas as pd
+    started = time.monotonic()
+    files = list_table_files(table_metadata, location, database_metadata, partition_filters)
+    total_bytes = sum(f["size"] for f in files)
+    frames = iter_table_using_metadata(table_metadata, max_workers=max_workers, files=files, **csv_kwargs)
+    if max_bytes is not None and total_bytes > max_bytes :
+        log.warning("{} has {} bytes in {} files, more than max_bytes ({}), streaming it".format(
+            table_metadata.get("table_name"), total_bytes, len(files), max_bytes))
+        return frames
+
+    frames = list(frames)
+    if frames :
+        df = pd.concat(frames, ignore_index=True)
+    else :
+        df = _empty_frame(table_metadata)
+    log.info("Read {} rows from {} files ({} bytes) of {} in {:.1f}s".format(
+        len(df), len(files), total_bytes, table_metadata.get("table_name"), time.monotonic() - started))
+    return df
@@ -1,59 +1,271 @@
-import pandas as pd
 import io
-import boto3
 import re
 import os
+import time
+import hashlib
+import logging
+import binascii
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 from dataengineeringutils.utils import _end_with_slash
+from dataengineeringutils.backend import get_client, get_backend
+from dataengineeringutils.compression import resolve_codec, pandas_only_compression, open_decompressed, open_compressed
 
-s3_resource = boto3.resource('s3')
-s3_client = boto3.client('s3')
+# Streamed uploads are sent in parts of this size (at least 5MB, the smallest part s3 allows), so at most one part is held in memory
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+def __getattr__(name):
+    # s3_client used to be a module level boto3 client, it now comes from the current backend
+    if name == 's3_client':
+        return get_client('s3')
+    if name == 's3_resource':
+        import boto3
+        return boto3.resource('s3')
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+class S3ListingCache :
+    """
+    Caches the keys under s3 prefixes for ttl seconds.
+
+    A cached listing of a prefix also answers any prefix inside it, so listing a folder of glue jobs once
+    answers the listing of every job folder (and shared_job_resources) in it.
+    Writes and deletes made through this module invalidate the module level listing_cache.
+    Listings are only reused while the backend they were made with is the current backend.
+    """
+
+    def __init__(self, ttl = 300) :
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def list_keys(self, bucket, prefix) :
+        """
+        Return a list of all the keys in bucket that start with prefix
+        """
+        now = time.monotonic()
+        backend = get_backend()
+        with self._lock :
+            for (cached_bucket, cached_prefix), (listed_at, listed_with, keys) in self._listings.items() :
+                if cached_bucket == bucket and prefix.startswith(cached_prefix) and now - listed_at < self.ttl and listed_with is backend :
+                    self.hits += 1
+                    return [k for k in keys if k.startswith(prefix)]
+            self.misses += 1
+
+        keys = []
+        # get_client rather than backend.client, so listings made through the cache are instrumented
+        paginator = get_client('s3').get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix) :
+            keys.extend(c['Key'] for c in page.get('Contents', []))
+
+        with self._lock :
+            self._listings[(bucket, prefix)] = (now, backend, keys)
+        return list(keys)
+
+    def invalidate(self, bucket = None, prefix = None) :
+        """
+        Drop cached listings. With no arguments everything is dropped, otherwise only the listings of
+        bucket that could contain keys starting with prefix
+        """
+        with self._lock :
+            for (cached_bucket, cached_prefix) in list(self._listings) :
+                if bucket is not None and cached_bucket != bucket :
+                    continue
+                if prefix is not None and not (prefix.startswith(cached_prefix) or cached_prefix.startswith(prefix)) :
+                    continue
+                del self._listings[(cached_bucket, cached_prefix)]
+
+listing_cache = S3ListingCache()
 
 def s3_path_to_bucket_key(path):
     path = path.replace("s3://", "")
     bucket, key = path.split('/', 1)
     return bucket, key
 
-def s3_path_to_bytes_io(path):
+def open_s3_object(path, compression = "infer"):
+    """
+    Open an s3 object to be read as a stream, decompressing it as it's read
+    Args:
+        path: The full path to the s3 object
+        compression: 'infer' to choose the codec from the extension (e.g. .gz, .bz2, .zst), None or one of gzip, bz2, xz or zstd
+    """
+    bucket, key = s3_path_to_bucket_key(path)
+    body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body']
+    return open_decompressed(body, resolve_codec(key, compression))
+
+class _MultipartUploadWriter(io.RawIOBase):
+    """
+    A writable binary file object that uploads what's written to it as a multipart upload, part_size bytes at a time.
+    Files smaller than one part are uploaded with a single put_object when closed. Call abort() instead of close() on failure
+    """
+
+    def __init__(self, s3_client, bucket, key, part_size = UPLOAD_PART_SIZE):
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._part_size = part_size
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buffer += b
+        while len(self._buffer) >= self._part_size:
+            self._upload_part(bytes(self._buffer[:self._part_size]))
+            del self._buffer[:self._part_size]
+        return len(b)
+
+    def _upload_part(self, body):
+        if self._upload_id is None:
+            self._upload_id = self._s3_client.create_multipart_upload(Bucket=self._bucket, Key=self._key)['UploadId']
+        number = len(self._parts) + 1
+        response = self._s3_client.upload_part(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, PartNumber=number, Body=body)
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': number})
+
+    def close(self):
+        if self.closed:
+            return
+        if self._upload_id is None:
+            self._s3_client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer))
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self._s3_client.complete_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+                                                      MultipartUpload={'Parts': self._parts})
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self):
+        if self._upload_id is not None:
+            self._s3_client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id)
+        self._buffer = bytearray()
+        super().close()
+
+def upload_to_s3(write, path, compression = "infer", level = None, part_size = UPLOAD_PART_SIZE):
+    """
+    Upload whatever write(f) writes to the binary file object f to path, compressing it as it's written.
+    The output is streamed to s3 as a multipart upload of part_size parts, so at most one part is held in memory
+    however big the file is. If write fails the upload is aborted and nothing is written to path
+    Args:
+        write: function that writes the file's bytes to the file object it's given
+        path: The full s3 path to write to
+        compression: 'infer' to choose the codec from the extension (e.g. .gz, .bz2, .zst), None or one of gzip, bz2, xz or zstd
+        level: Compression level, defaults to compression.DEFAULT_LEVELS
+        part_size: Size of each uploaded part, at least 5MB
+    """
+    bucket, key = s3_path_to_bucket_key(path)
+    codec = resolve_codec(key, compression)
+    raw = _MultipartUploadWriter(get_client('s3'), bucket, key, part_size)
+    try:
+        if codec is None:
+            write(raw)
+        else:
+            with open_compressed(raw, codec, level) as f:
+                write(f)
+    except BaseException:
+        raw.abort()
+        raise
+    raw.close()
+    listing_cache.invalidate(bucket, key)
+
+def _csv_writer(df, to_csv_args, to_csv_kwargs, encoding = "utf-8"):
+    def write(f):
+        text = io.TextIOWrapper(f, encoding=encoding, newline="")
+        df.to_csv(text, *to_csv_args, **to_csv_kwargs)
+        text.flush()
+        text.detach()
+    return write
+
+def s3_path_to_bytes_io(path, compression = "infer"):
     """
     Example usage:
     bytes_io = s3_path_to_bytes_io("s3://bucket/file.csv")
     for line in bytes_io.readlines():
         print(line.decode("utf-8"))
+
+    Compressed files (e.g. file.csv.gz) are decompressed, see open_s3_object
     """
-    bucket, key = s3_path_to_bucket_key(path)
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    return io.BytesIO(obj['Body'].read())
+    with open_s3_object(path, compression) as f:
+        return io.BytesIO(f.read())
 
 def pd_read_csv_s3(path, *args, **kwargs):
-    bucket, key = s3_path_to_bucket_key(path)
-    obj = s3_client.get_object(Bucket=bucket, Key=key)
-    return pd.read_csv(io.BytesIO(obj['Body'].read()), *args, **kwargs)
+    """
+    Read a csv from s3 with pandas.read_csv, decompressing it as it's read if it's compressed.
+    compression (default 'infer') is handled here for gzip, bz2, xz and zstd, other pandas compressions e.g. zip are left to pandas
+    """
+    import pandas as pd
+    compression = kwargs.pop("compression", "infer")
+    pandas_compression = pandas_only_compression(path, compression)
+    if pandas_compression is not None:
+        bucket, key = s3_path_to_bucket_key(path)
+        obj = get_client('s3').get_object(Bucket=bucket, Key=key)
+        return pd.read_csv(io.BytesIO(obj['Body'].read()), *args, compression=pandas_compression, **kwargs)
+
+    f = open_s3_object(path, compression)
+    if kwargs.get("chunksize") is not None or kwargs.get("iterator"):
+        # The reader streams from f as it's iterated
+        return pd.read_csv(f, *args, **kwargs)
+    with f:
+        return pd.read_csv(f, *args, **kwargs)
 
 def pd_write_csv_s3(df, path, *args, **kwargs):
+    """
+    Write a dataframe to s3 with DataFrame.to_csv. Files with a .gz, .bz2, .xz or .zst extension (or compression=codec) are compressed as they're written,
+    other pandas compressions e.g. zip are left to pandas
+    """
     bucket, key = s3_path_to_bucket_key(path)
+    compression = kwargs.pop("compression", "infer")
+    pandas_compression = pandas_only_compression(key, compression)
+    if pandas_compression is not None:
+        buffer = io.BytesIO()
+        df.to_csv(buffer, *args, compression=pandas_compression, **kwargs)
+        get_client('s3').put_object(Bucket=bucket, Key=key, Body=buffer.getvalue())
+        listing_cache.invalidate(bucket, key)
+        return
+    codec = resolve_codec(key, compression)
+    if codec is not None:
+        encoding = kwargs.pop("encoding", "utf-8")
+        upload_to_s3(_csv_writer(df, args, kwargs, encoding), path, codec)
+        return
     csv_buffer = io.StringIO()
     df.to_csv(csv_buffer, *args, **kwargs)
-    s3_resource.Object(bucket, key).put(Body=csv_buffer.getvalue())
+    get_client('s3').put_object(Bucket=bucket, Key=key, Body=csv_buffer.getvalue())
+    listing_cache.invalidate(bucket, key)
 
 def upload_file_to_s3_from_path(input_path, bucket_name, output_path):
-   s3_client.upload_file(input_path, bucket_name, output_path)
+   get_client('s3').upload_file(input_path, bucket_name, output_path)
+   listing_cache.invalidate(bucket_name, output_path)
    return "s3://{}/{}".format(bucket_name, output_path)
 
-def upload_meta_data_folder_to_s3(meta_data_base_folder, bucket, output_meta_data_base_folder = None) :
+def upload_meta_data_folder_to_s3(meta_data_base_folder, bucket, output_meta_data_base_folder = None, catalogue = None) :
     """
     Uploads the same meta_data/ folder structure to it's S3 bucket - unless a different base_folder is provided
+    If a MetadataCatalogue with a local folder is provided as catalogue, its files are uploaded (instead of those in
+    meta_data_base_folder, which is ignored) without listing the folder again
     """
-    meta_listing = os.listdir(meta_data_base_folder)
-    regex = ".+(\.json)$"
-    meta_listing = [f for f in meta_listing if re.match(regex, f)]
-    for m in meta_listing:
-        meta_local_path = os.path.join(meta_data_base_folder, m)
-        meta_output_path = meta_local_path if output_meta_data_base_folder is None else os.path.join(output_meta_data_base_folder, m)
+    if catalogue is not None :
+        if catalogue.folder_path is None :
+            raise ValueError("The catalogue has no local metadata folder to upload")
+        meta_local_paths = catalogue.local_paths()
+    else :
+        meta_listing = os.listdir(meta_data_base_folder)
+        regex = ".+(\.json)$"
+        meta_local_paths = [os.path.join(meta_data_base_folder, f) for f in meta_listing if re.match(regex, f)]
+    for meta_local_path in meta_local_paths:
+        meta_output_path = meta_local_path if output_meta_data_base_folder is None else os.path.join(output_meta_data_base_folder, os.path.basename(meta_local_path))
         path = upload_file_to_s3_from_path(meta_local_path, bucket, meta_output_path)
 
 def delete_file_from_s3(bucket_name, key):
-    s3_resource.Object(bucket_name, key).delete()
+    get_client('s3').delete_object(Bucket=bucket_name, Key=key)
+    listing_cache.invalidate(bucket_name, key)
 
 def upload_directory_to_s3(dir_path, s3_dir_parent_path, regex = ".+(\.sql|\.json|\.csv|\.txt|\.py|\.sh)$") :
     
@@ -72,7 +284,7 @@ def upload_directory_to_s3(dir_path, s3_dir_parent_path, regex = ".+(\.sql|\.jso
             if re.match(regex, f) : 
                 path_out = upload_file_to_s3_from_path(f, bucket, key + f.replace(dir_path_prefix, ''))
 
-def delete_folder_from_bucket(bucket, folder):
+def _check_folder_is_safe_to_delete(bucket, folder):
 
     if '/' in bucket:
         raise ValueError("You provided bucket name {}, but this has disallowed punctuation in it".format(bucket))
@@ -83,29 +295,207 @@ def delete_folder_from_bucket(bucket, folder):
             See https://stackoverflow.com/a/11427712/1779128"""
         raise ValueError(message)
 
-    bucket = s3_resource.Bucket(bucket)
+@contextmanager
+def _request_slot(request_budget):
+    if request_budget is None:
+        yield
+    else:
+        with request_budget:
+            yield
+
+def delete_folder_from_bucket(bucket, folder, dry_run = False, request_budget = None):
+    """
+    Delete every object under folder (which must end with a /) in bucket
+    Args:
+        bucket: The bucket name
+        folder: The folder (key prefix) to delete
+        dry_run: If True, only list what would be deleted
+        request_budget: Optional threading.Semaphore that every S3 request has to acquire. Share one between
+            threads to cap the number of requests in flight across all of them
+    Returns:
+        (number of objects, number of bytes) deleted, or that would be deleted if dry_run
+    """
+
+    _check_folder_is_safe_to_delete(bucket, folder)
+    if not dry_run:
+        listing_cache.invalidate(bucket, folder)
+
+    s3_client = get_client('s3')
+    num_objects = 0
+    num_bytes = 0
+    continuation = {}
+    while True:
+        with _request_slot(request_budget):
+            page = s3_client.list_objects_v2(Bucket=bucket, Prefix=folder, **continuation)
+        contents = page.get('Contents', [])
+        if contents and not dry_run:
+            with _request_slot(request_budget):
+                s3_client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': c['Key']} for c in contents], 'Quiet': True})
+        num_objects += len(contents)
+        num_bytes += sum(c['Size'] for c in contents)
+        if not page.get('IsTruncated'):
+            break
+        continuation = {'ContinuationToken': page['NextContinuationToken']}
+
+    return num_objects, num_bytes
+
+# copy_object copies objects of up to 5GB, bigger objects are copied in parts with upload_part_copy
+MAX_COPY_OBJECT_SIZE = 5 * 1024 ** 3
+MIN_MULTIPART_PART_SIZE = 5 * 1024 ** 2
+COPY_PART_SIZE = 512 * 1024 ** 2
+
+def _multipart_etag(part_etags):
+    """
+    The ETag s3 gives an object uploaded in parts: the md5 of the parts' md5s, then the number of parts
+    """
+    digests = b"".join(binascii.unhexlify(etag.strip('"')) for etag in part_etags)
+    return '"{}-{}"'.format(hashlib.md5(digests).hexdigest(), len(part_etags))
+
+# Properties of the source object that upload_part_copy doesn't carry over, so are set when the multipart upload is created
+MULTIPART_COPY_PROPERTIES = ('CacheControl', 'ContentDisposition', 'ContentEncoding', 'ContentLanguage', 'ContentType', 'Expires',
+                             'Metadata', 'ServerSideEncryption', 'SSEKMSKeyId', 'BucketKeyEnabled', 'StorageClass', 'WebsiteRedirectLocation')
+
+def _copy_object_in_parts(s3_client, copy_source, size, bucket, key, part_size, max_workers):
+    source = s3_client.head_object(**copy_source)
+    properties = dict((p, source[p]) for p in MULTIPART_COPY_PROPERTIES if source.get(p) is not None)
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key, **properties)['UploadId']
 
-    bucket.objects.filter(Prefix=folder).delete()
+    def copy_part(part):
+        number, start = part
+        end = min(start + part_size, size) - 1
+        response = s3_client.upload_part_copy(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                                              CopySource=copy_source, CopySourceRange="bytes={}-{}".format(start, end))
+        return {'ETag': response['CopyPartResult']['ETag'], 'PartNumber': number}
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            parts = list(executor.map(copy_part, enumerate(range(0, size, part_size), 1)))
+        etag = s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})['ETag']
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return etag, _multipart_etag([p['ETag'] for p in parts])
+
+def _is_kms_encrypted(*head_object_responses):
+    return any(h.get('ServerSideEncryption') == 'aws:kms' for h in head_object_responses)
+
+def _check_copy_paths(source_bucket, source_folder, destination_bucket, destination_folder):
+    _check_folder_is_safe_to_delete(source_bucket, source_folder)
+    _check_folder_is_safe_to_delete(destination_bucket, destination_folder)
+    if source_bucket == destination_bucket and (source_folder.startswith(destination_folder) or destination_folder.startswith(source_folder)):
+        raise ValueError("The source folder {} and destination folder {} overlap".format(source_folder, destination_folder))
+
+def copy_folder(source_path, destination_path, max_workers = 16, delete_source = False, verify_etags = True,
+                multipart_threshold = MAX_COPY_OBJECT_SIZE, part_size = COPY_PART_SIZE, part_workers = 4, dry_run = False):
+    """
+    Copy every object under an s3 folder to another folder, e.g. to promote a table built in a staging folder to its location.
+    Objects are copied server side (no data passes through this machine), max_workers objects at a time.
+    Objects bigger than multipart_threshold (at most 5GB, the copy_object limit) are copied in parallel parts,
+    keeping the source's content type, user metadata and encryption settings.
+
+    Each copy is checked against the source's size and ETag. If delete_source, the source objects are deleted
+    only once every copy has succeeded, so a failed copy leaves the source intact (and the destination partly written).
+    Args:
+        source_path: s3 folder to copy from, must end with a /
+        destination_path: s3 folder to copy to, must end with a / and not overlap the source
+        max_workers: Number of objects copied at once
+        delete_source: Delete the source objects after copying them (see move_folder)
+        verify_etags: Check ETags as well as sizes. ETags aren't checked for objects encrypted with SSE-KMS (source or copy), as they aren't md5s
+        multipart_threshold: Objects bigger than this are copied in parts
+        part_size: Size of each part of a multipart copy (between 5MB and 5GB)
+        part_workers: Number of parts of each multipart copy copied at once, so at most max_workers * part_workers requests are in flight
+        dry_run: Only list what would be copied
+    Returns:
+        dict of the number of objects, bytes and objects copied in parts, and the seconds taken
+    """
+    started = time.monotonic()
+    source_bucket, source_folder = s3_path_to_bucket_key(source_path)
+    destination_bucket, destination_folder = s3_path_to_bucket_key(destination_path)
+    _check_copy_paths(source_bucket, source_folder, destination_bucket, destination_folder)
+    if not MIN_MULTIPART_PART_SIZE <= part_size <= MAX_COPY_OBJECT_SIZE:
+        raise ValueError("part_size must be between {} and {} bytes".format(MIN_MULTIPART_PART_SIZE, MAX_COPY_OBJECT_SIZE))
+    if multipart_threshold > MAX_COPY_OBJECT_SIZE:
+        raise ValueError("multipart_threshold can't be more than the copy_object limit of {} bytes".format(MAX_COPY_OBJECT_SIZE))
+
+    s3_client = get_client('s3')
+    objects = []
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=source_bucket, Prefix=source_folder):
+        objects.extend(page.get('Contents', []))
+    summary = {'objects': len(objects), 'bytes': sum(o['Size'] for o in objects),
+               'multipart': sum(1 for o in objects if o['Size'] > multipart_threshold)}
+    if dry_run:
+        summary['seconds'] = time.monotonic() - started
+        return summary
+
+    def copy(obj):
+        key = destination_folder + obj['Key'][len(source_folder):]
+        copy_source = {'Bucket': source_bucket, 'Key': obj['Key']}
+        if obj['Size'] > multipart_threshold:
+            etag, expected_etag = _copy_object_in_parts(s3_client, copy_source, obj['Size'], destination_bucket, key, part_size, part_workers)
+        else:
+            etag = s3_client.copy_object(Bucket=destination_bucket, Key=key, CopySource=copy_source)['CopyObjectResult']['ETag']
+            # A copy made in one request has the md5 ETag of the content, which a multipart source's ETag isn't
+            expected_etag = obj['ETag'] if '-' not in obj['ETag'] else etag
+        copied = s3_client.head_object(Bucket=destination_bucket, Key=key)
+        if copied['ContentLength'] != obj['Size']:
+            raise ValueError("Copied s3://{}/{} is {} bytes, the source is {} bytes".format(destination_bucket, key, copied['ContentLength'], obj['Size']))
+        # The ETags of SSE-KMS objects aren't md5s of their content, so only their sizes are checked.
+        # The source is only looked at if the ETags don't match
+        if (verify_etags and not etag == expected_etag == copied['ETag']
+                and not _is_kms_encrypted(copied, s3_client.head_object(Bucket=source_bucket, Key=obj['Key']))):
+            raise ValueError("Copied s3://{}/{} has ETag {}, expected {}".format(destination_bucket, key, copied['ETag'], expected_etag))
+
+    listing_cache.invalidate(destination_bucket, destination_folder)
+    if objects:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(objects)))) as executor:
+            list(executor.map(copy, objects))
+
+    if delete_source:
+        listing_cache.invalidate(source_bucket, source_folder)
+        # Only the objects that were copied, anything written to the source since is left alone
+        for i in range(0, len(objects), 1000):
+            response = s3_client.delete_objects(Bucket=source_bucket, Delete={'Objects': [{'Key': o['Key']} for o in objects[i:i + 1000]], 'Quiet': True})
+            if response.get('Errors'):
+                raise ValueError("Failed to delete {} source objects e.g. {}".format(len(response['Errors']), response['Errors'][0]))
+
+    summary['seconds'] = time.monotonic() - started
+    log.info("{} {} objects ({} bytes) from {} to {} in {:.1f}s".format("Moved" if delete_source else "Copied",
+             summary['objects'], summary['bytes'], source_path, destination_path, summary['seconds']))
+    return summary
+
+def move_folder(source_path, destination_path, **kwargs):
+    """
+    Copy every object under an s3 folder to another folder then delete the source objects, see copy_folder
+    """
+    return copy_folder(source_path, destination_path, delete_source=True, **kwargs)
 
-def first_n_bytes_of_s3_object_to_lines(s3_path, num_bytes=1024, encoding="utf-8"):
+def first_n_bytes_of_s3_object_to_lines(s3_path, num_bytes=1024, encoding="utf-8", compression="infer"):
     """
     Read the first n bytes of an s3 object and return a list of lines
     Args:
         s3_path: The full path to the s3 object
-        num_bytes: The number of bytes of the file to read
+        num_bytes: The number of bytes of the file to read (after decompression, only as much of a compressed file as is needed is read)
         encoding: The character encoding to use to convert these bytes to a string
+        compression: 'infer' to choose the codec from the extension (e.g. .gz, .bz2, .zst), None or one of gzip, bz2, xz or zstd
     Returns:
         lines: A list of strings, each element representing a line
     """
 
-    bucket, key = s3_path_to_bucket_key(s3_path)
-    obj = s3_resource.Object(bucket, key)
-    text = obj.get()['Body'].read(num_bytes).decode(encoding)
+    with open_s3_object(s3_path, compression) as f:
+        chunks = []
+        remaining = num_bytes
+        while remaining > 0:
+            chunk = f.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+    text = b"".join(chunks).decode(encoding)
     lines = text.splitlines()
     return lines
 
 def get_file_list_from_bucket(bucket, bucket_folder) :
     bucket_folder = _end_with_slash(bucket_folder)
-    contents = s3_client.list_objects(Bucket=bucket, Prefix=bucket_folder)
+    contents = get_client('s3').list_objects(Bucket=bucket, Prefix=bucket_folder)
     files_list = [c["Key"] for c in contents["Contents"]]
     return files_list
\ No newline at end of file
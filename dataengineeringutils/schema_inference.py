@@ -0,0 +1,166 @@
+import io
+import os
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from dataengineeringutils.backend import get_client
+from dataengineeringutils.colnames import normalise_column_names, normalise_string
+from dataengineeringutils.s3 import s3_path_to_bucket_key
+
+log = logging.getLogger(__name__)
+
+TABLE_SCHEMA_URL = "https://raw.githubusercontent.com/moj-analytical-services/etl_manager/schema/etl_manager/specs/table_schema.json"
+
+_INT_PATTERN = r"[+-]?\d+"
+_FLOAT_PATTERN = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+_DATE_PATTERN = r"\d{4}-\d{2}-\d{2}"
+_DATETIME_PATTERN = r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"
+_BOOLEANS = ("true", "false")
+_INT_MAX = 2**31 - 1
+
+def _file_size(path) :
+    if path.startswith("s3://") :
+        bucket, key = s3_path_to_bucket_key(path)
+        return get_client('s3').head_object(Bucket=bucket, Key=key)['ContentLength']
+    return os.path.getsize(path)
+
+def _read_range(path, start, length) :
+    if path.startswith("s3://") :
+        bucket, key = s3_path_to_bucket_key(path)
+        obj = get_client('s3').get_object(Bucket=bucket, Key=key, Range="bytes={}-{}".format(start, start + length - 1))
+        return obj['Body'].read()
+    with open(path, "rb") as f :
+        f.seek(start)
+        return f.read(length)
+
+def _whole_lines(chunk, drop_first) :
+    """
+    Cut a chunk of bytes back to the complete lines in it. Chunks that start mid file may start mid line, so drop their first line
+    """
+    if drop_first :
+        chunk = chunk[chunk.find(b"\n") + 1:] if b"\n" in chunk else b""
+    end = chunk.rfind(b"\n")
+    return chunk[:end + 1] if end != -1 else b""
+
+def sample_csv(path, sample_bytes = 256 * 1024, n_samples = 16, seed = None, encoding = "utf-8", **kwargs) :
+    """
+    Read a sample of the rows of a local or s3 csv as strings, without reading the whole file.
+
+    The first sample_bytes of the file (the header and first rows) are read, plus n_samples chunks of sample_bytes
+    starting at random offsets. Only complete lines are kept from each chunk. Files no bigger than the samples are read whole.
+    Rows that don't parse to the header's number of fields (e.g. a chunk that started inside a quoted value with a newline in it) are skipped.
+    Args:
+        path: Local path or s3 path (s3://bucket/key) of the csv
+        sample_bytes: Size of each sampled chunk
+        n_samples: Number of random chunks to read
+        seed: Seed for the random offsets, so a sample can be repeated
+        encoding: Character encoding of the file
+        kwargs: Passed to pandas.read_csv (e.g. sep)
+    Returns:
+        A DataFrame with every column as str (nulls are NaN)
+    """
+    size = _file_size(path)
+    if size <= sample_bytes * (n_samples + 1) :
+        chunks = [(0, size)]
+    else :
+        rng = random.Random(seed)
+        offsets = sorted(rng.sample(range(sample_bytes, size - 1), n_samples))
+        chunks = [(0, sample_bytes)] + [(o, min(sample_bytes, size - o)) for o in offsets]
+
+    with ThreadPoolExecutor(max_workers=min(len(chunks), 8)) as executor :
+        data = list(executor.map(lambda c: _read_range(path, c[0], c[1]), chunks))
+
+    if len(chunks) == 1 :
+        body = data[0]
+    else :
+        body = _whole_lines(data[0], drop_first=False) + b"".join(_whole_lines(d, drop_first=True) for d in data[1:])
+
+    kwargs.setdefault("on_bad_lines", "skip")
+    return pd.read_csv(io.BytesIO(body), dtype=str, encoding=encoding, **kwargs)
+
+def infer_column_type(values, float_type = "double") :
+    """
+    Infer the metadata type of a column of strings (a pandas Series). Nulls are ignored, a column that is all null is character.
+    Types are tried in the order boolean, int, long, float_type, date, datetime and the first that every value matches is returned.
+    """
+    values = values.dropna().str.strip()
+    values = values[values != ""]
+    if values.empty :
+        return "character"
+
+    if values.str.lower().isin(_BOOLEANS).all() :
+        return "boolean"
+
+    if values.str.fullmatch(_INT_PATTERN).all() :
+        numbers = pd.to_numeric(values, errors="coerce")
+        if numbers.dtype.kind == "i" :
+            return "int" if numbers.abs().max() <= _INT_MAX else "long"
+        # Too big for a long
+        return float_type
+
+    if values.str.fullmatch(_FLOAT_PATTERN).all() :
+        return float_type
+
+    if values.str.fullmatch(_DATE_PATTERN).all() :
+        if pd.to_datetime(values, format="%Y-%m-%d", errors="coerce").notna().all() :
+            return "date"
+        return "character"
+
+    if values.str.fullmatch(_DATETIME_PATTERN).all() :
+        if pd.to_datetime(values, errors="coerce").notna().all() :
+            return "datetime"
+
+    return "character"
+
+def infer_metadata_from_df(df, table_name, table_desc = "", location = None, data_format = "csv", float_type = "double") :
+    """
+    Infer table metadata from a DataFrame of strings (e.g. from sample_csv). See infer_csv_metadata
+    """
+    columns = [{
+        "name": name,
+        "type": infer_column_type(df[name], float_type),
+        "description": ""
+    } for name in df.columns]
+
+    return {
+        "$schema": TABLE_SCHEMA_URL,
+        "table_name": table_name,
+        "id": table_name,
+        "table_desc": table_desc,
+        "data_format": data_format,
+        "location": location if location is not None else table_name + "/",
+        "columns": columns,
+        "partitions": []
+    }
+
+def infer_csv_metadata(path, table_name = None, table_desc = "", location = None, normalise_columns = False, float_type = "double",
+                       sample_bytes = 256 * 1024, n_samples = 16, seed = None, encoding = "utf-8", **kwargs) :
+    """
+    Infer table metadata for a local or s3 csv from a sample of its rows (see sample_csv), so a multi GB file only costs
+    a few small reads. The result can be written to json and used with meta.Meta or glue.metadata_to_glue_table_definition.
+
+    As only a sample is read, check the inferred types before relying on them: a column that is mostly ints with the odd text value
+    will be inferred as int if none of the text values are sampled.
+    Args:
+        path: Local path or s3 path (s3://bucket/key) of the csv
+        table_name: Defaults to the normalised file name without its extension
+        table_desc: Description of the table
+        location: Table location (relative to the database location), defaults to table_name/
+        normalise_columns: Normalise the column names with colnames.normalise_column_names
+        float_type: Metadata type for non integer numbers, 'double' (default) or 'float'
+        sample_bytes, n_samples, seed, encoding, kwargs: See sample_csv
+    """
+    if float_type not in ("double", "float") :
+        raise ValueError("float_type must be double or float")
+
+    df = sample_csv(path, sample_bytes=sample_bytes, n_samples=n_samples, seed=seed, encoding=encoding, **kwargs)
+    if normalise_columns :
+        df.columns = normalise_column_names(df.columns)
+    if table_name is None :
+        table_name = normalise_string(os.path.basename(path).split(".")[0])
+
+    log.info("Inferred metadata for {} from a sample of {} rows".format(path, len(df)))
+    return infer_metadata_from_df(df, table_name, table_desc, location, float_type=float_type)
@@ -1,23 +1,185 @@
 import json
-import pandas as pd
 import os
-import pyspark.sql.types
+
+# pyspark is imported inside the functions that use it, so importing this module doesn't start up pyspark
 
 from dataengineeringutils.utils import read_json
+from dataengineeringutils.partitions import resolve_table_location, partition_key_names, format_partition_value, escape_partition_value
 
-from dataengineeringutils.datatypes import translate_metadata_type_to_type
+from dataengineeringutils.datatypes import translate_metadata_type_to_type, translate_metadata_types_to_types
 
 
 def get_customschema_from_metadata(metadata):
+    import pyspark.sql.types
 
     columns = metadata["columns"]
 
     custom_schema = pyspark.sql.types.StructType()
 
-    for c in columns:
+    spark_types = translate_metadata_types_to_types(columns, "spark")
+
+    for c, this_type in zip(columns, spark_types):
         this_name = c["name"]
-        this_type = translate_metadata_type_to_type(c["type"], "spark")
         this_type = getattr(pyspark.sql.types, this_type)
         this_field = pyspark.sql.types.StructField(this_name, this_type())
         custom_schema.add(this_field)
-    return custom_schema
\ No newline at end of file
+    return custom_schema
+
+def _spark_type_from_metadata_type(column_type):
+    import pyspark.sql.types
+    return getattr(pyspark.sql.types, translate_metadata_type_to_type(column_type, "spark"))()
+
+def _glob_value(value, column_type):
+    # Formatted and escaped as the writers name the folders, then the characters special inside {a,b} escaped for the glob
+    escaped = escape_partition_value(format_partition_value(value, column_type))
+    return escaped.replace(",", "\\,").replace("}", "\\}")
+
+def _partition_path_glob(location, partition_keys, partition_filters=None, column_types=None):
+    """
+    Build a path glob for the hive style partition folders under location that match partition_filters.
+
+    partition_filters is a dict of partition key to a value or list of values. Keys without a filter match
+    any value, e.g. partition keys [year, month] and filters {"month": [1, 2]} give location/year=*/month={1,2}/
+    Values are formatted and escaped as the writers do (see partitions.format_partition_value), by their type in
+    column_types (dict of column name to metadata type)
+    """
+    if partition_filters is None:
+        partition_filters = {}
+    if column_types is None:
+        column_types = {}
+
+    unknown = set(partition_filters) - set(partition_keys)
+    if len(unknown) > 0:
+        raise ValueError("You can only filter on partition keys ({}), not {}".format(", ".join(partition_keys), ", ".join(sorted(unknown))))
+
+    location = location if location[-1] == '/' else location + '/'
+    parts = []
+    for pk in partition_keys:
+        value = partition_filters.get(pk)
+        if value is None:
+            parts.append("{}=*".format(pk))
+        elif isinstance(value, (list, tuple, set)):
+            parts.append("{}={{{}}}".format(pk, ",".join(_glob_value(v, column_types.get(pk)) for v in value)))
+        else:
+            parts.append("{}={}".format(pk, _glob_value(value, column_types.get(pk))))
+
+    return location + "/".join(parts) + "/"
+
+def spark_read_table_using_metadata(spark, table_metadata, location=None, partition_filters=None, database_metadata=None, **options):
+    """
+    Read a table with the schema in its metadata so spark doesn't have to infer it (which takes an extra pass over the data)
+
+    Args:
+        spark: SparkSession
+        table_metadata: Table metadata, data_format decides the reader (csv, parquet/par, orc or avro)
+        location: Full path of the table's data, defaults to table_metadata["location"] (relative to database_metadata's location if it isn't a full path)
+        database_metadata: Database metadata, needed to resolve a relative table location
+        partition_filters: dict of partition key (in glue_specific.PartitionKeys) to a value or list of values.
+            Only the matching partition folders are read, the partition columns are still added to the dataframe
+        **options: Passed to the spark reader, e.g. header="true" for csvs with a header
+    """
+    location = resolve_table_location(table_metadata, location, database_metadata, require_s3=False)
+
+    schema = get_customschema_from_metadata(table_metadata)
+    data_format = table_metadata.get("data_format", "csv")
+    partition_keys = partition_key_names(table_metadata)
+
+    reader = spark.read.schema(schema)
+    if data_format in ("csv", "csv_quoted_nodate"):
+        reader = reader.format("csv")
+    elif data_format in ("parquet", "par"):
+        reader = reader.format("parquet")
+    elif data_format in ("orc", "avro"):
+        reader = reader.format(data_format)
+    else:
+        raise ValueError("Cannot read data_format {} with spark".format(data_format))
+
+    path = location
+    if len(partition_keys) > 0 and partition_filters:
+        column_types = dict((c["name"], c["type"]) for c in table_metadata["columns"])
+        path = _partition_path_glob(location, partition_keys, partition_filters, column_types)
+        reader = reader.option("basePath", location)
+
+    reader = reader.options(**options)
+    return impose_metadata_column_order_on_spark_df(reader.load(path), table_metadata)
+
+def _spark_df_cols_match_metadata_cols(df, table_metadata):
+    return set(df.columns) == set(c["name"] for c in table_metadata["columns"])
+
+def impose_metadata_column_order_on_spark_df(df, table_metadata, create_cols_if_not_exist=False, delete_superflous_colums=True):
+    """
+    Return a spark dataframe where the column order conforms to the metadata
+    Missing columns are added as nulls of the metadata type if create_cols_if_not_exist
+    Note: This does not check the types match the metadata
+    """
+    md_cols = [c["name"] for c in table_metadata["columns"]]
+    actual_cols = df.columns
+
+    md_cols_set = set(md_cols)
+    actual_cols_set = set(actual_cols)
+
+    if len(md_cols) != len(md_cols_set):
+        raise ValueError("You have a duplicated column names in your metadata")
+
+    if len(actual_cols) != len(actual_cols_set):
+        raise ValueError("You have a duplicated column names in your data")
+
+    superflous_cols = actual_cols_set - md_cols_set
+    if len(superflous_cols) > 0 and not delete_superflous_colums:
+        raise ValueError(f"You chose delete_superflous_colums = False, but the following superflous columns were found: {superflous_cols}")
+
+    missing_cols = md_cols_set - actual_cols_set
+    if len(missing_cols) > 0 and not create_cols_if_not_exist:
+        raise ValueError(f"You create_cols_if_not_exist = False, but the following columns are missing from your data {missing_cols}")
+
+    import pyspark.sql.functions
+    selected = []
+    for c in table_metadata["columns"]:
+        if c["name"] in actual_cols_set:
+            selected.append(pyspark.sql.functions.col(c["name"]))
+        else:
+            selected.append(pyspark.sql.functions.lit(None).cast(_spark_type_from_metadata_type(c["type"])).alias(c["name"]))
+
+    return df.select(*selected)
+
+def impose_metadata_data_types_on_spark_df(df, table_metadata):
+    """
+    Cast every column in the metadata to its metadata type. Columns not in metadata are left alone.
+    Values that can't be cast become null (spark's cast behaviour)
+    """
+    expected = dict((c["name"], _spark_type_from_metadata_type(c["type"])) for c in table_metadata["columns"])
+    actual = dict((f.name, f.dataType) for f in df.schema.fields)
+
+    import pyspark.sql.functions
+    selected = []
+    for name in df.columns:
+        if name in expected and actual[name] != expected[name]:
+            selected.append(pyspark.sql.functions.col(name).cast(expected[name]).alias(name))
+        else:
+            selected.append(pyspark.sql.functions.col(name))
+
+    return df.select(*selected)
+
+def spark_df_datatypes_match_metadata_data_types(df, table_metadata):
+    expected = dict((c["name"], _spark_type_from_metadata_type(c["type"])) for c in table_metadata["columns"])
+    actual = dict((f.name, f.dataType) for f in df.schema.fields)
+    return actual == expected
+
+def impose_exact_conformance_on_spark_df(df, table_metadata):
+    """
+    Spark version of pd_metadata_conformance.impose_exact_conformance_on_pd_df, conformance happens on the cluster rather than in pandas
+    """
+    df = impose_metadata_column_order_on_spark_df(df, table_metadata, delete_superflous_colums=True)
+    df = impose_metadata_data_types_on_spark_df(df, table_metadata)
+    return df
+
+def check_spark_df_exactly_conforms_to_metadata(df, table_metadata):
+
+    if not _spark_df_cols_match_metadata_cols(df, table_metadata):
+        raise ValueError("Your spark dataframe contains different columns to your metadata")
+
+    if list(df.columns) != [c["name"] for c in table_metadata["columns"]]:
+        raise ValueError("Your spark dataframe contains different columns to your metadata")
+
+    if not spark_df_datatypes_match_metadata_data_types(df, table_metadata):
+        raise ValueError("Your spark dataframe contains different datatypes to those expected by the metadata")
@@ -1,3 +1,10 @@
+import re
+import logging
+
+from dataengineeringutils.datatypes import translate_metadata_types_to_types
+
+log = logging.getLogger(__name__)
+
 # Combine a list of sql queries into a single query
 def combine_sql_select_statements(list_of_queries) :
     return ', '.join(list_of_queries)
@@ -14,3 +21,100 @@ def col_names_to_sql_select(col_list, table_alias = None, exclude = None) :
     
     return ", ".join([table_alias + c for c in col_list])
 
+
+_NUMERIC_GLUE_TYPES = ('tinyint', 'smallint', 'int', 'integer', 'bigint', 'float', 'double', 'decimal')
+
+def _sql_literal(value, glue_type = 'string') :
+    """
+    Format a python value as an Athena literal for a column of glue_type
+    """
+    glue_type = glue_type.lower()
+    if glue_type.split('(')[0] in _NUMERIC_GLUE_TYPES :
+        if isinstance(value, bool) or not isinstance(value, (int, float)) :
+            try:
+                value = float(value) if '.' in str(value) else int(value)
+            except ValueError:
+                raise ValueError("{} is not a valid value for a {} partition".format(value, glue_type))
+        return str(value)
+    if glue_type == 'boolean' :
+        if str(value).lower() not in ('true', 'false') :
+            raise ValueError("{} is not a valid value for a boolean partition".format(value))
+        return str(value).lower()
+    literal = "'{}'".format(str(value).replace("'", "''"))
+    if glue_type in ('date', 'timestamp') :
+        return glue_type.upper() + ' ' + literal
+    return literal
+
+def partition_filters_to_sql_where(table_metadata, partition_filters) :
+    """
+    Build the conditions of a WHERE clause that prunes partitions.
+    Args:
+        table_metadata: Table metadata with glue_specific.PartitionKeys
+        partition_filters: dict of partition key to a value, or a list of values e.g. {'year': [2017, 2018], 'region': 'north'}
+    Returns:
+        A list of conditions (to be joined with AND), one per partition key
+    """
+    pk_types = dict((pk['Name'], pk['Type']) for pk in table_metadata.get('glue_specific', {}).get('PartitionKeys', []))
+    conditions = []
+    for name, values in partition_filters.items() :
+        if name not in pk_types :
+            raise ValueError("{} is not a partition key of {}. Partition keys are: {}".format(name, table_metadata.get('table_name'), ', '.join(pk_types)))
+        if isinstance(values, (list, tuple, set)) :
+            values = sorted(values) if isinstance(values, set) else values
+            if len(values) == 0 :
+                raise ValueError("No values given for partition {}".format(name))
+            conditions.append("{} IN ({})".format(name, ', '.join(_sql_literal(v, pk_types[name]) for v in values)))
+        else :
+            conditions.append("{} = {}".format(name, _sql_literal(values, pk_types[name])))
+    return conditions
+
+def metadata_to_sql_select(table_metadata, columns = None, database = None, table_alias = None, cast = True, partition_filters = None, where = None, limit = None) :
+    """
+    Build an Athena SELECT for a table from its metadata.
+
+    Athena bills by bytes scanned, so only select the columns you need and filter on partition keys where you can.
+    A warning is logged if the table is partitioned and the query would scan every partition.
+    Args:
+        table_metadata: Table metadata (as used by glue.metadata_to_glue_table_definition)
+        columns: The columns to select, defaults to all of them (in metadata order)
+        database: Database name to prefix the table name with
+        table_alias: Alias for the table, column names are prefixed with it
+        cast: Cast each column to its metadata type (e.g. CAST(mydate AS date) AS mydate)
+        partition_filters: dict of partition key to a value or list of values, see partition_filters_to_sql_where
+        where: Any other conditions (a string), ANDed with the partition filters
+        limit: Add a LIMIT clause
+    """
+    metadata_columns = dict((c['name'], c) for c in table_metadata['columns'])
+    if columns is None :
+        columns = [c['name'] for c in table_metadata['columns']]
+    missing = [c for c in columns if c not in metadata_columns]
+    if missing :
+        raise ValueError("columns {} are not in the metadata for {}".format(', '.join(missing), table_metadata.get('table_name')))
+
+    prefix = '' if table_alias is None else table_alias + '.'
+    if cast :
+        athena_types = translate_metadata_types_to_types([metadata_columns[c] for c in columns], 'athena')
+        select = ["CAST({}{} AS {}) AS {}".format(prefix, c, t, c) for c, t in zip(columns, athena_types)]
+    else :
+        select = [prefix + c for c in columns]
+
+    table_name = table_metadata['table_name'] if database is None else "{}.{}".format(database, table_metadata['table_name'])
+    if table_alias is not None :
+        table_name = "{} AS {}".format(table_name, table_alias)
+
+    conditions = []
+    if partition_filters :
+        conditions = ["{}{}".format(prefix, c) for c in partition_filters_to_sql_where(table_metadata, partition_filters)]
+    if where :
+        conditions.append("({})".format(where))
+
+    pk_names = [pk['Name'] for pk in table_metadata.get('glue_specific', {}).get('PartitionKeys', [])]
+    if pk_names and not partition_filters and not (where and any(re.search(r"\b{}\b".format(re.escape(pk)), where) for pk in pk_names)) :
+        log.warning("Query on {} has no filter on its partition keys ({}) so will scan every partition".format(table_metadata['table_name'], ', '.join(pk_names)))
+
+    sql = "SELECT {}\nFROM {}".format(combine_sql_select_statements(select), table_name)
+    if conditions :
+        sql += "\nWHERE " + "\nAND ".join(conditions)
+    if limit is not None :
+        sql += "\nLIMIT {}".format(int(limit))
+    return sql
@@ -0,0 +1,108 @@
+import os
+import threading
+
+from dataengineeringutils.utils import dict_merge, read_json, loads_json, _copy_json
+
+_BUILTIN_TABLE_FORMATS = {
+    "avro": "specs/avro_specific.json",
+    "csv": "specs/csv_specific.json",
+    "csv_quoted_nodate": "specs/csv_quoted_nodate_specific.json",
+    "regex": "specs/regex_specific.json",
+    "orc": "specs/orc_specific.json",
+    "par": "specs/par_specific.json",
+    "parquet": "specs/par_specific.json"
+}
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _load_spec(resource_name):
+    with open(os.path.join(_PACKAGE_DIR, resource_name), "rb") as f:
+        return loads_json(f.read())
+
+class TableTemplateRegistry :
+    """
+    Glue table definition templates, one per data format.
+
+    Each template is specs/base.json merged with the format specific spec. Templates are loaded and merged
+    once, the first time they are asked for, and get() hands out copies.
+
+    Extra formats can be registered, e.g. for json lines:
+
+    table_templates.register("json", {
+        "StorageDescriptor": {
+            "InputFormat": "org.apache.hadoop.mapred.TextInputFormat",
+            "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+            "SerdeInfo": {"SerializationLibrary": "org.openx.data.jsonserde.JsonSerDe"}
+        },
+        "Parameters": {"classification": "json"}
+    })
+    """
+
+    def __init__(self) :
+        self._specific = dict(_BUILTIN_TABLE_FORMATS)
+        self._compiled = {}
+        self._base = None
+        self._lock = threading.Lock()
+
+    def register(self, template_type, specific, overwrite = False) :
+        """
+        Register a data format.
+        Args:
+            template_type: The name of the format (the data_format in table metadata)
+            specific: dict merged onto specs/base.json, or the path to a json file containing it
+            overwrite: Allow replacing an existing format
+        """
+        if template_type in self._specific and not overwrite :
+            raise ValueError("A table template for {} already exists, use overwrite=True to replace it".format(template_type))
+        if not isinstance(specific, dict) :
+            specific = read_json(specific)
+        with self._lock :
+            self._specific[template_type] = _copy_json(specific)
+            self._compiled.pop(template_type, None)
+
+    def formats(self) :
+        return sorted(self._specific)
+
+    def get(self, template_type = 'csv', **kwargs) :
+        """
+        Return a new copy of the template for template_type with kwargs merged into it
+        """
+        template = _copy_json(self._get_compiled(template_type))
+        if kwargs :
+            dict_merge(template, kwargs)
+        return template
+
+    def _get_compiled(self, template_type) :
+        compiled = self._compiled.get(template_type)
+        if compiled is None :
+            if template_type not in self._specific :
+                raise KeyError("There is no table template for {}. Available templates are {}".format(template_type, ", ".join(self.formats())))
+            with self._lock :
+                if self._base is None :
+                    self._base = _load_spec("specs/base.json")
+                specific = self._specific[template_type]
+                if not isinstance(specific, dict) :
+                    specific = _load_spec(specific)
+                compiled = _copy_json(self._base)
+                dict_merge(compiled, specific)
+                self._compiled[template_type] = compiled
+        return compiled
+
+table_templates = TableTemplateRegistry()
+
+def register_table_format(template_type, specific, overwrite = False) :
+    """
+    Register an additional data format with the default template registry, see TableTemplateRegistry.register
+    """
+    table_templates.register(template_type, specific, overwrite)
+
+_glue_job_template = None
+
+def get_glue_job_template() :
+    """
+    Return a new copy of specs/glue_job.json
+    """
+    global _glue_job_template
+    if _glue_job_template is None :
+        _glue_job_template = _load_spec("specs/glue_job.json")
+    return _copy_json(_glue_job_template)
@@ -1,6 +1,8 @@
-import collections
+import collections.abc
 import json
 
+from dataengineeringutils.colnames import normalise_column_names
+
 def dict_merge(dct, merge_dct):
     """ Recursive dict merge. Inspired by :meth:``dict.update()``, instead of
     updating only top-level keys, dict_merge recurses down into dicts nested
@@ -12,24 +14,146 @@ def dict_merge(dct, merge_dct):
     """
     for k, v in merge_dct.items():
         if (k in dct and isinstance(dct[k], dict)
-                and isinstance(merge_dct[k], collections.Mapping)):
+                and isinstance(merge_dct[k], collections.abc.Mapping)):
             dict_merge(dct[k], merge_dct[k])
         else:
             dct[k] = merge_dct[k]
 
+class _JsonBackend :
+    """
+    A json library. dumps_indents are the indents (None is compact) the library can write, with stdlib json's layout.
+    Every backend writes non ascii characters as they are (write_json writes utf-8) and non str keys as strings
+    """
+    def __init__(self, name, loads, dumps, dumps_indents) :
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.dumps_indents = dumps_indents
+
+def _stdlib_json_backend() :
+    def dumps(data, indent) :
+        separators = (',', ': ') if indent is not None else (',', ':')
+        return json.dumps(data, indent=indent, separators=separators, ensure_ascii=False)
+    return _JsonBackend("json", json.loads, dumps, None)
+
+def _reindent(text, indent) :
+    # Lines of json written with an indent of 2 start with 2 spaces per level (newlines in strings are escaped)
+    lines = text.split("\n")
+    for i, line in enumerate(lines) :
+        stripped = line.lstrip(" ")
+        lines[i] = " " * ((len(line) - len(stripped)) // 2 * indent) + stripped
+    return "\n".join(lines)
+
+def _orjson_backend() :
+    import orjson
+    def dumps(data, indent) :
+        # Non str keys are written as strings, as the stdlib does
+        if indent is None :
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        text = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2).decode("utf-8")
+        return text if indent == 2 else _reindent(text, indent)
+    return _JsonBackend("orjson", orjson.loads, dumps, None)
+
+def _ujson_backend() :
+    import ujson
+    def dumps(data, indent) :
+        return ujson.dumps(data, indent=0 if indent is None else indent, escape_forward_slashes=False, ensure_ascii=False)
+    return _JsonBackend("ujson", ujson.loads, dumps, None)
+
+_json_backend_factories = {"orjson": _orjson_backend, "ujson": _ujson_backend, "json": _stdlib_json_backend}
+_json_backends = None
+
+def _available_json_backends() :
+    global _json_backends
+    if _json_backends is None :
+        backends = []
+        for name in ("orjson", "ujson", "json") :
+            try :
+                backends.append(_json_backend_factories[name]())
+            except ImportError :
+                pass
+        _json_backends = backends
+    return _json_backends
+
+def set_json_backend(name = None) :
+    """
+    Choose the json library used by read_json, write_json and loads_json: 'orjson', 'ujson' or 'json' (the stdlib).
+    By default (or with name=None) the fastest installed library is used, falling back to the stdlib.
+    Writing with an indent the chosen library can't produce falls back to the next library that can.
+    """
+    global _json_backends
+    if name is None :
+        _json_backends = None
+        return
+    if name not in _json_backend_factories :
+        raise ValueError("json backend must be one of {}".format(", ".join(_json_backend_factories)))
+    _json_backends = [_json_backend_factories[name](), _stdlib_json_backend()]
+
+def get_json_backend_name() :
+    return _available_json_backends()[0].name
+
+def loads_json(s) :
+    """
+    Parse a json str or bytes with the current json backend
+    """
+    return _available_json_backends()[0].loads(s)
+
+def dumps_json(data, indent = 4) :
+    for backend in _available_json_backends() :
+        if backend.dumps_indents is None or indent in backend.dumps_indents :
+            return backend.dumps(data, indent)
+
 # Read json file
 def read_json(filename) :
-    with open(filename) as json_data:
-        data = json.load(json_data)
+    with open(filename, 'rb') as json_data:
+        data = loads_json(json_data.read())
     return data
 
 # Write json file
-def write_json(data, filename) :
-    with open(filename, 'w') as outfile:
-        json.dump(data, outfile, indent=4, separators=(',', ': '))
+def write_json(data, filename, indent = 4) :
+    with open(filename, 'w', encoding='utf-8') as outfile:
+        outfile.write(dumps_json(data, indent))
+
+def iter_json_items(filename, prefix = "item") :
+    """
+    Iterate through the items of an array inside a json file, e.g. iter_json_items("table.json", "columns.item")
+    gives each column of a table. prefix uses ijson's syntax: keys separated by '.', 'item' for an array's elements.
+
+    If ijson is installed the file is parsed incrementally, so memory use doesn't grow with the size of the file.
+    Otherwise the whole file is parsed with read_json and the items are taken from that.
+    """
+    try :
+        import ijson
+    except ImportError :
+        ijson = None
+
+    if ijson is not None :
+        with open(filename, 'rb') as f :
+            for item in ijson.items(f, prefix, use_float=True) :
+                yield item
+        return
+
+    parts = prefix.split('.') if prefix else []
+    if len(parts) == 0 or parts[-1] != 'item' :
+        raise ValueError("prefix must point at the items of an array i.e. end with 'item'")
+
+    nodes = [read_json(filename)]
+    for part in parts :
+        if part == 'item' :
+            nodes = [item for node in nodes if isinstance(node, list) for item in node]
+        else :
+            nodes = [node[part] for node in nodes if isinstance(node, dict) and part in node]
+    for item in nodes :
+        yield item
 
 # Read first line of csv and return a list
-def get_csv_header(file_path, convert_to_lower = False, strip_quotes = False) :
+def get_csv_header(file_path, convert_to_lower = False, strip_quotes = False, normalise = False) :
+    """
+    Read the column names from the first line of a csv.
+    Args:
+        normalise: Normalise the names with colnames.normalise_column_names (implies convert_to_lower).
+            Colliding names are suffixed, pass "raise" instead of True to raise a ValueError on collisions
+    """
     with open(file_path) as f:
         line = f.readline()
         column_names = line.rstrip().split(",")
@@ -37,9 +161,21 @@ def get_csv_header(file_path, convert_to_lower = False, strip_quotes = False) :
             column_names = [c.lower() for c in column_names]
         if strip_quotes :
             column_names = [c.strip("'").strip('"') for c in column_names]
+        if normalise :
+            column_names = normalise_column_names(column_names, "raise" if normalise == "raise" else "suffix")
 
     return column_names
 
+def _copy_json(obj):
+    """
+    Structural copy of json-like data (dicts, lists and scalars), much cheaper than copy.deepcopy
+    """
+    if isinstance(obj, dict):
+        return {k: _copy_json(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_copy_json(v) for v in obj]
+    return obj
+
 def _end_with_slash(string) :
     if string[-1] != '/' :
         return string + '/'
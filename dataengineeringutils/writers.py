@@ -0,0 +1,198 @@
+import csv
+import time
+import uuid
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from dataengineeringutils.backend import get_client
+from dataengineeringutils.datatypes import translate_metadata_types_to_types
+from dataengineeringutils.partitions import partition_key_names, resolve_table_location, format_partition_value, partition_path
+import dataengineeringutils.s3 as s3_utils
+
+log = logging.getLogger(__name__)
+
+# Files bigger than this are uploaded in parts, in parallel
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+
+# Partition files are spooled in memory up to this size, then to a temporary file
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+def _partition_groups(df, partition_keys, column_types) :
+    """
+    Split df by the values of partition_keys in one groupby.
+    Returns a list of (hive path e.g. 'year=2018/month=1/', dict of partition values as strings, row positions)
+    """
+    if not partition_keys :
+        return [("", {}, None)]
+    groups = []
+    for values, positions in df.groupby(partition_keys, sort=True, dropna=False).indices.items() :
+        if len(partition_keys) == 1 :
+            values = (values,)
+        partition = dict((k, format_partition_value(v, column_types.get(k))) for k, v in zip(partition_keys, values))
+        groups.append((partition_path(partition_keys, partition), partition, positions))
+    return groups
+
+def _check_columns(df, table_metadata) :
+    metadata_columns = [c["name"] for c in table_metadata["columns"]]
+    missing = [c for c in metadata_columns if c not in df.columns]
+    if missing :
+        raise ValueError("The dataframe is missing the columns {} which are in the metadata".format(", ".join(missing)))
+    return metadata_columns
+
+def _upload_files(files, max_workers) :
+    """
+    Upload (file object, s3 path) pairs concurrently, large files as parallel multipart uploads
+    """
+    try :
+        from boto3.s3.transfer import TransferConfig
+        config = TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_CHUNKSIZE, max_concurrency=4)
+    except ImportError :
+        config = None
+    s3_client = get_client('s3')
+
+    def upload(item) :
+        f, path = item
+        bucket, key = s3_utils.s3_path_to_bucket_key(path)
+        f.seek(0)
+        s3_client.upload_fileobj(f, bucket, key, Config=config)
+        s3_utils.listing_cache.invalidate(bucket, key)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor :
+        list(executor.map(upload, files))
+
+def _write_partitions(df, table_metadata, location, database_metadata, file_extension, write_partition, max_workers) :
+    """
+    Shared by the writers: split df into partitions, serialise each one with write_partition(df, file object) in parallel,
+    upload them in parallel and return a list of what was written
+    """
+    started = time.monotonic()
+    location = resolve_table_location(table_metadata, location, database_metadata)
+    columns = _check_columns(df, table_metadata)
+    partition_keys = partition_key_names(table_metadata)
+    data_columns = [c for c in columns if c not in partition_keys]
+    file_name = "part-{}{}".format(uuid.uuid4().hex, file_extension)
+
+    def write(group) :
+        path, partition, positions = group
+        part = df[data_columns] if positions is None else df[data_columns].take(positions)
+        f = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        write_partition(part, f)
+        size = f.tell()
+        return {"path": location + path + file_name, "partition": partition, "rows": len(part), "bytes": size, "_file": f}
+
+    groups = _partition_groups(df, partition_keys, dict((c["name"], c["type"]) for c in table_metadata["columns"]))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor :
+        written = list(executor.map(write, groups))
+
+    try :
+        _upload_files([(w["_file"], w["path"]) for w in written], max_workers)
+    finally :
+        for w in written :
+            w.pop("_file").close()
+
+    log.info("Wrote {} rows to {} files ({} bytes) under {} in {:.1f}s".format(
+        len(df), len(written), sum(w["bytes"] for w in written), location, time.monotonic() - started))
+    return written
+
+def arrow_schema_from_metadata(table_metadata, exclude = None) :
+    """
+    The pyarrow schema of a table's columns (excluding any in exclude, e.g. partition columns)
+    """
+    import pyarrow as pa
+    exclude = set() if exclude is None else set(exclude)
+    columns = [c for c in table_metadata["columns"] if c["name"] not in exclude]
+    arrow_types = translate_metadata_types_to_types(columns, "arrow")
+    return pa.schema([pa.field(c["name"], pa.type_for_alias(t)) for c, t in zip(columns, arrow_types)])
+
+def _df_to_arrow_table(df, schema) :
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    arrays = []
+    for field in schema :
+        column = table.column(field.name)
+        if column.type != field.type :
+            try :
+                column = pc.cast(column, options=pc.CastOptions(field.type, allow_time_truncate=True))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e :
+                raise ValueError("Column {} can't be converted to {}: {}".format(field.name, field.type, e))
+        arrays.append(column)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def pd_write_parquet_using_metadata(df, table_metadata, location = None, database_metadata = None, compression = "snappy",
+                                    row_group_size = None, max_workers = 8) :
+    """
+    Write a dataframe to s3 as parquet, typed by table_metadata and split into hive style partition folders
+    (location/key=value/...) by the table's partition keys (glue_specific.PartitionKeys).
+
+    Partition columns are written as folders rather than columns, as glue and athena expect, with their values formatted
+    and escaped as hive does (see partitions.format_partition_value and escape_partition_value). Files are added
+    next to any already in the location. Partitions are serialised and uploaded in parallel.
+    Args:
+        df: The data, with (at least) every column in the metadata. Other columns are ignored
+        table_metadata: Table metadata
+        location: s3 path to write to, defaults to the table's location (relative to database_metadata's location if it isn't a full s3 path)
+        database_metadata: Database metadata, only needed to resolve a relative table location
+        compression: Parquet compression codec e.g. snappy, gzip, zstd or none
+        row_group_size: Maximum rows per row group, defaults to pyarrow's default
+        max_workers: Number of partitions serialised and uploaded at once
+    Returns:
+        list of dicts with the path, partition (dict of key to value), rows and bytes of each file written
+    """
+    import pyarrow.parquet as pq
+    schema = arrow_schema_from_metadata(table_metadata, exclude=partition_key_names(table_metadata))
+
+    def write_partition(part, f) :
+        pq.write_table(_df_to_arrow_table(part, schema), f, compression=compression, row_group_size=row_group_size)
+
+    extension = ".parquet" if compression in (None, "none") else ".{}.parquet".format(compression)
+    return _write_partitions(df, table_metadata, location, database_metadata, extension, write_partition, max_workers)
+
+def _format_csv_partition(part, table_metadata) :
+    # Dates held as datetimes are written without a time, so they parse as dates
+    date_columns = [c["name"] for c in table_metadata["columns"] if c["type"] == "date" and c["name"] in part.columns]
+    for name in date_columns :
+        if hasattr(part[name], "dt") :
+            part = part.assign(**{name: part[name].dt.strftime("%Y-%m-%d")})
+    return part
+
+def pd_write_csv_using_metadata(df, table_metadata, location = None, database_metadata = None, header = False, max_workers = 8,
+                                register_partitions = False, database_name = None) :
+    """
+    Write a dataframe to s3 as csv, split into hive style partition folders (location/key=value/...) by the table's
+    partition keys (glue_specific.PartitionKeys). Columns are written in metadata order without the partition columns.
+
+    The frame is split in one groupby and the partitions are serialised and uploaded in parallel.
+    Values are quoted if the table's data_format is csv_quoted_nodate (OpenCSVSerde), as the plain csv serde doesn't read quotes.
+    Args:
+        df: The data, with (at least) every column in the metadata. Other columns are ignored
+        table_metadata: Table metadata
+        location: s3 path to write to, defaults to the table's location (relative to database_metadata's location if it isn't a full s3 path)
+        database_metadata: Database metadata, needed to resolve a relative table location
+        header: Write a header line. Off by default as the glue csv templates don't skip headers
+        max_workers: Number of partitions serialised and uploaded at once
+        register_partitions: Add the partitions that were written to the glue catalogue afterwards (see glue.register_partitions)
+        database_name: The glue database of the table, defaults to database_metadata's name
+    Returns:
+        list of dicts with the path, partition (dict of key to value), rows and bytes of each file written
+    """
+    if register_partitions and database_name is None :
+        if database_metadata is None :
+            raise ValueError("Pass database_name or database_metadata to register partitions")
+        database_name = database_metadata["name"]
+
+    csv_kwargs = {"index": False, "header": header}
+    if table_metadata.get("data_format") == "csv_quoted_nodate" :
+        csv_kwargs.update({"quoting": csv.QUOTE_ALL, "escapechar": "\\"})
+
+    def write_partition(part, f) :
+        f.write(_format_csv_partition(part, table_metadata).to_csv(**csv_kwargs).encode("utf-8"))
+
+    written = _write_partitions(df, table_metadata, location, database_metadata, ".csv", write_partition, max_workers)
+
+    if register_partitions and partition_key_names(table_metadata) :
+        from dataengineeringutils.glue import register_partitions as glue_register_partitions
+        glue_register_partitions(database_name, table_metadata["table_name"], [w["partition"] for w in written])
+    return written
@@ -8,6 +8,7 @@ setup(
     description='A python package containing functions that help manage our data management processes on AWS',
     long_description=open('README.md').read(),
     install_requires=[],
+    extras_require={'jdbc': ['PyAthenaJDBC'], 'zstd': ['zstandard'], 'ijson': ['ijson']},
     include_package_data=True,
     url='https://github.com/moj-analytical-services/dataengineeringutils',
     author='Karik Isichei',
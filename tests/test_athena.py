@@ -0,0 +1,99 @@
+import unittest
+import time
+from dataengineeringutils.athena import run_query, run_queries, start_query, wait_for_query, make_partitions
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+
+class AthenaTest(unittest.TestCase) :
+    """
+    Test running athena queries against the fake backend
+    """
+    def test_run_query(self) :
+        with use_backend(FakeBackend(query_run_seconds=0.05)) as fake :
+            fake.set_query_result("FROM db.t", "a,b\n1,x\n", ["integer", "varchar"], data_scanned_bytes=10)
+            result = run_query("SELECT a, b FROM db.t", "s3://bucket/results")
+            self.assertEqual(result["state"], "SUCCEEDED")
+            self.assertEqual(result["data_scanned_bytes"], 10)
+            self.assertTrue(result["output_location"].startswith("s3://bucket/results/"))
+            obj = get_client('s3').get_object(Bucket="bucket", Key=result["output_location"].replace("s3://bucket/", ""))
+            self.assertEqual(obj["Body"].read(), b"a,b\n1,x\n")
+            # Polling backs off rather than spinning
+            self.assertLess(fake.call_counts["athena.get_query_execution"], 6)
+
+            make_partitions("db", "t", "s3://bucket/temp/")
+            self.assertEqual(fake.query_executions["qe_000000000002"]["Query"], "MSCK REPAIR TABLE db.t")
+
+    def test_failures_and_timeouts(self) :
+        with use_backend(FakeBackend(query_run_seconds=0.2)) as fake :
+            fake.set_query_result("bad", state="FAILED", error_message="SYNTAX_ERROR")
+            with self.assertRaises(ValueError) as cm :
+                run_query("SELECT bad", "s3://bucket/results/")
+            self.assertIn("SYNTAX_ERROR", str(cm.exception))
+            self.assertEqual(run_query("SELECT bad", "s3://bucket/results/", raise_on_failure=False)["state"], "FAILED")
+
+            query_execution_id = start_query("SELECT 1", "s3://bucket/results/")
+            with self.assertRaises(ValueError) :
+                wait_for_query(query_execution_id, timeout=0.01)
+            self.assertEqual(get_client('athena').get_query_execution(QueryExecutionId=query_execution_id)["QueryExecution"]["Status"]["State"], "CANCELLED")
+
+    def test_run_queries_with_concurrency_limit(self) :
+        with use_backend(FakeBackend(query_run_seconds=0.05, max_concurrent_queries=2)) as fake :
+            fake.set_query_result("3", state="FAILED", error_message="boom")
+            queries = ["SELECT {}".format(i) for i in range(8)]
+            start = time.monotonic()
+            results = run_queries(queries, "s3://bucket/results/", max_concurrent=2, raise_on_failure=False)
+            self.assertGreater(time.monotonic() - start, 0.15)
+            self.assertEqual([r["state"] for r in results], ["SUCCEEDED"] * 3 + ["FAILED"] + ["SUCCEEDED"] * 4)
+            self.assertEqual(fake.call_counts["athena.start_query_execution"], 8)
+
+            # Going over the account limit is retried rather than failing
+            results = run_queries(queries[4:], "s3://bucket/results/", max_concurrent=4)
+            self.assertEqual(len(results), 4)
+            self.assertGreater(fake.call_counts["athena.start_query_execution"], 12)
+
+            with self.assertRaises(ValueError) :
+                run_queries(queries[:4], "s3://bucket/results/", max_concurrent=2)
+
+            # A query that times out is stopped and reported, the others still finish
+            fake.set_query_result("slow", run_seconds=10)
+            results = run_queries(["SELECT 1", "SELECT slow", "SELECT 2"], "s3://bucket/results/", timeout=0.3, raise_on_failure=False)
+            self.assertEqual([r["state"] for r in results], ["SUCCEEDED", "CANCELLED", "SUCCEEDED"])
+            self.assertIn("did not finish within", results[1]["error"])
+            with self.assertRaises(ValueError) :
+                run_queries(["SELECT slow", "SELECT 2"], "s3://bucket/results/", timeout=0.3)
+
+            with self.assertRaises(ValueError) :
+                make_partitions("db", "t", "s3://bucket/temp/", region_name="eu-west-2")
+
+    def test_read_query_result(self) :
+        from dataengineeringutils.athena import pd_read_query_result, pd_read_sql
+        csv_text = 'id,amount,label,day,flag\n1,1.5,"a",2018-01-01,true\n2,2.5,"b",2018-01-02,false\n3,,"",2018-01-03,true\n'
+        metadata = {"table_name": "t", "columns": [
+            {"name": "label", "type": "character"}, {"name": "id", "type": "long"}, {"name": "amount", "type": "double"},
+            {"name": "day", "type": "date"}, {"name": "flag", "type": "boolean"}
+        ]}
+        with use_backend(FakeBackend()) as fake :
+            fake.set_query_result("FROM t", csv_text, ["bigint", "double", "varchar", "date", "boolean"])
+            result = run_query("SELECT * FROM t", "s3://bucket/results/")
+
+            df = pd_read_query_result(result)
+            self.assertEqual(list(df.columns), ["id", "amount", "label", "day", "flag"])
+            self.assertEqual([str(t) for t in df.dtypes], ["Int64", "float64", "object", "datetime64[ns]", "boolean"])
+
+            # Without metadata, int and boolean columns can hold nulls
+            fake.set_query_result("FROM nulls", "n,big,flag\n1,,true\n,2,\n", ["integer", "bigint", "boolean"])
+            df = pd_read_query_result(run_query("SELECT * FROM nulls", "s3://bucket/results/"))
+            self.assertEqual([str(t) for t in df.dtypes], ["Int32", "Int64", "boolean"])
+            self.assertEqual(df.isna().sum().tolist(), [1, 1, 1])
+            self.assertEqual(df["big"].iloc[1], 2)
+
+            df = pd_read_query_result(result["query_execution_id"], metadata)
+            self.assertEqual(list(df.columns), ["label", "id", "amount", "day", "flag"])
+            self.assertEqual(df["amount"].isna().sum(), 1)
+
+            chunks = list(pd_read_sql("SELECT * FROM t", "s3://bucket/results/", table_metadata=metadata, chunksize=2))
+            self.assertEqual([len(c) for c in chunks], [2, 1])
+            self.assertEqual(list(chunks[1].columns), ["label", "id", "amount", "day", "flag"])
+
+            with self.assertRaises(ValueError) :
+                pd_read_query_result(result, {"table_name": "t", "columns": [{"name": "id", "type": "long"}]})
@@ -0,0 +1,100 @@
+import unittest
+import time
+import pandas as pd
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+
+from dataengineeringutils.backend import use_backend, get_client, get_backend, Boto3Backend
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.s3 import pd_write_csv_s3, pd_read_csv_s3, delete_folder_from_bucket, get_file_list_from_bucket, first_n_bytes_of_s3_object_to_lines
+from dataengineeringutils.glue import run_glue_job_as_airflow_task
+
+class FakeBackendTest(unittest.TestCase) :
+    """
+    Test the in-memory backend and that the s3 and glue modules go through it
+    """
+    def test_default_backend_is_boto3(self) :
+        self.assertIsInstance(get_backend(), Boto3Backend)
+        with use_backend(FakeBackend()) as fake:
+            self.assertIs(get_backend(), fake)
+        self.assertIsInstance(get_backend(), Boto3Backend)
+
+    def test_s3_functions_against_fake(self) :
+        with use_backend(FakeBackend()) as fake:
+            df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+            pd_write_csv_s3(df, "s3://bucket/folder/one.csv", index=False)
+            pd_write_csv_s3(df, "s3://bucket/folder/two.csv", index=False)
+            pd_write_csv_s3(df, "s3://bucket/folder_2/one.csv", index=False)
+
+            self.assertTrue(pd_read_csv_s3("s3://bucket/folder/one.csv").equals(df))
+            self.assertEqual(first_n_bytes_of_s3_object_to_lines("s3://bucket/folder/one.csv", 9), ["a,b", "1,x", "2"])
+            self.assertEqual(get_file_list_from_bucket("bucket", "folder"), ["folder/one.csv", "folder/two.csv"])
+
+            delete_folder_from_bucket("bucket", "folder/")
+            self.assertEqual(get_file_list_from_bucket("bucket", "folder_2"), ["folder_2/one.csv"])
+            with self.assertRaises(KeyError):
+                get_file_list_from_bucket("bucket", "folder")
+
+            self.assertEqual(fake.call_counts["s3.put_object"], 3)
+            self.assertEqual(fake.call_counts["s3.delete_objects"], 1)
+
+    def test_list_pagination(self) :
+        with use_backend(FakeBackend()):
+            s3_client = get_client("s3")
+            for i in range(25):
+                s3_client.put_object(Bucket="bucket", Key="prefix/{:03d}".format(i), Body=b"x")
+            pages = list(s3_client.get_paginator("list_objects_v2").paginate(Bucket="bucket", Prefix="prefix/", MaxKeys=10))
+            self.assertEqual([p["KeyCount"] for p in pages], [10, 10, 5])
+
+    def test_failure_injection(self) :
+        with use_backend(FakeBackend(seed=1)) as fake:
+            s3_client = get_client("s3")
+            fake.fail_next("s3.put_object", times=2)
+            for _ in range(2):
+                with self.assertRaises(ClientError) as cm:
+                    s3_client.put_object(Bucket="bucket", Key="k", Body=b"x")
+                self.assertEqual(cm.exception.response["Error"]["Code"], "SlowDown")
+            s3_client.put_object(Bucket="bucket", Key="k", Body=b"x")
+
+            fake.set_policy("s3.get_object", failure_rate=1)
+            with self.assertRaises(ClientError) as cm:
+                s3_client.get_object(Bucket="bucket", Key="k")
+            self.assertEqual(cm.exception.response["ResponseMetadata"]["HTTPStatusCode"], 500)
+            self.assertEqual(fake.error_counts["s3.get_object"], 1)
+
+        with use_backend(FakeBackend(max_calls_per_second={"glue": 3})):
+            glue_client = get_client("glue")
+            glue_client.create_database(DatabaseInput={"Name": "db"})
+            glue_client.get_database(Name="db")
+            glue_client.get_database(Name="db")
+            with self.assertRaises(ClientError) as cm:
+                glue_client.get_database(Name="db")
+            self.assertEqual(cm.exception.response["Error"]["Code"], "ThrottlingException")
+            with self.assertRaises(glue_client.exceptions.EntityNotFoundException):
+                time.sleep(1)
+                glue_client.get_database(Name="other_db")
+
+    def test_latency_overlaps_across_threads(self) :
+        with use_backend(FakeBackend(latency=0.05)):
+            s3_client = get_client("s3")
+            start = time.time()
+            with ThreadPoolExecutor(10) as executor:
+                list(executor.map(lambda i: s3_client.put_object(Bucket="b", Key=str(i), Body=b""), range(10)))
+            self.assertLess(time.time() - start, 0.4)
+
+    def test_glue_job_run_against_fake(self) :
+        with use_backend(FakeBackend()) as fake:
+            s3_client = get_client("s3")
+            s3_client.put_object(Bucket="bucket", Key="jobs/my_job/job.py", Body=b"print(1)")
+            s3_client.put_object(Bucket="bucket", Key="jobs/my_job/glue_resources/a.sql", Body=b"")
+            s3_client.put_object(Bucket="bucket", Key="jobs/shared_job_resources/glue_py_resources/lib.zip", Body=b"")
+
+            run_id = run_glue_job_as_airflow_task("s3://bucket/jobs/my_job/", "my_job", "role", {"--a": "1"}, init_wait_time=0)
+            job_run = get_client("glue").get_job_run(JobName="my_job", RunId=run_id)["JobRun"]
+            self.assertEqual(job_run["Arguments"], {"--a": "1"})
+            self.assertNotIn("my_job", fake.jobs)
+
+            fake.set_job_outcome("my_job", "FAILED", "it broke")
+            with self.assertRaises(ValueError):
+                run_glue_job_as_airflow_task("s3://bucket/jobs/my_job/", "my_job", "role", None, init_wait_time=0)
+            self.assertEqual(fake.jobs["my_job"]["DefaultArguments"]["--extra-py-files"], "s3://bucket/jobs/shared_job_resources/glue_py_resources/lib.zip")
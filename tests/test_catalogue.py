@@ -0,0 +1,113 @@
+import unittest
+import os
+import json
+import tempfile
+from unittest import mock
+from dataengineeringutils.catalogue import MetadataCatalogue
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.glue import metadata_folder_to_database
+from dataengineeringutils.utils import write_json
+from dataengineeringutils.s3 import upload_meta_data_folder_to_s3
+import dataengineeringutils.catalogue
+
+def make_metadata_folder(folder):
+    write_json({"name": "db", "description": "a database", "location": "s3://bucket/db/"}, os.path.join(folder, "database.json"))
+    tables = [
+        ("t1", "csv", []),
+        ("t2", "parquet", ["year"]),
+        ("t3", "parquet", ["year", "month"]),
+    ]
+    for name, data_format, partitions in tables:
+        columns = [{"name": "a", "type": "int", "description": ""}] + [{"name": p, "type": "int", "description": ""} for p in partitions]
+        table = {"table_name": name, "table_desc": "", "data_format": data_format, "location": name + "/", "columns": columns}
+        if partitions:
+            table["glue_specific"] = {"PartitionKeys": [{"Name": p, "Type": "int"} for p in partitions]}
+        write_json(table, os.path.join(folder, name + ".json"))
+
+class MetadataCatalogueTest(unittest.TestCase) :
+    """
+    Test the lazy, cached metadata catalogue
+    """
+    def test_local_catalogue(self) :
+        with tempfile.TemporaryDirectory() as td:
+            make_metadata_folder(td)
+            with open(os.path.join(td, "notes.txt"), "w") as f:
+                f.write("not metadata")
+
+            with mock.patch.object(dataengineeringutils.catalogue, "read_json", wraps=dataengineeringutils.catalogue.read_json) as read_json:
+                catalogue = MetadataCatalogue(td)
+                self.assertEqual(read_json.call_count, 0)
+                self.assertEqual(catalogue.table_names(), ["t1", "t2", "t3"])
+                self.assertEqual(catalogue.get_database()["name"], "db")
+
+                self.assertEqual(catalogue.tables_with_data_format("parquet"), ["t2", "t3"])
+                self.assertEqual(catalogue.tables_with_partition_key("month"), ["t3"])
+                self.assertEqual(read_json.call_count, 4)
+
+                # Copies are handed out, so changes don't leak into the cache
+                t1 = catalogue.get_table("t1")
+                t1["columns"] = []
+                self.assertEqual(len(catalogue.get_table("t1")["columns"]), 1)
+                self.assertEqual(read_json.call_count, 4)
+
+                # Changed files are parsed again
+                t1["table_desc"] = "changed"
+                path = os.path.join(td, "t1.json")
+                write_json(t1, path)
+                os.utime(path, ns=(os.stat(path).st_mtime_ns + 10**9, os.stat(path).st_mtime_ns + 10**9))
+                self.assertEqual(catalogue.get_table("t1")["table_desc"], "changed")
+                self.assertEqual(read_json.call_count, 5)
+
+            with self.assertRaises(KeyError):
+                catalogue.get_table("t4")
+
+            # Columns of tables that haven't been parsed are streamed, not cached
+            with mock.patch.object(dataengineeringutils.catalogue, "read_json", wraps=dataengineeringutils.catalogue.read_json) as read_json:
+                catalogue = MetadataCatalogue(td)
+                self.assertEqual([c["name"] for c in catalogue.iter_columns("t3")], ["a", "year", "month"])
+                self.assertEqual(catalogue.tables_with_column("year"), ["t2", "t3"])
+                self.assertEqual(read_json.call_count, 0)
+                catalogue.get_table("t2")
+                self.assertEqual([c["name"] for c in catalogue.iter_columns("t2")], ["a", "year"])
+                self.assertEqual(read_json.call_count, 1)
+                with self.assertRaises(KeyError):
+                    list(catalogue.iter_columns("t4"))
+
+            os.remove(os.path.join(td, "database.json"))
+            catalogue.refresh()
+            with self.assertRaises(ValueError):
+                catalogue.get_database()
+
+    def test_s3_catalogue(self) :
+        with tempfile.TemporaryDirectory() as td, use_backend(FakeBackend()) as fake:
+            make_metadata_folder(td)
+            s3_client = get_client("s3")
+            for f in os.listdir(td):
+                s3_client.upload_file(os.path.join(td, f), "bucket", "meta_data/db/" + f)
+            s3_client.put_object(Bucket="bucket", Key="meta_data/db/nested/t9.json", Body=b"{}")
+
+            catalogue = MetadataCatalogue(s3_path="s3://bucket/meta_data/db")
+            self.assertEqual(catalogue.table_names(), ["t1", "t2", "t3"])
+            self.assertEqual(catalogue.tables_with_partition_key("year"), ["t2", "t3"])
+            catalogue.get_table("t2")
+            self.assertEqual(fake.call_counts["s3.get_object"], 3)
+            self.assertEqual(catalogue.tables_with_column("month"), ["t3"])
+            self.assertEqual(fake.call_counts["s3.get_object"], 3)
+
+            metadata_folder_to_database(None, catalogue=catalogue)
+            self.assertEqual(sorted(fake.databases["db"]["tables"]), ["t1", "t2", "t3"])
+            self.assertEqual(fake.call_counts["s3.get_object"], 4)
+
+    def test_upload_catalogue_files(self) :
+        with tempfile.TemporaryDirectory() as td, tempfile.TemporaryDirectory() as other, use_backend(FakeBackend()) as fake:
+            make_metadata_folder(td)
+            write_json({"table_name": "unrelated"}, os.path.join(other, "unrelated.json"))
+            catalogue = MetadataCatalogue(td)
+
+            # The catalogue's own files are uploaded, whatever folder is passed
+            upload_meta_data_folder_to_s3(other, "bucket", "meta_data/db", catalogue=catalogue)
+            self.assertEqual(sorted(fake.buckets["bucket"]), ["meta_data/db/database.json", "meta_data/db/t1.json", "meta_data/db/t2.json", "meta_data/db/t3.json"])
+
+            with self.assertRaises(ValueError):
+                upload_meta_data_folder_to_s3(other, "bucket", "meta_data/db", catalogue=MetadataCatalogue(s3_path="s3://bucket/meta_data/db/"))
@@ -0,0 +1,36 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from dataengineeringutils.colnames import normalise_string, normalise_column_names, clean_and_normalise_df_column_names
+from dataengineeringutils.utils import get_csv_header
+
+class ColnamesTest(unittest.TestCase) :
+    """
+    Test column name normalisation
+    """
+    def test_matches_normalise_string(self) :
+        names = ["My Col", "it's", "a-b.c", "already_ok", "Ünï çødé", "x/y"]
+        self.assertEqual(normalise_column_names(names), [normalise_string(n) for n in names])
+        self.assertEqual(normalise_string("Bob's Col-1"), "bobs_col_1")
+
+    def test_collisions_are_suffixed_deterministically(self) :
+        names = ["A b", "a_b", "a-b", "a_b_2", "C"]
+        self.assertEqual(normalise_column_names(names), ["a_b", "a_b_3", "a_b_4", "a_b_2", "c"])
+        self.assertEqual(normalise_column_names(names), normalise_column_names(list(names)))
+        with self.assertRaises(ValueError) :
+            normalise_column_names(names, on_collision="raise")
+
+    def test_df_and_csv_header(self) :
+        df = pd.DataFrame([[1, 2, 3]], columns=["Col A", "col_a", "B"])
+        df = clean_and_normalise_df_column_names(df)
+        self.assertEqual(list(df.columns), ["col_a", "col_a_2", "b"])
+
+        with tempfile.TemporaryDirectory() as td :
+            path = os.path.join(td, "f.csv")
+            with open(path, "w") as f :
+                f.write('"Col A","col_a",B\n1,2,3\n')
+            self.assertEqual(get_csv_header(path, strip_quotes=True, normalise=True), ["col_a", "col_a_2", "b"])
+            self.assertEqual(get_csv_header(path), ['"Col A"', '"col_a"', 'B'])
+            with self.assertRaises(ValueError) :
+                get_csv_header(path, strip_quotes=True, normalise="raise")
@@ -0,0 +1,104 @@
+import unittest
+import os
+import gzip
+import pandas as pd
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.compression import CODECS, resolve_codec, compress_bytes, decompress_bytes, benchmark_codecs
+from dataengineeringutils.s3 import upload_to_s3, pd_read_csv_s3, pd_write_csv_s3, s3_path_to_bytes_io, first_n_bytes_of_s3_object_to_lines
+from dataengineeringutils.glue import df_to_csv_s3
+
+try:
+    import zstandard
+    AVAILABLE_CODECS = CODECS
+except ImportError:
+    AVAILABLE_CODECS = tuple(c for c in CODECS if c != "zstd")
+
+MB = 1024 ** 2
+
+EXTENSIONS = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}
+
+def numbers_df(n) :
+    return pd.DataFrame({"a": range(n), "b": ["row {}".format(i) for i in range(n)]})
+
+class CompressionTest(unittest.TestCase) :
+    """
+    Test streaming compression of s3 reads and writes
+    """
+    def test_codecs(self) :
+        self.assertEqual(resolve_codec("s3://bucket/table.csv.GZ"), "gzip")
+        self.assertEqual(resolve_codec("table.csv.zst"), "zstd")
+        self.assertIsNone(resolve_codec("table.csv"))
+        self.assertEqual(resolve_codec("table.csv", "bz2"), "bz2")
+        self.assertIsNone(resolve_codec("table.csv.gz", None))
+        with self.assertRaises(ValueError) :
+            resolve_codec("table.csv", "rar")
+        data = b"some text " * 1000
+        for codec in AVAILABLE_CODECS :
+            compressed = compress_bytes(data, codec)
+            self.assertLess(len(compressed), len(data) / 10)
+            self.assertEqual(decompress_bytes(compressed, codec), data)
+
+    def test_csv_round_trip_through_s3(self) :
+        df = numbers_df(5000)
+        with use_backend(FakeBackend()) :
+            s3_client = get_client('s3')
+            for codec in AVAILABLE_CODECS :
+                path = "s3://bucket/numbers.csv" + EXTENSIONS[codec]
+                pd_write_csv_s3(df, path, index=False)
+                stored = s3_client.get_object(Bucket="bucket", Key=path[len("s3://bucket/"):])["Body"].read()
+                self.assertEqual(decompress_bytes(stored, codec), df.to_csv(index=False).encode("utf-8"))
+                pd.testing.assert_frame_equal(pd_read_csv_s3(path), df)
+                chunks = list(pd_read_csv_s3(path, chunksize=1000))
+                self.assertEqual(len(chunks), 5)
+                self.assertEqual(first_n_bytes_of_s3_object_to_lines(path, num_bytes=23), ["a,b", "0,row 0", "1,row 1", "2,r"])
+
+            # An explicit codec overrides the extension
+            pd_write_csv_s3(df, "s3://bucket/numbers.dat", index=False, compression="gzip")
+            self.assertEqual(gzip.decompress(s3_path_to_bytes_io("s3://bucket/numbers.dat", compression=None).read()),
+                             s3_path_to_bytes_io("s3://bucket/numbers.dat", compression="gzip").read())
+
+            # Compressions only pandas handles are left to it
+            pd_write_csv_s3(df, "s3://bucket/numbers.zip", index=False)
+            self.assertEqual(s3_path_to_bytes_io("s3://bucket/numbers.zip", compression=None).read()[:2], b"PK")
+            pd.testing.assert_frame_equal(pd_read_csv_s3("s3://bucket/numbers.zip"), df)
+            pd_write_csv_s3(df, "s3://bucket/numbers.dat", index=False, compression={"method": "zip", "archive_name": "numbers.csv"})
+            pd.testing.assert_frame_equal(pd_read_csv_s3("s3://bucket/numbers.dat", compression="zip"), df)
+
+            df_to_csv_s3(df, "bucket", "glue/numbers.csv.gz")
+            self.assertEqual(first_n_bytes_of_s3_object_to_lines("s3://bucket/glue/numbers.csv.gz", num_bytes=16), ["0,row 0", "1,row 1"])
+            df_to_csv_s3(df, "bucket", "glue/numbers.csv")
+            self.assertEqual(first_n_bytes_of_s3_object_to_lines("s3://bucket/glue/numbers.csv", num_bytes=8), ["0,row 0"])
+
+    def test_large_writes_are_streamed_in_parts(self) :
+        data = os.urandom(12 * MB)
+        def write(f) :
+            for i in range(0, len(data), MB) :
+                f.write(data[i:i + MB])
+        with use_backend(FakeBackend()) as fake :
+            upload_to_s3(write, "s3://bucket/big.bin.gz", part_size=5 * MB)
+            self.assertEqual(fake.call_counts["s3.upload_part"], 3)
+            self.assertEqual(fake.call_counts["s3.put_object"], 0)
+            self.assertEqual(s3_path_to_bytes_io("s3://bucket/big.bin.gz").read(), data)
+
+            # Small files are one put_object
+            upload_to_s3(lambda f: f.write(b"small"), "s3://bucket/small.bin", part_size=5 * MB)
+            self.assertEqual(fake.call_counts["s3.put_object"], 1)
+            self.assertEqual(s3_path_to_bytes_io("s3://bucket/small.bin").read(), b"small")
+
+            # A failed write aborts the upload
+            def failing_write(f) :
+                f.write(data[:6 * MB])
+                raise RuntimeError("boom")
+            with self.assertRaises(RuntimeError) :
+                upload_to_s3(failing_write, "s3://bucket/failed.bin", part_size=5 * MB)
+            self.assertEqual(fake.call_counts["s3.abort_multipart_upload"], 1)
+            self.assertEqual(fake.multipart_uploads, {})
+            self.assertNotIn("failed.bin", fake.buckets["bucket"])
+
+    def test_benchmark(self) :
+        results = benchmark_codecs(numbers_df(2000).to_csv().encode("utf-8"), levels={"gzip": [1, 9]}, repeat=1)
+        self.assertEqual(len(results), len(AVAILABLE_CODECS) + 1)
+        self.assertEqual(set(r["codec"] for r in results), set(AVAILABLE_CODECS))
+        self.assertEqual([r["ratio"] for r in results], sorted([r["ratio"] for r in results], reverse=True))
+        self.assertTrue(all(r["ratio"] > 1 and r["compress_mb_per_s"] > 0 and r["decompress_mb_per_s"] > 0 for r in results))
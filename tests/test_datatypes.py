@@ -0,0 +1,40 @@
+import unittest
+from dataengineeringutils.datatypes import TypeRegistry, translate_metadata_type_to_type, translate_metadata_types_to_types, type_registry
+
+class TypeRegistryTest(unittest.TestCase) :
+    """
+    Test translating metadata types to other dialects
+    """
+    def test_builtin_dialects(self) :
+        self.assertEqual(translate_metadata_type_to_type("character"), "string")
+        self.assertEqual(translate_metadata_type_to_type("long", "glue"), "bigint")
+        self.assertEqual(translate_metadata_type_to_type("datetime", "spark"), "TimestampType")
+        self.assertEqual(translate_metadata_type_to_type("boolean", "pandas"), "bool")
+        self.assertEqual(type_registry.dialects(), ["arrow", "athena", "glue", "pandas", "spark"])
+
+        with self.assertRaises(KeyError):
+            translate_metadata_type_to_type("varchar")
+        with self.assertRaises(KeyError):
+            translate_metadata_type_to_type("int", "postgres")
+
+    def test_translate_columns(self) :
+        columns = [{"name": "a", "type": "int"}, {"name": "b", "type": "date"}, {"name": "c", "type": "double"}]
+        self.assertEqual(translate_metadata_types_to_types(columns, "glue"), ["int", "date", "double"])
+        with self.assertRaises(KeyError):
+            translate_metadata_types_to_types(columns + [{"name": "d", "type": "varchar"}])
+
+    def test_register_dialect(self) :
+        registry = TypeRegistry()
+        registry.register_dialect("postgres", {"character": "text", "int": "integer", "long": "bigint"})
+        self.assertEqual(registry.translate("long", "postgres"), "bigint")
+        self.assertEqual(registry.translate("long", "glue"), "bigint")
+        self.assertIn("postgres", registry.dialects())
+
+        with self.assertRaises(ValueError):
+            registry.register_dialect("glue", {"int": "integer"})
+        registry.register_dialect("glue", {"int": "integer"}, overwrite=True)
+        self.assertEqual(registry.translate("int", "glue"), "integer")
+        with self.assertRaises(KeyError):
+            registry.translate("long", "glue")
+
+        self.assertNotIn("postgres", type_registry.dialects())
@@ -0,0 +1,143 @@
+import unittest
+import os
+import tempfile
+import zipfile
+from dataengineeringutils.glue import unnest_github_zipfile_and_return_new_zip_path, GithubZipCache, delete_all_target_data_from_database, get_glue_job_and_resources_from_s3
+from dataengineeringutils.glue import run_glue_job_from_s3_folder_template, run_glue_job_as_airflow_task
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.utils import write_json
+from dataengineeringutils.s3 import S3ListingCache, upload_file_to_s3_from_path, listing_cache
+
+def make_github_style_zip(path, top_folder = "gluejobutils-master"):
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr(top_folder + "/", b"")
+        z.writestr(top_folder + "/gluejobutils/", b"")
+        z.writestr(top_folder + "/gluejobutils/__init__.py", b"")
+        z.writestr(top_folder + "/gluejobutils/utils.py", b"def f():\n    return 1\n")
+        z.writestr(top_folder + "/README.md", b"readme")
+
+class GithubZipTest(unittest.TestCase) :
+    """
+    Test unnesting and caching of github zipballs
+    """
+    def test_unnest_github_zipfile(self) :
+        with tempfile.TemporaryDirectory() as td:
+            zip_path = os.path.join(td, "0.zip")
+            make_github_style_zip(zip_path)
+            new_path = unnest_github_zipfile_and_return_new_zip_path(zip_path)
+
+            self.assertEqual(new_path, os.path.join(td, "0_new.zip"))
+            with zipfile.ZipFile(new_path) as z:
+                names = set(z.namelist())
+                self.assertEqual(names, {"gluejobutils/", "gluejobutils/__init__.py", "gluejobutils/utils.py", "README.md"})
+                self.assertEqual(z.read("gluejobutils/utils.py"), b"def f():\n    return 1\n")
+
+    def test_github_zip_cache_reuses_artifact(self) :
+        with tempfile.TemporaryDirectory() as td:
+            zip_path = os.path.join(td, "master.zip")
+            make_github_style_zip(zip_path)
+            url = "file://" + zip_path
+
+            cache = GithubZipCache(os.path.join(td, "cache"))
+            first = cache.get(url)
+            self.assertEqual(cache.get(url + "\n"), first)
+
+            # A new cache object over the same dir finds the same content addressed file
+            second_cache = GithubZipCache(os.path.join(td, "cache"))
+            mtime = os.path.getmtime(first)
+            self.assertEqual(second_cache.get(url), first)
+            self.assertEqual(os.path.getmtime(first), mtime)
+            self.assertEqual([f for f in os.listdir(os.path.join(td, "cache"))], [os.path.basename(first)])
+
+            # Changing the archive behind the url gives a new artifact
+            make_github_style_zip(zip_path, "gluejobutils-v2")
+            third = GithubZipCache(os.path.join(td, "cache")).get(url)
+            self.assertNotEqual(third, first)
+
+def make_metadata_folder(folder, num_tables):
+    write_json({"name": "db", "description": "a database", "location": "s3://bucket/db/"}, os.path.join(folder, "database.json"))
+    for i in range(num_tables):
+        location = "table_{}/".format(i) if i % 2 == 0 else "s3://bucket/db/table_{}".format(i)
+        table = {"table_name": "table_{}".format(i), "table_desc": "", "data_format": "csv", "location": location, "columns": []}
+        write_json(table, os.path.join(folder, "table_{}.json".format(i)))
+
+class DeleteTargetDataTest(unittest.TestCase) :
+    """
+    Test purging the data of every table in a database
+    """
+    def test_delete_all_target_data_from_database(self) :
+        with tempfile.TemporaryDirectory() as td, use_backend(FakeBackend(latency=0.001)) as fake:
+            make_metadata_folder(td, 6)
+            s3_client = get_client("s3")
+            for i in range(6):
+                for j in range(3):
+                    s3_client.put_object(Bucket="bucket", Key="db/table_{}/part_{}.csv".format(i, j), Body=b"12345")
+            s3_client.put_object(Bucket="bucket", Key="db/table_10/part_0.csv", Body=b"12345")
+
+            summary = delete_all_target_data_from_database(td, dry_run=True)
+            self.assertEqual(summary["objects"], 18)
+            self.assertEqual(summary["bytes"], 90)
+            self.assertEqual(summary["tables"]["table_1"], {"location": "s3://bucket/db/table_1/", "objects": 3, "bytes": 15})
+            self.assertEqual(fake.call_counts["s3.delete_objects"], 0)
+            self.assertEqual(len(fake.buckets["bucket"]), 19)
+
+            summary = delete_all_target_data_from_database(td, max_workers=3, max_requests_in_flight=2)
+            self.assertEqual(summary["objects"], 18)
+            self.assertEqual(list(fake.buckets["bucket"]), ["db/table_10/part_0.csv"])
+
+class JobResolutionTest(unittest.TestCase) :
+    """
+    Test resolving glue job folders in s3, with and without a listing cache
+    """
+    def test_shared_resources_listing_is_cached(self) :
+        with use_backend(FakeBackend()) as fake:
+            s3_client = get_client("s3")
+            for i in range(30):
+                s3_client.put_object(Bucket="bucket", Key="jobs/job_{}/job.py".format(i), Body=b"")
+                s3_client.put_object(Bucket="bucket", Key="jobs/job_{}/glue_resources/query.sql".format(i), Body=b"")
+            s3_client.put_object(Bucket="bucket", Key="jobs/shared_job_resources/glue_py_resources/lib.zip", Body=b"")
+            s3_client.put_object(Bucket="bucket", Key="jobs/job_1_other/job.py", Body=b"")
+
+            cache = S3ListingCache(ttl=60)
+            for i in range(30):
+                job_path, resources, py_resources = get_glue_job_and_resources_from_s3("s3://bucket/jobs/job_{}".format(i), listing_cache=cache)
+                self.assertEqual(job_path, "s3://bucket/jobs/job_{}/job.py".format(i))
+                self.assertEqual(resources, "s3://bucket/jobs/job_{}/glue_resources/query.sql".format(i))
+                self.assertEqual(py_resources, "s3://bucket/jobs/shared_job_resources/glue_py_resources/lib.zip")
+            # Each job folder once, shared_job_resources once
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], 31)
+            get_glue_job_and_resources_from_s3("s3://bucket/jobs/job_1", listing_cache=cache)
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], 31)
+
+            # Without a cache s3 is always listed
+            get_glue_job_and_resources_from_s3("s3://bucket/jobs/job_0/")
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], 33)
+
+            # Writes through the s3 module invalidate the shared cache
+            get_glue_job_and_resources_from_s3("s3://bucket/jobs/job_0/", listing_cache=listing_cache)
+            upload_file_to_s3_from_path(__file__, "bucket", "jobs/job_0/glue_resources/extra.txt")
+            job_path, resources, py_resources = get_glue_job_and_resources_from_s3("s3://bucket/jobs/job_0/", listing_cache=listing_cache)
+            self.assertIn("s3://bucket/jobs/job_0/glue_resources/extra.txt", resources)
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], 36)
+
+            with self.assertRaises(ValueError):
+                get_glue_job_and_resources_from_s3("s3://bucket/jobs/job_100/", listing_cache=cache)
+
+    def test_launching_jobs_lists_shared_resources_once(self) :
+        with use_backend(FakeBackend()) as fake:
+            s3_client = get_client("s3")
+            for i in range(5):
+                s3_client.put_object(Bucket="bucket", Key="jobs/job_{}/job.py".format(i), Body=b"")
+            s3_client.put_object(Bucket="bucket", Key="jobs/shared_job_resources/glue_py_resources/lib.zip", Body=b"")
+            listing_cache.invalidate()
+
+            for i in range(3):
+                run_glue_job_from_s3_folder_template("s3://bucket/jobs/job_{}/".format(i), "job_{}".format(i), "role")
+            run_glue_job_as_airflow_task("s3://bucket/jobs/job_3/", "job_3", "role", {}, init_wait_time=0, interval_wait_time=0)
+            # Each job folder once, shared_job_resources once
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], 5)
+            self.assertEqual(fake.jobs["job_0"]["DefaultArguments"]["--extra-py-files"], "s3://bucket/jobs/shared_job_resources/glue_py_resources/lib.zip")
+
+            run_glue_job_from_s3_folder_template("s3://bucket/jobs/job_4/", "job_4", "role", listing_cache=None)
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], 7)
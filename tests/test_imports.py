@@ -0,0 +1,37 @@
+import unittest
+import re
+import sys
+import subprocess
+
+# Modules that should only be imported when a function that needs them is called
+HEAVY_MODULES = ("pandas", "numpy", "boto3", "botocore", "pyspark", "pyarrow", "pyathenajdbc", "pkg_resources")
+
+# Modules that must import without any of HEAVY_MODULES (pandas based modules such as pd_metadata_conformance are not listed)
+LIGHT_MODULES = ("glue", "s3", "athena", "spark", "sql", "writers", "readers", "partitions", "compression", "meta", "catalogue", "templates", "datatypes", "utils", "colnames", "backend")
+
+# Cumulative import time budget in microseconds for each of LIGHT_MODULES (stdlib only, typically well under 100ms)
+IMPORT_TIME_BUDGET_US = 300000
+
+def import_times(module) :
+    """
+    Run python -X importtime in a fresh interpreter and return {module name: cumulative microseconds}
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {}".format(module)], capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines() :
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match :
+            times[match.group(3)] = int(match.group(1))
+    return times
+
+class ImportTimeTest(unittest.TestCase) :
+    """
+    Test that importing the package doesn't pull in heavy dependencies
+    """
+    def test_light_modules_import_quickly(self) :
+        for name in LIGHT_MODULES :
+            module = "dataengineeringutils." + name
+            times = import_times(module)
+            heavy = sorted(m for m in times if m.split(".")[0] in HEAVY_MODULES)
+            self.assertEqual(heavy, [], "{} imports {}".format(module, ", ".join(heavy)))
+            self.assertLess(times[module], IMPORT_TIME_BUDGET_US, "{} took {}us to import".format(module, times[module]))
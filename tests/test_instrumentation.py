@@ -0,0 +1,72 @@
+import unittest
+import os
+import json
+import tempfile
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.instrumentation import instrument, get_recorder
+from dataengineeringutils.s3 import delete_folder_from_bucket, s3_path_to_bytes_io, upload_file_to_s3_from_path, listing_cache
+from dataengineeringutils.athena import run_query
+
+class InstrumentationTest(unittest.TestCase) :
+    """
+    Test recording the client calls made by the package
+    """
+    def test_records_calls_bytes_and_errors(self) :
+        events = []
+        with use_backend(FakeBackend()) as fake, instrument() as recorder :
+            recorder.add_hook(events.append)
+            s3 = get_client('s3')
+            for i in range(3) :
+                s3.put_object(Bucket="bucket", Key="data/{}.csv".format(i), Body=b"12345")
+            with tempfile.TemporaryDirectory() as td :
+                path = os.path.join(td, "f.txt")
+                with open(path, "wb") as f :
+                    f.write(b"x" * 100)
+                upload_file_to_s3_from_path(path, "bucket", "data/f.txt")
+            self.assertEqual(s3_path_to_bytes_io("s3://bucket/data/f.txt").read(), b"x" * 100)
+
+            fake.fail_next("s3.head_object", 1)
+            with self.assertRaises(Exception) :
+                s3.head_object(Bucket="bucket", Key="data/0.csv")
+
+            # Listings made through the listing cache are recorded too
+            listing_cache.invalidate()
+            self.assertEqual(len(listing_cache.list_keys("bucket", "data/")), 4)
+            listing_cache.list_keys("bucket", "data/")
+
+            self.assertEqual(delete_folder_from_bucket("bucket", "data/"), (4, 115))
+
+        self.assertIsNone(get_recorder())
+        stats = recorder.stats()
+        self.assertEqual(stats["s3.put_object"]["requests"], 3)
+        self.assertEqual(stats["s3.put_object"]["bytes_sent"], 15)
+        self.assertEqual(stats["s3.upload_file"]["bytes_sent"], 100)
+        self.assertEqual(stats["s3.get_object"]["bytes_received"], 100)
+        self.assertEqual(stats["s3.head_object"]["errors"], 1)
+        self.assertEqual(stats["s3.head_object"]["throttles"], 1)
+        self.assertEqual(stats["s3.list_objects_v2"]["requests"], fake.call_counts["s3.list_objects_v2"])
+        self.assertEqual(sum(s["requests"] for s in stats.values()), sum(fake.call_counts.values()))
+        self.assertEqual(len([e for e in events if e["kind"] == "call"]), sum(fake.call_counts.values()))
+
+    def test_exporters(self) :
+        with use_backend(FakeBackend(max_concurrent_queries=1, query_run_seconds=0.02)) as fake, instrument() as recorder :
+            get_client('s3').put_object(Bucket="bucket", Key="a", Body="abc")
+            run_query("SELECT 1", "s3://bucket/results/")
+            get_client('athena').start_query_execution(QueryString="SELECT 2", ResultConfiguration={"OutputLocation": "s3://bucket/results/"})
+            run_query("SELECT 3", "s3://bucket/results/")
+
+        summary = json.loads(recorder.to_json())
+        self.assertEqual(summary["operations"]["s3.put_object"]["bytes_sent"], 3)
+        self.assertGreater(summary["operations"]["athena.start_query_execution"]["retries"], 0)
+        self.assertGreater(summary["operations"]["athena.start_query_execution"]["wait_seconds"], 0)
+        self.assertEqual(summary["totals"]["requests"], sum(fake.call_counts.values()))
+
+        prometheus = recorder.to_prometheus()
+        self.assertIn("# TYPE dataengineeringutils_aws_requests_total counter", prometheus)
+        self.assertIn('dataengineeringutils_aws_requests_total{service="s3",operation="put_object"} 1', prometheus)
+        self.assertIn('dataengineeringutils_aws_bytes_sent_total{service="s3",operation="put_object"} 3', prometheus)
+
+        with self.assertLogs("dataengineeringutils.instrumentation", level="INFO") as cm :
+            recorder.log_summary()
+        self.assertTrue(any("s3.put_object: 1 requests" in line for line in cm.output))
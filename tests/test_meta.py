@@ -0,0 +1,97 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+from dataengineeringutils.meta import Meta
+from dataengineeringutils.utils import read_json
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def td_path(path):
+    return os.path.join(THIS_DIR, "test_data", path)
+
+class MetaTest(unittest.TestCase) :
+    """
+    Test editing table metadata with meta.Meta
+    """
+    def test_update_and_add_columns(self) :
+        m = Meta(td_path("test_table_metadata_valid.json"))
+        m.update_column("myint", column_type="long", column_desc="now a long")
+        self.assertEqual(m.get_column("myint"), {"name": "myint", "type": "long", "description": "now a long"})
+
+        m.update_column("new_col")
+        self.assertEqual(m.column_names[-1], "new_col")
+        self.assertEqual(m.get_column("new_col")["type"], "character")
+
+        m.update_columns([{"name": "a", "type": "int"}, {"name": "mychar", "description": "chars"}])
+        self.assertEqual(m.get_column("a")["type"], "int")
+        self.assertEqual(m.get_column("mychar"), {"name": "mychar", "type": "character", "description": "chars"})
+
+        with self.assertRaises(ValueError):
+            m.update_column("myint", column_type="varchar")
+        with self.assertRaises(ValueError):
+            m.update_columns([{"name": "b"}, {"name": "c", "description": 1}])
+        self.assertNotIn("b", m.column_names)
+        with self.assertRaises(ValueError):
+            m.get_column("not_a_column")
+
+    def test_remove_and_rename_columns(self) :
+        m = Meta(td_path("test_table_metadata_valid.json"))
+        m.remove_column("myfloat")
+        m.remove_columns(["mydate", "mydatetime"])
+        self.assertEqual(m.column_names, ["myint", "mychar", "myboolean", "mydouble", "mylong"])
+        self.assertEqual(m.get_column("mylong")["name"], "mylong")
+        with self.assertRaises(ValueError):
+            m.remove_column("myfloat")
+
+        m.set_columns_as_file_partitions(["mylong"])
+        m.rename_columns({"myint": "mychar", "mychar": "myint", "mylong": "partition"})
+        self.assertEqual(m.column_names, ["mychar", "myint", "myboolean", "mydouble", "partition"])
+        self.assertEqual(m.get_column("myint")["type"], "character")
+        self.assertEqual(m.meta["glue_specific"]["PartitionKeys"], [{"Name": "partition", "Type": "long"}])
+
+        with self.assertRaises(ValueError):
+            m.rename_column("myint", "mychar")
+        with self.assertRaises(ValueError):
+            m.rename_column("not_a_column", "x")
+        with self.assertRaises(ValueError):
+            m.set_columns_as_file_partitions(["not_a_column"])
+
+        m.set_columns_as_file_partitions(None)
+        self.assertNotIn("glue_specific", m.meta)
+
+    def test_iter_columns(self) :
+        m = Meta(td_path("test_table_metadata_valid.json"))
+        self.assertEqual(list(Meta.iter_columns(td_path("test_table_metadata_valid.json"))), m.meta["columns"])
+
+    def test_write_to_json(self) :
+        m = Meta(td_path("test_table_metadata_valid.json"))
+        m.change_location("s3://bucket/new")
+        with self.assertRaises(ValueError):
+            m.change_data_format("xml")
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "meta.json")
+            m.write_to_json(path)
+            self.assertEqual(read_json(path)["location"], "s3://bucket/new/")
+            self.assertEqual(Meta(path).get_location(), "s3://bucket/new/")
+
+    def test_wide_table_edits_rebuild_the_index_once(self) :
+        m = Meta(td_path("test_table_metadata_valid.json"))
+        n = 2000
+        with mock.patch.object(Meta, "_Meta__rebuild_index", autospec=True, side_effect=Meta._Meta__rebuild_index) as rebuild_index:
+            m.update_columns([{"name": "col_{}".format(i), "type": "int"} for i in range(n)])
+            for i in range(n):
+                m.update_column("col_{}".format(i), column_desc="desc")
+            m.rename_columns({"col_{}".format(i): "renamed_{}".format(i) for i in range(n)})
+            m.remove_columns(["renamed_{}".format(i) for i in range(0, n, 2)])
+        # Only removing columns moves the others, and that rebuilds the index once
+        self.assertEqual(rebuild_index.call_count, 1)
+        self.assertEqual(len(m.column_names), 8 + n // 2)
+        self.assertEqual(m.get_column("renamed_1")["description"], "desc")
+        self.assertEqual(m.get_column("renamed_1999"), {"name": "renamed_1999", "type": "int", "description": "desc"})
+
+    def test_removed_columns_are_not_partitions(self) :
+        m = Meta(td_path("test_table_metadata_valid.json"))
+        m.set_columns_as_file_partitions(["mylong", "mydate"])
+        m.remove_columns(["mydate", "myfloat"])
+        self.assertEqual(m.meta["glue_specific"]["PartitionKeys"], [{"Name": "mylong", "Type": "long"}])
@@ -0,0 +1,41 @@
+import unittest
+import datetime
+from dataengineeringutils.partitions import (HIVE_DEFAULT_PARTITION, partition_key_names, resolve_table_location, format_partition_value,
+                                             escape_partition_value, unescape_partition_value, partition_path)
+
+class PartitionsTest(unittest.TestCase) :
+    """
+    Test table locations and hive style partition folders
+    """
+    def test_partition_key_names(self) :
+        self.assertEqual(partition_key_names({"glue_specific": {"PartitionKeys": [{"Name": "year", "Type": "int"}]}}), ["year"])
+        self.assertEqual(partition_key_names({"partitions": ["year"]}), ["year"])
+        self.assertEqual(partition_key_names({}), [])
+
+    def test_resolve_table_location(self) :
+        metadata = {"location": "t"}
+        self.assertEqual(resolve_table_location(metadata, database_metadata={"location": "s3://bucket/db/"}), "s3://bucket/db/t/")
+        self.assertEqual(resolve_table_location({"location": "s3://b/t"}), "s3://b/t/")
+        self.assertEqual(resolve_table_location(metadata, "/data/t", require_s3=False), "/data/t/")
+        with self.assertRaises(ValueError) :
+            resolve_table_location(metadata)
+        with self.assertRaises(ValueError) :
+            resolve_table_location(metadata, "/data/t")
+
+    def test_format_partition_value(self) :
+        self.assertEqual(format_partition_value(datetime.datetime(2018, 1, 31, 9, 30), "datetime"), "2018-01-31 09:30:00")
+        self.assertEqual(format_partition_value(datetime.datetime(2018, 1, 31), "datetime"), "2018-01-31 00:00:00")
+        self.assertEqual(format_partition_value(datetime.datetime(2018, 1, 31, 9, 30), "date"), "2018-01-31")
+        self.assertEqual(format_partition_value(True, "boolean"), "true")
+        self.assertEqual(format_partition_value(2018, "int"), "2018")
+        self.assertEqual(format_partition_value(None), HIVE_DEFAULT_PARTITION)
+        self.assertEqual(format_partition_value(float("nan"), "double"), HIVE_DEFAULT_PARTITION)
+
+    def test_escaping(self) :
+        value = "a/b=c: 50% #1\x01"
+        escaped = escape_partition_value(value)
+        self.assertEqual(escaped, "a%2Fb%3Dc%3A 50%25 %231%01")
+        self.assertEqual(unescape_partition_value(escaped), value)
+        self.assertEqual(unescape_partition_value("100%"), "100%")
+        self.assertEqual(unescape_partition_value("%zz%4"), "%zz%4")
+        self.assertEqual(partition_path(["day", "region"], {"day": "2018-01-31 09:30:00", "region": "north"}), "day=2018-01-31 09%3A30%3A00/region=north/")
@@ -10,6 +10,8 @@ import pandas as pd
 import os
 import json
 import random
+import gzip
+import tempfile
 
 def read_json_from_path(path):
     with open(path) as f:
@@ -221,3 +223,52 @@ class ConformanceTest(unittest.TestCase) :
 
 
 
+
+try:
+    import pyarrow
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+@unittest.skipUnless(HAVE_ARROW, "pyarrow is needed for engine='pyarrow'")
+class PyarrowEngineTest(unittest.TestCase) :
+    """
+    Test the pyarrow engine gives the same dataframes as the default engine
+    """
+    def assert_same_as_default_engine(self, path, table_metadata, **kwargs) :
+        actual = pd_read_csv_using_metadata(path, table_metadata, engine="pyarrow", block_size=256, **kwargs)
+        # pyarrow rounds floats correctly, the default engine's fast float parser can be a bit out in the last place
+        pd.testing.assert_frame_equal(actual, pd_read_csv_using_metadata(path, table_metadata, **kwargs), check_exact=False, rtol=1e-15)
+        pd.testing.assert_frame_equal(actual, pd_read_csv_using_metadata(path, table_metadata, float_precision="round_trip", **kwargs), check_exact=True)
+
+    def test_default_na_values_match_pandas(self) :
+        import io
+        csv_text = "a\n" + "\n".join('"{}"'.format(v) for v in DEFAULT_NA_VALUES) + "\nx\n"
+        df = pd.read_csv(io.StringIO(csv_text), dtype=str, skip_blank_lines=False)
+        self.assertEqual(df["a"].isnull().sum(), len(DEFAULT_NA_VALUES))
+
+    def test_same_as_default_engine(self) :
+        table_metadata = read_json_from_path(td_path("test_table_metadata_valid.json"))
+        self.assert_same_as_default_engine(td_path("test_csv_data_valid.csv"), table_metadata)
+        self.assert_same_as_default_engine(td_path("test_csv_data_mixedtype_col.csv"), read_json_from_path(td_path("test_table_metadata_mixedtype_col.json")))
+
+        rows = ["{},{},\"text, {}\",2018-01-{:02d},2018-01-01 10:{:02d}:00.5,{},{},{}".format(
+                    i, i / 8, i if i % 7 else "", i % 28 + 1, i % 60, "true" if i % 2 else "False", "" if i % 5 == 0 else i / 3, i * 10**12)
+                for i in range(5000)]
+        with tempfile.TemporaryDirectory() as td :
+            path = os.path.join(td, "big.csv")
+            with open(path, "w") as f :
+                f.write("myint,myfloat,mychar,mydate,mydatetime,myboolean,mydouble,mylong\n" + "\n".join(rows) + "\n")
+            self.assert_same_as_default_engine(path, table_metadata)
+            self.assert_same_as_default_engine(path, table_metadata, header=0, names=[c["name"] for c in table_metadata["columns"]])
+
+            with gzip.open(path + ".gz", "wt") as f :
+                f.write(open(path).read())
+            self.assert_same_as_default_engine(path + ".gz", table_metadata)
+
+            with open(path, "a") as f :
+                f.write(",1.0,a,2018-01-01,2018-01-01,true,1.0,1\n")
+            with self.assertRaises(ValueError) :
+                pd_read_csv_using_metadata(path, table_metadata, engine="pyarrow")
+            with self.assertRaises(ValueError) :
+                pd_read_csv_using_metadata(path, table_metadata, engine="pyarrow", skipfooter=1)
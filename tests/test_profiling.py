@@ -0,0 +1,93 @@
+import unittest
+import io
+import pandas as pd
+from dataengineeringutils.profiling import HyperLogLog, TableProfiler, profile_csv_using_metadata, profile_parquet, add_statistics_to_metadata
+from dataengineeringutils.glue import metadata_to_glue_table_definition
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+TABLE_METADATA = {
+    "table_name": "people",
+    "table_desc": "",
+    "data_format": "csv",
+    "location": "people/",
+    "columns": [
+        {"name": "id", "type": "long", "description": ""},
+        {"name": "name", "type": "character", "description": ""},
+        {"name": "score", "type": "double", "description": ""},
+        {"name": "joined", "type": "date", "description": ""}
+    ]
+}
+
+def people_csv(n) :
+    lines = ["id,name,score,joined"]
+    for i in range(n) :
+        score = "" if i % 10 == 0 else str(i / 4)
+        lines.append("{},name {},{},2018-{:02d}-01".format(i, i % 50, score, i % 12 + 1))
+    return "\n".join(lines) + "\n"
+
+class ProfilingTest(unittest.TestCase) :
+    """
+    Test streaming column statistics
+    """
+    def test_hyperloglog(self) :
+        sketch = HyperLogLog()
+        self.assertEqual(sketch.estimate(), 0)
+        for start in range(0, 100000, 10000) :
+            sketch.add(pd.Series(range(start, start + 10000)))
+        sketch.add(pd.Series(range(5000)))
+        self.assertAlmostEqual(sketch.estimate() / 100000, 1, delta=0.05)
+
+        small = HyperLogLog()
+        small.add(pd.Series(["a", "b", "c", "a"]))
+        self.assertEqual(round(small.estimate()), 3)
+        sketch.merge(small)
+        self.assertAlmostEqual(sketch.estimate() / 100003, 1, delta=0.05)
+        with self.assertRaises(ValueError) :
+            sketch.merge(HyperLogLog(10))
+
+    def test_profile_csv_in_chunks(self) :
+        statistics = profile_csv_using_metadata(io.StringIO(people_csv(1000)), TABLE_METADATA, chunksize=64)
+        self.assertEqual(statistics["row_count"], 1000)
+        columns = statistics["columns"]
+        self.assertEqual(columns["id"], {"null_count": 0, "min": 0, "max": 999, "distinct_count": 1000})
+        self.assertEqual(columns["name"], {"null_count": 0, "min": "name 0", "max": "name 9", "distinct_count": 50})
+        self.assertEqual(columns["score"]["null_count"], 100)
+        self.assertEqual((columns["score"]["min"], columns["score"]["max"]), (0.25, 249.75))
+        self.assertEqual(columns["joined"], {"null_count": 0, "min": "2018-01-01", "max": "2018-12-01", "distinct_count": 12})
+
+    def test_statistics_in_metadata_and_glue(self) :
+        profiler = TableProfiler(TABLE_METADATA)
+        chunks = [pd.DataFrame({"id": [1, 2], "name": ["a", None]}), pd.DataFrame({"id": [3], "name": ["b" * 300]})]
+        self.assertEqual(len(list(profiler.profile_chunks(chunks))), 2)
+        metadata = add_statistics_to_metadata(TABLE_METADATA, profiler.statistics())
+        self.assertNotIn("statistics", TABLE_METADATA["columns"][0])
+        self.assertEqual(metadata["statistics"], {"row_count": 3})
+        self.assertEqual(metadata["columns"][1]["statistics"], {"null_count": 1, "min": "a", "max": None, "distinct_count": 2})
+
+        definition = metadata_to_glue_table_definition(metadata, {"location": "s3://bucket/db/"})
+        self.assertEqual(definition["Parameters"]["recordCount"], "3")
+        glue_columns = dict((c["Name"], c) for c in definition["StorageDescriptor"]["Columns"])
+        self.assertEqual(glue_columns["id"]["Parameters"], {"null_count": "0", "min": "1", "max": "3", "distinct_count": "3"})
+        self.assertEqual(glue_columns["name"]["Parameters"], {"null_count": "1", "min": "a", "distinct_count": "2"})
+        self.assertEqual(glue_columns["joined"]["Parameters"], {"null_count": "3", "distinct_count": "0"})
+
+    @unittest.skipUnless(HAVE_ARROW, "pyarrow is needed to read parquet")
+    def test_profile_parquet_from_s3(self) :
+        df = pd.read_csv(io.StringIO(people_csv(300)), parse_dates=["joined"])
+        f = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f, row_group_size=50)
+        with use_backend(FakeBackend()) :
+            get_client('s3').put_object(Bucket="bucket", Key="people.parquet", Body=f.getvalue())
+            statistics = profile_parquet("s3://bucket/people.parquet", TABLE_METADATA, batch_size=40)
+        self.assertEqual(statistics["row_count"], 300)
+        self.assertEqual(statistics["columns"]["score"]["null_count"], 30)
+        self.assertEqual(statistics["columns"]["joined"]["max"], "2018-12-01")
+        self.assertEqual(statistics["columns"]["id"]["distinct_count"], 300)
@@ -0,0 +1,68 @@
+import unittest
+import time
+from botocore.exceptions import ClientError
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.rate_limit import TokenBucket, RateLimiter, glue_rate_limiter, set_glue_budgets, GLUE_BUDGETS
+from dataengineeringutils.glue import create_table_in_glue_from_def, overwrite_or_create_database, delete_job, get_table_definition_template
+
+class RateLimitTest(unittest.TestCase) :
+    """
+    Test the client side rate limiter and retries
+    """
+    def setUp(self) :
+        glue_rate_limiter.reset_stats()
+
+    def tearDown(self) :
+        set_glue_budgets(GLUE_BUDGETS)
+
+    def test_token_bucket(self) :
+        bucket = TokenBucket(50, burst=5)
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(15)]
+        self.assertGreater(time.monotonic() - start, 0.15)
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertGreater(sum(waits), 0.15)
+        with self.assertRaises(ValueError) :
+            TokenBucket(0)
+
+    def test_glue_calls_stay_under_budget(self) :
+        set_glue_budgets({'catalog_write': (25, 5)})
+        with use_backend(FakeBackend(max_calls_per_second={'glue': 30})) as fake :
+            overwrite_or_create_database("db")
+            table = get_table_definition_template("csv", Name="t")
+            for _ in range(15) :
+                create_table_in_glue_from_def("db", "t", table)
+            self.assertEqual(sum(fake.error_counts.values()), 0)
+            self.assertEqual(fake.call_counts["glue.create_table"], 15)
+        stats = glue_rate_limiter.stats()["catalog_write"]
+        self.assertEqual(stats["requests"], 32)
+        self.assertGreater(stats["wait_seconds"], 0.5)
+
+    def test_throttles_are_retried_and_other_errors_propagate(self) :
+        with use_backend(FakeBackend()) as fake :
+            overwrite_or_create_database("db")
+            fake.fail_next("glue.create_table", 2)
+            create_table_in_glue_from_def("db", "t", get_table_definition_template("csv", Name="t"))
+            stats = glue_rate_limiter.stats()["catalog_write"]
+            self.assertEqual((stats["retries"], stats["throttles"]), (2, 2))
+
+            fake.fail_next("glue.create_table", 1, error_code="AccessDeniedException")
+            with self.assertRaises(ClientError) :
+                create_table_in_glue_from_def("db", "t", get_table_definition_template("csv", Name="t"))
+            self.assertEqual(glue_rate_limiter.stats()["catalog_write"]["retries"], 2)
+
+            # Missing entities are still fine, but other errors are no longer swallowed
+            self.assertEqual(delete_job("not_a_job"), {"JobName": "not_a_job"})
+            fake.fail_next("glue.delete_database", 1, error_code="AccessDeniedException")
+            with self.assertRaises(ClientError) :
+                overwrite_or_create_database("db")
+
+    def test_gives_up_after_max_attempts(self) :
+        limiter = RateLimiter('glue', {'other': (1000, 1000)}, max_attempts=3, base_delay=0.001)
+        with use_backend(FakeBackend()) as fake :
+            fake.fail_next("glue.get_databases", 5)
+            with self.assertRaises(ClientError) :
+                limiter.wrap(get_client('glue')).get_databases()
+            self.assertEqual(fake.call_counts["glue.get_databases"], 3)
+        self.assertEqual(limiter.stats()["other"]["retries"], 2)
@@ -0,0 +1,146 @@
+import unittest
+import types
+import pandas as pd
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.readers import list_table_files, pd_read_table_using_metadata
+from dataengineeringutils.writers import pd_write_csv_using_metadata, pd_write_parquet_using_metadata
+
+try:
+    import pyarrow
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+TABLE_METADATA = {
+    "table_name": "sales",
+    "data_format": "csv",
+    "location": "s3://bucket/db/sales/",
+    "columns": [
+        {"name": "id", "type": "long", "description": ""},
+        {"name": "amount", "type": "double", "description": ""},
+        {"name": "label", "type": "character", "description": ""},
+        {"name": "sale_date", "type": "date", "description": ""},
+        {"name": "year", "type": "int", "description": ""},
+        {"name": "region", "type": "character", "description": ""}
+    ],
+    "glue_specific": {"PartitionKeys": [{"Name": "year", "Type": "int"}, {"Name": "region", "Type": "string"}]}
+}
+
+def sales_df(n) :
+    return pd.DataFrame({
+        "id": range(n),
+        "amount": [i / 2 for i in range(n)],
+        "label": ["label {}".format(i) for i in range(n)],
+        "sale_date": pd.to_datetime(["2018-01-{:02d}".format(i % 28 + 1) for i in range(n)]),
+        "year": [2017 + i % 2 for i in range(n)],
+        "region": ["north" if i % 3 else "south" for i in range(n)]
+    })
+
+class TableReaderTest(unittest.TestCase) :
+    """
+    Test reading every file of a table in parallel
+    """
+    def check_round_trip(self, metadata, write) :
+        df = sales_df(60)
+        with use_backend(FakeBackend()) :
+            write(df.iloc[:30], metadata)
+            write(df.iloc[30:], metadata)
+            s3_client = get_client('s3')
+            s3_client.put_object(Bucket="bucket", Key="db/sales/_SUCCESS", Body=b"")
+            s3_client.put_object(Bucket="bucket", Key="db/sales/year=2017/region=north/.hidden", Body=b"x")
+
+            files = list_table_files(metadata)
+            self.assertEqual(len(files), 8)
+            self.assertEqual(files[0]["partition"], {"year": "2017", "region": "north"})
+
+            result = pd_read_table_using_metadata(metadata, max_workers=3).sort_values("id").reset_index(drop=True)
+            self.assertEqual(list(result.columns), list(df.columns))
+            pd.testing.assert_frame_equal(result, df, check_dtype=False)
+            self.assertEqual(str(result["sale_date"].dtype), "datetime64[ns]")
+            self.assertEqual(str(result["year"].dtype), "int64")
+
+            north_2018 = pd_read_table_using_metadata(metadata, partition_filters={"year": 2018, "region": ["north"]})
+            expected = df[(df.year == 2018) & (df.region == "north")]
+            self.assertEqual(sorted(north_2018["id"]), list(expected["id"]))
+
+            south = pd_read_table_using_metadata(metadata, partition_filters={"region": "south"})
+            self.assertEqual(sorted(south["id"]), list(df[df.region == "south"]["id"]))
+
+    def test_csv_round_trip(self) :
+        self.check_round_trip(TABLE_METADATA, pd_write_csv_using_metadata)
+
+    @unittest.skipUnless(HAVE_ARROW, "pyarrow is needed to read parquet")
+    def test_parquet_round_trip(self) :
+        self.check_round_trip(dict(TABLE_METADATA, data_format="parquet"), pd_write_parquet_using_metadata)
+
+    def test_streams_over_max_bytes(self) :
+        df = sales_df(60)
+        with use_backend(FakeBackend()) as fake :
+            pd_write_csv_using_metadata(df, TABLE_METADATA)
+            listed = fake.call_counts["s3.list_objects_v2"]
+            pd_read_table_using_metadata(TABLE_METADATA, partition_filters={"year": [2017]}, max_bytes=10**9)
+            # Filtering on the first partition key lists just that folder
+            self.assertEqual(fake.call_counts["s3.list_objects_v2"], listed + 1)
+
+            frames = pd_read_table_using_metadata(TABLE_METADATA, max_bytes=100, max_workers=2)
+            self.assertIsInstance(frames, types.GeneratorType)
+            frames = list(frames)
+            self.assertEqual(len(frames), 4)
+            self.assertEqual(sum(len(f) for f in frames), 60)
+
+            empty = pd_read_table_using_metadata(TABLE_METADATA, partition_filters={"year": 1999})
+            self.assertEqual((len(empty), list(empty.columns)), (0, list(df.columns)))
+            with self.assertRaises(ValueError) :
+                pd_read_table_using_metadata(TABLE_METADATA, partition_filters={"label": "x"})
+
+    def test_escaped_partition_values_round_trip(self) :
+        metadata = {
+            "table_name": "events",
+            "data_format": "csv",
+            "location": "s3://bucket/db/events/",
+            "columns": [
+                {"name": "id", "type": "long", "description": ""},
+                {"name": "at", "type": "datetime", "description": ""},
+                {"name": "source", "type": "character", "description": ""}
+            ],
+            "glue_specific": {"PartitionKeys": [{"Name": "at", "Type": "timestamp"}, {"Name": "source", "Type": "string"}]}
+        }
+        df = pd.DataFrame({
+            "id": [1, 2, 3],
+            "at": pd.to_datetime(["2018-01-01 09:30:00", "2018-01-01 09:30:00", "2018-01-02 00:00:00"]),
+            "source": ["a/b=c", "100%", "a/b=c"]
+        })
+        with use_backend(FakeBackend()) :
+            written = pd_write_csv_using_metadata(df, metadata)
+            self.assertEqual(sorted(w["path"].rsplit("/", 1)[0] for w in written), [
+                "s3://bucket/db/events/at=2018-01-01 09%3A30%3A00/source=100%25",
+                "s3://bucket/db/events/at=2018-01-01 09%3A30%3A00/source=a%2Fb%3Dc",
+                "s3://bucket/db/events/at=2018-01-02 00%3A00%3A00/source=a%2Fb%3Dc"])
+            self.assertEqual(sorted(f["partition"]["source"] for f in list_table_files(metadata)), ["100%", "a/b=c", "a/b=c"])
+
+            result = pd_read_table_using_metadata(metadata).sort_values("id").reset_index(drop=True)
+            pd.testing.assert_frame_equal(result, df, check_dtype=False)
+            filtered = pd_read_table_using_metadata(metadata, partition_filters={"at": pd.Timestamp("2018-01-01 09:30:00"), "source": "a/b=c"})
+            self.assertEqual(list(filtered["id"]), [1])
+
+    @unittest.skipUnless(HAVE_ARROW, "pyarrow is needed to read parquet")
+    def test_csv_and_parquet_read_the_same(self) :
+        df = sales_df(12)
+        df.loc[[1, 5], "label"] = None
+        parquet_metadata = dict(TABLE_METADATA, data_format="parquet", location="s3://bucket/db/sales_parquet/")
+        with use_backend(FakeBackend()) :
+            pd_write_csv_using_metadata(df, TABLE_METADATA)
+            pd_write_parquet_using_metadata(df, parquet_metadata)
+
+            from_csv = pd_read_table_using_metadata(TABLE_METADATA).sort_values("id").reset_index(drop=True)
+            from_parquet = pd_read_table_using_metadata(parquet_metadata).sort_values("id").reset_index(drop=True)
+            pd.testing.assert_frame_equal(from_csv, from_parquet)
+            # Missing strings are NaN from both formats, not None from parquet
+            missing = [v for v in from_parquet["label"] if not isinstance(v, str)]
+            self.assertEqual((len(missing), any(v is None for v in missing)), (2, False))
+
+            empty_csv = pd_read_table_using_metadata(TABLE_METADATA, partition_filters={"year": 1999})
+            empty_parquet = pd_read_table_using_metadata(parquet_metadata, partition_filters={"year": 1999})
+            pd.testing.assert_frame_equal(empty_csv, empty_parquet)
+            pd.testing.assert_frame_equal(empty_csv, from_csv.iloc[:0])
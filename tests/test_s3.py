@@ -0,0 +1,95 @@
+import unittest
+import hashlib
+from botocore.exceptions import ClientError
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.s3 import copy_folder, move_folder, get_file_list_from_bucket
+
+MB = 1024 ** 2
+
+def put_objects(s3_client, prefix, sizes) :
+    for i, size in enumerate(sizes) :
+        s3_client.put_object(Bucket="bucket", Key="{}part-{}.csv".format(prefix, i), Body=bytes([i % 256]) * size)
+
+def read(s3_client, key) :
+    return s3_client.get_object(Bucket="bucket", Key=key)["Body"].read()
+
+class CopyFolderTest(unittest.TestCase) :
+    """
+    Test server side copies and moves of s3 folders
+    """
+    def test_copy_and_move(self) :
+        with use_backend(FakeBackend()) as fake :
+            s3_client = get_client('s3')
+            put_objects(s3_client, "staging/table/", [10, 20, 30])
+            s3_client.put_object(Bucket="bucket", Key="staging/table/year=2018/part-0.csv", Body=b"nested")
+
+            self.assertEqual(copy_folder("s3://bucket/staging/table/", "s3://bucket/db/table/", dry_run=True)["objects"], 4)
+            self.assertEqual(fake.call_counts["s3.copy_object"], 0)
+
+            summary = copy_folder("s3://bucket/staging/table/", "s3://bucket/db/table/", max_workers=2)
+            self.assertEqual((summary["objects"], summary["bytes"], summary["multipart"]), (4, 66, 0))
+            self.assertEqual(fake.call_counts["s3.copy_object"], 4)
+            self.assertEqual(read(s3_client, "db/table/year=2018/part-0.csv"), b"nested")
+            self.assertEqual(len(get_file_list_from_bucket("bucket", "staging/table/")), 4)
+
+            move_folder("s3://bucket/db/table/", "s3://other/db/table/")
+            self.assertNotIn("Contents", s3_client.list_objects_v2(Bucket="bucket", Prefix="db/table/"))
+            self.assertEqual(s3_client.get_object(Bucket="other", Key="db/table/part-2.csv")["Body"].read(), bytes([2]) * 30)
+
+    def test_large_objects_are_copied_in_parts(self) :
+        with use_backend(FakeBackend()) as fake :
+            s3_client = get_client('s3')
+            put_objects(s3_client, "staging/", [12 * MB, 1 * MB])
+            s3_client.put_object(Bucket="bucket", Key="staging/part-0.csv", Body=bytes([0]) * 12 * MB, ContentType="text/csv",
+                                 Metadata={"source": "etl"}, ServerSideEncryption="aws:kms", SSEKMSKeyId="key-1")
+            summary = move_folder("s3://bucket/staging/", "s3://bucket/final/", multipart_threshold=10 * MB, part_size=5 * MB, part_workers=2)
+            self.assertEqual(summary["multipart"], 1)
+            self.assertEqual(fake.call_counts["s3.upload_part_copy"], 3)
+            self.assertEqual(fake.call_counts["s3.copy_object"], 1)
+            head = s3_client.head_object(Bucket="bucket", Key="final/part-0.csv")
+            self.assertTrue(head["ETag"].endswith('-3"'))
+            self.assertEqual((head["ContentType"], head["Metadata"], head["ServerSideEncryption"], head["SSEKMSKeyId"]),
+                             ("text/csv", {"source": "etl"}, "aws:kms", "key-1"))
+            self.assertEqual(read(s3_client, "final/part-0.csv"), bytes([0]) * 12 * MB)
+            self.assertEqual(read(s3_client, "final/part-0.csv"), bytes([0]) * 12 * MB)
+
+            # A multipart source copied in one request gets a new (md5) ETag, which is accepted
+            copy_folder("s3://bucket/final/", "s3://bucket/again/")
+            self.assertEqual(read(s3_client, "again/part-0.csv"), bytes([0]) * 12 * MB)
+
+    def test_kms_objects_are_checked_by_size(self) :
+        with use_backend(FakeBackend()) as fake :
+            s3_client = get_client('s3')
+            s3_client.put_object(Bucket="bucket", Key="staging/part-0.csv", Body=b"kms", ServerSideEncryption="aws:kms", SSEKMSKeyId="key-1")
+            s3_client.put_object(Bucket="bucket", Key="staging/part-1.csv", Body=b"plain")
+            listed = s3_client.list_objects_v2(Bucket="bucket", Prefix="staging/")["Contents"]
+            self.assertNotEqual(listed[0]["ETag"], '"{}"'.format(hashlib.md5(b"kms").hexdigest()))
+
+            move_folder("s3://bucket/staging/", "s3://bucket/final/")
+            self.assertEqual(read(s3_client, "final/part-0.csv"), b"kms")
+            self.assertNotIn("Contents", s3_client.list_objects_v2(Bucket="bucket", Prefix="staging/"))
+            # Only the KMS object's source was looked at, after its ETags didn't match
+            self.assertEqual(fake.call_counts["s3.head_object"], 3)
+
+    def test_failures_leave_the_source(self) :
+        with use_backend(FakeBackend()) as fake :
+            s3_client = get_client('s3')
+            put_objects(s3_client, "staging/", [6 * MB, 10, 10])
+            fake.fail_next("s3.copy_object", 1, error_code="AccessDenied")
+            with self.assertRaises(ClientError) :
+                move_folder("s3://bucket/staging/", "s3://bucket/final/", multipart_threshold=5 * MB, part_size=5 * MB)
+            self.assertEqual(len(get_file_list_from_bucket("bucket", "staging/")), 3)
+
+            fake.fail_next("s3.upload_part_copy", 1, error_code="AccessDenied")
+            with self.assertRaises(ClientError) :
+                move_folder("s3://bucket/staging/", "s3://bucket/final/", multipart_threshold=5 * MB, part_size=5 * MB)
+            self.assertEqual(fake.multipart_uploads, {})
+            self.assertEqual(len(get_file_list_from_bucket("bucket", "staging/")), 3)
+
+            for source, destination in [("s3://bucket/staging", "s3://bucket/final/"), ("s3://bucket/staging/", "s3://bucket/staging/final/"),
+                                        ("s3://bucket/staging/", "s3://bucket/")] :
+                with self.assertRaises(ValueError) :
+                    move_folder(source, destination)
+            with self.assertRaises(ValueError) :
+                copy_folder("s3://bucket/staging/", "s3://bucket/final/", part_size=MB)
@@ -0,0 +1,62 @@
+import unittest
+import os
+import json
+import tempfile
+import pandas as pd
+from dataengineeringutils.schema_inference import infer_csv_metadata, infer_column_type, sample_csv
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.glue import metadata_to_glue_table_definition
+from dataengineeringutils.meta import Meta
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def big_csv_lines(n) :
+    lines = ["id,amount,flag,day,ts,label"]
+    for i in range(n) :
+        lines.append("{},{}.5,{},2018-01-{:02d},2018-01-01T{:02d}:00:00,row {}".format(i, i, "true" if i % 2 else "false", i % 28 + 1, i % 24, i))
+    return "\n".join(lines) + "\n"
+
+class SchemaInferenceTest(unittest.TestCase) :
+    """
+    Test inferring table metadata from samples of csvs
+    """
+    def test_infer_valid_csv(self) :
+        metadata = infer_csv_metadata(os.path.join(THIS_DIR, "test_data", "test_csv_data_valid.csv"), table_name="temp")
+        types = dict((c["name"], c["type"]) for c in metadata["columns"])
+        self.assertEqual(types, {
+            "myint": "int", "myfloat": "double", "mychar": "character", "mydate": "date",
+            "mydatetime": "datetime", "myboolean": "boolean", "mydouble": "double", "mylong": "long"
+        })
+        table_def = metadata_to_glue_table_definition(metadata, {"location": "s3://bucket/db/"})
+        self.assertEqual(table_def["StorageDescriptor"]["Location"], "s3://bucket/db/temp/")
+        self.assertEqual(table_def["StorageDescriptor"]["Columns"][7], {"Name": "mylong", "Type": "bigint", "Comment": ""})
+
+        with tempfile.TemporaryDirectory() as td :
+            path = os.path.join(td, "temp.json")
+            with open(path, "w") as f :
+                json.dump(metadata, f)
+            self.assertEqual(Meta(path).get_column("mydate")["type"], "date")
+
+    def test_column_detectors(self) :
+        self.assertEqual(infer_column_type(pd.Series(["1", None, "-3"])), "int")
+        self.assertEqual(infer_column_type(pd.Series(["1", "3000000000"])), "long")
+        self.assertEqual(infer_column_type(pd.Series(["1", "1e3", ".5"]), float_type="float"), "float")
+        self.assertEqual(infer_column_type(pd.Series(["TRUE", "false"])), "boolean")
+        self.assertEqual(infer_column_type(pd.Series(["2018-02-30"])), "character")
+        self.assertEqual(infer_column_type(pd.Series(["2018-02-03 10:00"])), "datetime")
+        self.assertEqual(infer_column_type(pd.Series([None, None], dtype=object)), "character")
+
+    def test_samples_large_s3_file(self) :
+        body = big_csv_lines(20000).encode("utf-8")
+        with use_backend(FakeBackend()) as fake :
+            get_client('s3').put_object(Bucket="bucket", Key="raw/My Table.csv", Body=body)
+            df = sample_csv("s3://bucket/raw/My Table.csv", sample_bytes=4096, n_samples=5, seed=1)
+            metadata = infer_csv_metadata("s3://bucket/raw/My Table.csv", sample_bytes=4096, n_samples=5, seed=1)
+            self.assertEqual(fake.call_counts["s3.get_object"], 12)
+
+        self.assertLess(len(df), 20000)
+        self.assertEqual(list(df.columns), ["id", "amount", "flag", "day", "ts", "label"])
+        self.assertTrue(df["id"].notna().all())
+        self.assertEqual(metadata["table_name"], "my_table")
+        self.assertEqual([c["type"] for c in metadata["columns"]], ["int", "double", "boolean", "date", "datetime", "character"])
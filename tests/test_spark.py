@@ -0,0 +1,132 @@
+import unittest
+import os
+import tempfile
+import re
+import shutil
+import datetime
+import pandas as pd
+from dataengineeringutils.backend import use_backend
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.writers import pd_write_csv_using_metadata
+
+from dataengineeringutils.spark import _partition_path_glob, spark_read_table_using_metadata, impose_exact_conformance_on_spark_df, check_spark_df_exactly_conforms_to_metadata, impose_metadata_column_order_on_spark_df
+
+try:
+    import pyspark
+    from pyspark.sql import SparkSession
+    HAVE_SPARK = shutil.which("java") is not None
+except ImportError:
+    HAVE_SPARK = False
+
+THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def hadoop_glob_to_regex(glob) :
+    """
+    Translate the parts of hadoop's glob syntax _partition_path_glob uses (*, {a,b} and \\ escapes) to a regex
+    """
+    regex, i, in_braces = "", 0, False
+    while i < len(glob) :
+        c = glob[i]
+        if c == "\\" :
+            regex += re.escape(glob[i + 1])
+            i += 1
+        elif c == "*" :
+            regex += "[^/]*"
+        elif c == "{" :
+            regex, in_braces = regex + "(?:", True
+        elif c == "}" and in_braces :
+            regex, in_braces = regex + ")", False
+        elif c == "," and in_braces :
+            regex += "|"
+        else :
+            regex += re.escape(c)
+        i += 1
+    return regex
+
+class SparkPathTest(unittest.TestCase) :
+    """
+    Test the paths spark reads from, no spark session needed
+    """
+    def test_partition_path_glob(self) :
+        self.assertEqual(_partition_path_glob("s3://b/t", ["year", "month"], {"month": [1, 2]}), "s3://b/t/year=*/month={1,2}/")
+        self.assertEqual(_partition_path_glob("s3://b/t/", ["year", "month"], {"year": 2018}), "s3://b/t/year=2018/month=*/")
+        with self.assertRaises(ValueError):
+            _partition_path_glob("s3://b/t/", ["year"], {"month": 1})
+
+    def test_partition_path_glob_matches_written_folders(self) :
+        metadata = {
+            "table_name": "events",
+            "data_format": "csv",
+            "location": "s3://bucket/events/",
+            "columns": [
+                {"name": "id", "type": "int", "description": ""},
+                {"name": "flag", "type": "boolean", "description": ""},
+                {"name": "ts", "type": "datetime", "description": ""},
+                {"name": "source", "type": "character", "description": ""}
+            ],
+            "glue_specific": {"PartitionKeys": [{"Name": "flag", "Type": "boolean"}, {"Name": "ts", "Type": "timestamp"}, {"Name": "source", "Type": "string"}]}
+        }
+        df = pd.DataFrame({
+            "id": [1, 2, 3, 4],
+            "flag": [True, True, False, True],
+            "ts": [datetime.datetime(2018, 1, 1, 9, 30)] * 3 + [datetime.datetime(2018, 1, 2)],
+            "source": ["a,b}", "web", "a,b}", "web"]
+        })
+        with use_backend(FakeBackend()) as fake :
+            pd_write_csv_using_metadata(df, metadata)
+            files = dict((k, obj.body.decode("utf-8")) for k, obj in fake.buckets["bucket"].items())
+
+        def matching_ids(partition_filters) :
+            glob = _partition_path_glob("s3://bucket/events/", ["flag", "ts", "source"], partition_filters, {c["name"]: c["type"] for c in metadata["columns"]})
+            pattern = re.compile(hadoop_glob_to_regex(glob[len("s3://bucket/"):]) + "[^/]+$")
+            # Each file holds the id of its rows (partition columns are folders)
+            return sorted(int(line) for k, body in files.items() if pattern.match(k) for line in body.split())
+
+        self.assertEqual(matching_ids({"flag": True, "ts": datetime.datetime(2018, 1, 1, 9, 30)}), [1, 2])
+        self.assertEqual(matching_ids({"source": ["a,b}"]}), [1, 3])
+        self.assertEqual(matching_ids({"flag": [False], "source": ["a,b}", "web"]}), [3])
+
+@unittest.skipUnless(HAVE_SPARK, "pyspark and java are needed to run spark in local mode")
+class SparkTest(unittest.TestCase) :
+    """
+    Test the spark helpers with a local mode spark session
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("dataengineeringutils_tests").getOrCreate()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def test_read_with_partition_filters(self) :
+        with tempfile.TemporaryDirectory() as td:
+            for year in (2017, 2018, 2019):
+                os.makedirs(os.path.join(td, "year={}".format(year)))
+                with open(os.path.join(td, "year={}".format(year), "part-0.csv"), "w") as f:
+                    f.write("1,1.5,a\n2,2.5,b\n")
+
+            df = spark_read_table_using_metadata(self.spark, TABLE_METADATA, location=td, partition_filters={"year": [2018, 2019]})
+            check_spark_df_exactly_conforms_to_metadata(df, TABLE_METADATA)
+            self.assertEqual(sorted(r.year for r in df.collect()), [2018, 2018, 2019, 2019])
+
+            df = spark_read_table_using_metadata(self.spark, TABLE_METADATA, location=td)
+            self.assertEqual(df.count(), 6)
+
+    def test_impose_exact_conformance_on_spark_df(self) :
+        df = self.spark.createDataFrame([("1", "2.5", "a", "x", 2018)], ["id", "value", "label", "extra", "year"])
+        df = df.select("extra", "year", "label", "value", "id")
+        df = impose_exact_conformance_on_spark_df(df, TABLE_METADATA)
+        check_spark_df_exactly_conforms_to_metadata(df, TABLE_METADATA)
+        self.assertEqual(df.collect()[0].value, 2.5)
+
+        df = self.spark.createDataFrame([(1, "a")], ["id", "label"])
+        with self.assertRaises(ValueError):
+            impose_metadata_column_order_on_spark_df(df, TABLE_METADATA)
+        df = impose_metadata_column_order_on_spark_df(df, TABLE_METADATA, create_cols_if_not_exist=True)
+        self.assertEqual(df.columns, ["id", "value", "label", "year"])
+
+    def test_clean_and_normalise_spark_df_column_names(self) :
+        from dataengineeringutils.colnames import clean_and_normalise_spark_df_column_names
+        df = self.spark.createDataFrame([(1, 2, 3)], ["Col A", "col_a", "B"])
+        self.assertEqual(clean_and_normalise_spark_df_column_names(df).columns, ["col_a", "col_a_2", "b"])
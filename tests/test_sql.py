@@ -0,0 +1,54 @@
+import unittest
+from dataengineeringutils.sql import metadata_to_sql_select, partition_filters_to_sql_where, col_names_to_sql_select
+
+TABLE_METADATA = {
+    "table_name": "sales",
+    "data_format": "parquet",
+    "location": "sales/",
+    "columns": [
+        {"name": "id", "type": "long", "description": ""},
+        {"name": "amount", "type": "double", "description": ""},
+        {"name": "label", "type": "character", "description": ""},
+        {"name": "sale_date", "type": "date", "description": ""},
+        {"name": "year", "type": "int", "description": ""},
+        {"name": "region", "type": "character", "description": ""}
+    ],
+    "glue_specific": {"PartitionKeys": [{"Name": "year", "Type": "int"}, {"Name": "region", "Type": "string"}]}
+}
+
+class SqlTest(unittest.TestCase) :
+    """
+    Test building Athena queries from metadata
+    """
+    def test_select_with_projection_and_partition_pruning(self) :
+        sql = metadata_to_sql_select(TABLE_METADATA, columns=["id", "sale_date"], database="db",
+                                     partition_filters={"year": [2017, 2018], "region": "o'neill"}, limit=10)
+        self.assertEqual(sql, "SELECT CAST(id AS bigint) AS id, CAST(sale_date AS date) AS sale_date\n"
+                              "FROM db.sales\n"
+                              "WHERE year IN (2017, 2018)\n"
+                              "AND region = 'o''neill'\n"
+                              "LIMIT 10")
+
+        sql = metadata_to_sql_select(TABLE_METADATA, columns=["label"], table_alias="s", cast=False, partition_filters={"year": "2018"}, where="s.amount > 0")
+        self.assertEqual(sql, "SELECT s.label\nFROM sales AS s\nWHERE s.year = 2018\nAND (s.amount > 0)")
+        self.assertEqual(col_names_to_sql_select(["a", "b"], "s", exclude=["b"]), "s.a")
+
+    def test_warns_on_full_scan(self) :
+        with self.assertLogs("dataengineeringutils.sql", level="WARNING") :
+            sql = metadata_to_sql_select(TABLE_METADATA)
+        self.assertIn("CAST(label AS varchar) AS label", sql)
+        self.assertNotIn("WHERE", sql)
+
+        with self.assertNoLogs("dataengineeringutils.sql", level="WARNING") :
+            metadata_to_sql_select(TABLE_METADATA, where="year > 2015")
+            metadata_to_sql_select({"table_name": "t", "columns": [{"name": "a", "type": "int"}]})
+
+    def test_invalid_filters(self) :
+        with self.assertRaises(ValueError) :
+            metadata_to_sql_select(TABLE_METADATA, columns=["nope"])
+        with self.assertRaises(ValueError) :
+            partition_filters_to_sql_where(TABLE_METADATA, {"label": "a"})
+        with self.assertRaises(ValueError) :
+            partition_filters_to_sql_where(TABLE_METADATA, {"year": "abc"})
+        with self.assertRaises(ValueError) :
+            partition_filters_to_sql_where(TABLE_METADATA, {"year": []})
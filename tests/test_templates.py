@@ -0,0 +1,77 @@
+import unittest
+import os
+import json
+import tempfile
+from dataengineeringutils.templates import TableTemplateRegistry, table_templates, get_glue_job_template
+from dataengineeringutils.glue import get_table_definition_template, metadata_to_glue_table_definition
+from dataengineeringutils.utils import dict_merge
+
+SPECS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dataengineeringutils", "specs")
+
+def naive_template(specific_file):
+    with open(os.path.join(SPECS_DIR, "base.json")) as f:
+        base = json.load(f)
+    with open(os.path.join(SPECS_DIR, specific_file)) as f:
+        dict_merge(base, json.load(f))
+    return base
+
+class TemplateRegistryTest(unittest.TestCase) :
+    """
+    Test the table definition template registry
+    """
+    def test_builtin_templates_match_specs(self) :
+        self.assertEqual(get_table_definition_template("csv"), naive_template("csv_specific.json"))
+        self.assertEqual(get_table_definition_template("parquet"), naive_template("par_specific.json"))
+        self.assertEqual(get_table_definition_template("csv_quoted_nodate"), naive_template("csv_quoted_nodate_specific.json"))
+        for f in ("avro", "csv", "csv_quoted_nodate", "regex", "orc", "par", "parquet"):
+            self.assertIn(f, table_templates.formats())
+
+    def test_templates_are_independent_copies(self) :
+        t = get_table_definition_template("csv", Name="a", StorageDescriptor={"Location": "s3://bucket/a/"})
+        self.assertEqual(t["Name"], "a")
+        self.assertEqual(t["StorageDescriptor"]["Location"], "s3://bucket/a/")
+        t["StorageDescriptor"]["Columns"].append({"Name": "x"})
+        t["StorageDescriptor"]["SerdeInfo"]["Parameters"]["quoteChar"] = "'"
+
+        t2 = get_table_definition_template("csv")
+        self.assertEqual(t2["Name"], "")
+        self.assertEqual(t2["StorageDescriptor"]["Columns"], [])
+        self.assertEqual(t2, naive_template("csv_specific.json"))
+
+        job = get_glue_job_template()
+        job["DefaultArguments"]["--TempDir"] = "s3://x"
+        self.assertEqual(get_glue_job_template()["DefaultArguments"]["--TempDir"], "")
+
+    def test_register_format(self) :
+        registry = TableTemplateRegistry()
+        jsonl = {"StorageDescriptor": {"SerdeInfo": {"SerializationLibrary": "org.openx.data.jsonserde.JsonSerDe"}}, "Parameters": {"classification": "json"}}
+        registry.register("json", jsonl)
+        t = registry.get("json")
+        self.assertEqual(t["StorageDescriptor"]["SerdeInfo"]["SerializationLibrary"], "org.openx.data.jsonserde.JsonSerDe")
+        self.assertEqual(t["TableType"], "EXTERNAL_TABLE")
+
+        with self.assertRaises(ValueError):
+            registry.register("json", jsonl)
+
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "custom.json")
+            with open(path, "w") as f:
+                json.dump({"Parameters": {"classification": "custom"}}, f)
+            registry.register("json", path, overwrite=True)
+        self.assertEqual(registry.get("json")["Parameters"], {"classification": "custom"})
+
+        with self.assertRaises(KeyError):
+            registry.get("not_a_format")
+        self.assertNotIn("json", table_templates.formats())
+
+    def test_metadata_to_glue_table_definition(self) :
+        tbl_metadata = {
+            "table_name": "t", "table_desc": "d", "data_format": "parquet", "location": "t/",
+            "columns": [{"name": "a", "type": "int", "description": ""}, {"name": "p", "type": "character", "description": ""}],
+            "glue_specific": {"PartitionKeys": [{"Name": "p", "Type": "string"}]}
+        }
+        table_def = metadata_to_glue_table_definition(tbl_metadata, {"location": "s3://bucket/db/"})
+        self.assertEqual(table_def["StorageDescriptor"]["Location"], "s3://bucket/db/t/")
+        self.assertEqual(table_def["StorageDescriptor"]["Columns"], [{"Name": "a", "Comment": "", "Type": "int"}])
+        self.assertEqual(table_def["PartitionKeys"], [{"Name": "p", "Type": "string"}])
+        self.assertEqual(get_table_definition_template("parquet")["PartitionKeys"], [])
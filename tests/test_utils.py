@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest import mock
+from dataengineeringutils.utils import read_json, write_json, loads_json, dumps_json, set_json_backend, get_json_backend_name, iter_json_items
+
+DATA = {
+    "table_name": "t",
+    "location": "s3://bucket/t/",
+    "columns": [{"name": "c{}".format(i), "type": "int", "description": "é {}".format(i / 3)} for i in range(50)],
+    "partitions": [],
+    "glue_specific": {"PartitionKeys": [{"Name": "c1", "Type": "int"}]}
+}
+
+class JsonTest(unittest.TestCase) :
+    """
+    Test the json backends and incremental parsing
+    """
+    def tearDown(self):
+        set_json_backend(None)
+
+    def test_backends_round_trip(self) :
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "t.json")
+            for backend in ("json", "ujson", "orjson"):
+                try:
+                    set_json_backend(backend)
+                except ImportError:
+                    continue
+                self.assertEqual(get_json_backend_name(), backend)
+                write_json(DATA, path)
+                self.assertEqual(read_json(path), DATA)
+                with open(path) as f:
+                    text = f.read()
+                self.assertEqual(json.loads(text), DATA)
+                self.assertTrue(text.startswith('{\n    "table_name": "t",\n'))
+                self.assertEqual(loads_json(dumps_json(DATA, indent=None).encode("utf-8")), DATA)
+                self.assertEqual(json.loads(dumps_json(DATA, indent=2)), DATA)
+                # Every backend writes the stdlib's layout, and str()s non str keys as the stdlib does
+                self.assertEqual(dumps_json(DATA), json.dumps(DATA, indent=4, ensure_ascii=False))
+                self.assertEqual(json.loads(dumps_json({1: "a", "b": {2: []}})), {"1": "a", "b": {"2": []}})
+
+        with self.assertRaises(ValueError):
+            set_json_backend("simplejson")
+
+    def test_iter_json_items(self) :
+        with tempfile.TemporaryDirectory() as td:
+            path = os.path.join(td, "t.json")
+            write_json(DATA, path)
+            self.assertEqual(list(iter_json_items(path, "columns.item")), DATA["columns"])
+            self.assertEqual(list(iter_json_items(path, "glue_specific.PartitionKeys.item")), DATA["glue_specific"]["PartitionKeys"])
+
+            with mock.patch.dict(sys.modules, {"ijson": None}):
+                self.assertEqual(list(iter_json_items(path, "columns.item")), DATA["columns"])
+                with self.assertRaises(ValueError):
+                    list(iter_json_items(path, "columns"))
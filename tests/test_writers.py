@@ -0,0 +1,138 @@
+import unittest
+import io
+import pandas as pd
+from dataengineeringutils.backend import use_backend, get_client
+from dataengineeringutils.fake_backend import FakeBackend
+from dataengineeringutils.writers import pd_write_parquet_using_metadata, pd_write_csv_using_metadata, arrow_schema_from_metadata
+from dataengineeringutils.glue import populate_glue_catalogue_from_metadata
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+TABLE_METADATA = {
+    "table_name": "sales",
+    "data_format": "parquet",
+    "location": "sales/",
+    "columns": [
+        {"name": "id", "type": "long", "description": ""},
+        {"name": "amount", "type": "double", "description": ""},
+        {"name": "label", "type": "character", "description": ""},
+        {"name": "sale_date", "type": "date", "description": ""},
+        {"name": "created", "type": "datetime", "description": ""},
+        {"name": "year", "type": "int", "description": ""},
+        {"name": "region", "type": "character", "description": ""}
+    ],
+    "glue_specific": {"PartitionKeys": [{"Name": "year", "Type": "int"}, {"Name": "region", "Type": "string"}]}
+}
+
+def sales_df(n) :
+    return pd.DataFrame({
+        "id": range(n),
+        "amount": [i / 2 for i in range(n)],
+        "label": ["label {}".format(i) for i in range(n)],
+        "sale_date": pd.to_datetime(["2018-01-{:02d}".format(i % 28 + 1) for i in range(n)]),
+        "created": pd.to_datetime(["2018-01-01 10:00:00.123456"] * n),
+        "year": [2017 + i % 2 for i in range(n)],
+        "region": ["north" if i % 3 else "south" for i in range(n)],
+        "not_in_metadata": 1
+    })
+
+def read_parquet_from_fake_s3(path) :
+    bucket, key = path.replace("s3://", "").split("/", 1)
+    return pq.ParquetFile(io.BytesIO(get_client('s3').get_object(Bucket=bucket, Key=key)["Body"].read()))
+
+@unittest.skipUnless(HAVE_ARROW, "pyarrow is needed to write parquet")
+class ParquetWriterTest(unittest.TestCase) :
+    """
+    Test writing partitioned parquet using metadata
+    """
+    def test_write_partitioned_parquet(self) :
+        df = sales_df(120)
+        with use_backend(FakeBackend()) :
+            written = pd_write_parquet_using_metadata(df, TABLE_METADATA, database_metadata={"location": "s3://bucket/db/"},
+                                                      compression="gzip", row_group_size=10)
+            self.assertEqual(len(written), 4)
+            self.assertEqual(sum(w["rows"] for w in written), 120)
+            paths = sorted(w["path"].rsplit("/", 1)[0] for w in written)
+            self.assertEqual(paths, ["s3://bucket/db/sales/year=2017/region=north", "s3://bucket/db/sales/year=2017/region=south",
+                                     "s3://bucket/db/sales/year=2018/region=north", "s3://bucket/db/sales/year=2018/region=south"])
+            self.assertTrue(all(w["path"].endswith(".gzip.parquet") for w in written))
+
+            first = [w for w in written if w["partition"] == {"year": "2017", "region": "south"}][0]
+            f = read_parquet_from_fake_s3(first["path"])
+            self.assertEqual(f.schema_arrow, arrow_schema_from_metadata(TABLE_METADATA, exclude=["year", "region"]))
+            self.assertEqual(f.metadata.num_row_groups, 2)
+            self.assertEqual(f.metadata.row_group(0).column(0).compression, "GZIP")
+
+            table = f.read().to_pandas()
+            expected = df[(df.year == 2017) & (df.region == "south")]
+            self.assertEqual(list(table["id"]), list(expected["id"]))
+            self.assertEqual(str(table["created"][0]), "2018-01-01 10:00:00.123000")
+            self.assertEqual(table["sale_date"][0], expected["sale_date"].iloc[0].date())
+
+    def test_unpartitioned_and_errors(self) :
+        metadata = dict(TABLE_METADATA, location="s3://bucket/flat/")
+        metadata.pop("glue_specific")
+        with use_backend(FakeBackend()) :
+            written = pd_write_parquet_using_metadata(sales_df(5), metadata, compression=None)
+            self.assertEqual(len(written), 1)
+            self.assertRegex(written[0]["path"], r"^s3://bucket/flat/part-[0-9a-f]+\.parquet$")
+            self.assertEqual(read_parquet_from_fake_s3(written[0]["path"]).metadata.num_rows, 5)
+
+            with self.assertRaises(ValueError) :
+                pd_write_parquet_using_metadata(sales_df(5), TABLE_METADATA)
+            with self.assertRaises(ValueError) :
+                pd_write_parquet_using_metadata(sales_df(5).drop(columns=["label"]), metadata)
+            bad = sales_df(5)
+            bad["id"] = "not a number"
+            with self.assertRaises(ValueError) :
+                pd_write_parquet_using_metadata(bad, metadata)
+
+def read_text_from_fake_s3(path) :
+    bucket, key = path.replace("s3://", "").split("/", 1)
+    return get_client('s3').get_object(Bucket=bucket, Key=key)["Body"].read().decode("utf-8")
+
+class CsvWriterTest(unittest.TestCase) :
+    """
+    Test writing partitioned csv using metadata and registering the partitions in glue
+    """
+    def test_write_partitioned_csv_and_register(self) :
+        metadata = dict(TABLE_METADATA, data_format="csv", table_desc="")
+        database_metadata = {"name": "db", "description": "", "location": "s3://bucket/db/"}
+        df = sales_df(6)
+        with use_backend(FakeBackend()) as fake :
+            populate_glue_catalogue_from_metadata(metadata, database_metadata)
+            written = pd_write_csv_using_metadata(df[df.year == 2017], metadata, database_metadata=database_metadata, register_partitions=True)
+            self.assertEqual(sorted(w["path"].rsplit("/", 1)[0] for w in written),
+                             ["s3://bucket/db/sales/year=2017/region=north", "s3://bucket/db/sales/year=2017/region=south"])
+            self.assertTrue(all(w["path"].endswith(".csv") for w in written))
+
+            south = [w for w in written if w["partition"]["region"] == "south"][0]
+            self.assertEqual(read_text_from_fake_s3(south["path"]),
+                             "0,0.0,label 0,2018-01-01,2018-01-01 10:00:00.123456\n")
+
+            partitions = get_client('glue').get_partitions(DatabaseName="db", TableName="sales")["Partitions"]
+            self.assertEqual(sorted(p["Values"] for p in partitions), [["2017", "north"], ["2017", "south"]])
+            self.assertEqual(sorted(p["StorageDescriptor"]["Location"] for p in partitions),
+                             ["s3://bucket/db/sales/year=2017/region=north/", "s3://bucket/db/sales/year=2017/region=south/"])
+
+            # Only new partitions are created on the next write
+            pd_write_csv_using_metadata(df, metadata, database_metadata=database_metadata, register_partitions=True)
+            self.assertEqual(fake.call_counts["glue.batch_create_partition"], 2)
+            partitions = get_client('glue').get_partitions(DatabaseName="db", TableName="sales")["Partitions"]
+            self.assertEqual(len(partitions), 4)
+
+    def test_quoted_csv_with_header(self) :
+        metadata = dict(TABLE_METADATA, data_format="csv_quoted_nodate", location="s3://bucket/quoted/")
+        metadata.pop("glue_specific")
+        with use_backend(FakeBackend()) :
+            written = pd_write_csv_using_metadata(sales_df(1), metadata, header=True)
+            self.assertEqual(read_text_from_fake_s3(written[0]["path"]).splitlines(), [
+                '"id","amount","label","sale_date","created","year","region"',
+                '"0","0.0","label 0","2018-01-01","2018-01-01 10:00:00.123456","2017","south"'])
+            with self.assertRaises(ValueError) :
+                pd_write_csv_using_metadata(sales_df(1), metadata, register_partitions=True)